@@ -13,8 +13,33 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-"""parkbenchcommon is a support package for Parkbench projects."""
+"""parkbenchcommon is a support package for Parkbench projects.
 
-__all__ = ['broadcaster', 'broadcastconsumer', 'confighelper', 'ramdisk']
+Submodules are imported the first time they are accessed as attributes of the package, so
+  'import parkbenchcommon' is cheap and only loads the modules a program actually uses.
+"""
+
+__all__ = ['broadcaster', 'broadcastconsumer', 'cachedlogger', 'confighelper',
+           'daemonhelper', 'loghandlers', 'memorysnapshot', 'metrics', 'ramdisk',
+           'samplingprofiler', 'startuptracer']
 __author__ = 'Joel Luellwitz and Emily Frost'
 __version__ = '0.8'
+
+import importlib
+
+
+def __getattr__(name):
+    """Imports a submodule the first time it is accessed as an attribute of the package.
+
+    name: The name of the attribute.
+    Returns the submodule.
+    """
+    if name in __all__:
+        # import_module also binds the submodule as a package attribute, so this function
+        #   is only called once per submodule.
+        return importlib.import_module('%s.%s' % (__name__, name))
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -16,14 +16,45 @@
 """Provides the consuming component of a filesystem-based IPC mechanism."""
 
 import datetime
+import fnmatch
 import os
-import logging
+import re
+import select
+import threading
 import time
+from parkbenchcommon import cachedlogger
+from parkbenchcommon import metrics
 
-__all__ = ['BroadcastCheckError', 'BroadcastConsumer']
+__all__ = ['BroadcastCheckError', 'BroadcastConsumer', 'BroadcastPollScheduler',
+           'BroadcastRelay', 'RelayedBroadcastConsumer', 'WildcardBroadcastConsumer',
+           'parse_broadcast_filename']
 
 SPOOL_PATH = '/var/spool'
 
+# Broadcast filenames are '<broadcast name>---<sequence>-<time_ns>---<random hex>'. The
+#   sequence increases with every broadcast a program issues during a boot. Filenames in
+#   the old '<broadcast name>---<ISO formatted time>---<random hex>' format are still read.
+BROADCAST_FIELD_SEPARATOR = '---'
+BROADCAST_TIME_SEPARATOR = '-'
+
+# Characters that start a wildcard in a subscription pattern. See fnmatch.
+WILDCARD_CHARACTERS = '*?['
+# The number of broadcast names whose matching subscriptions are cached.
+PATTERN_MATCH_CACHE_SIZE = 4096
+
+# The broadcast label is the broadcast name, or the subscription pattern for a
+#   WildcardBroadcastConsumer.
+BROADCAST_CHECKS = metrics.counter(
+    'parkbench_broadcast_checks_total', 'Checks for new broadcasts.',
+    ('broadcaster', 'broadcast'))
+BROADCASTS_CONSUMED = metrics.counter(
+    'parkbench_broadcasts_consumed_total', 'Broadcasts consumed.',
+    ('broadcaster', 'broadcast'))
+BROADCASTS_IGNORED = metrics.counter(
+    'parkbench_broadcasts_ignored_total',
+    'Broadcasts ignored because they were issued during the minimum delay.',
+    ('broadcaster', 'broadcast'))
+
 class BroadcastCheckError(Exception):
     """This exception is raised when an error is encountered while attempting to check a
     broadcast.
@@ -40,7 +71,7 @@ class BroadcastConsumer():
         occurs before minimum_delay has passed, the second broadcast is ignored.
     """
     def __init__(self, program_name, broadcast_name, minimum_delay):
-        self.logger = logging.getLogger(__name__)
+        self.logger = cachedlogger.get_logger(__name__)
         self.logger.debug("Initializing consumer for broadcast %s from program %s.",
                           broadcast_name, program_name)
 
@@ -48,70 +79,697 @@ class BroadcastConsumer():
         self.program_name = program_name
         self.broadcast_path = os.path.join(SPOOL_PATH, program_name, 'ramdisk', 'broadcast')
         self.last_consumed_broadcast = datetime.datetime.now().isoformat()
+        # Broadcasts issued before the consumer was instantiated are ignored.
+        self.last_consumed_sequence = _read_current_sequence(self.broadcast_path)
         self.first_future_broadcast_time = "9999"
-        self.next_check_time = time.time()
+        self.next_check_time = time.monotonic()
         self.minimum_delay = minimum_delay
+        self._check_counter = BROADCAST_CHECKS.labels(program_name, broadcast_name)
+        self._consumed_counter = BROADCASTS_CONSUMED.labels(program_name, broadcast_name)
+        self._ignored_counter = BROADCASTS_IGNORED.labels(program_name, broadcast_name)
 
         self.logger.info(
             "The consumer for broadcast '%s' from program '%s' has been initialized.",
             broadcast_name, program_name)
 
-    def check(self):
+    def check(self, file_list=None):
         """Check if a new broadcast has been issued.
 
+        file_list: The filenames in the broadcast directory, if they have already been
+          listed. Lets consumers of the same program share one directory listing. If None,
+          the directory is listed.
         Returns True if a new broadcast has been issued. Returns False otherwise.
         """
         broadcast_updated = False
+        self._check_counter.inc()
+
+        latest_sequence, latest_broadcast_time, highest_sequence = \
+            self._read_latest_broadcast(file_list)
 
-        latest_broadcast_time = self._read_latest_broadcast_time()
-
-        if latest_broadcast_time is not None:
-            if latest_broadcast_time > self.last_consumed_broadcast:
-                if self.next_check_time > time.time():
-                    self.logger.debug(
-                        'Read a %s broadcast from %s issued during the rate limiting delay '
-                        'and ignored it. The reported time was %s.',
-                        self.broadcast_name, self.program_name, latest_broadcast_time)
-                else:
-                    self.logger.info(
-                        'The broadcast %s from program %s has been consumed.',
-                        self.broadcast_name, self.program_name)
-                    self.logger.debug(
-                        'Updating last consumed broadcast time from %s to %s.',
-                        self.last_consumed_broadcast, latest_broadcast_time)
-                    broadcast_updated = True
-                    self.next_check_time = time.time() + self.minimum_delay
-
-                self.last_consumed_broadcast = latest_broadcast_time
+        # Broadcasts in the current filename format are ordered by sequence, so clock
+        #   changes cannot delay or reorder them. The sequence only goes down when the
+        #   broadcaster's ramdisk was cleared and its numbering restarted.
+        if highest_sequence is not None and highest_sequence < self.last_consumed_sequence:
+            self.logger.info(
+                'Broadcast sequence of program %s went down from %d to %d. Restarting '
+                'sequence tracking for broadcast %s.', self.program_name,
+                self.last_consumed_sequence, highest_sequence, self.broadcast_name)
+            self.last_consumed_sequence = 0
+
+        new_broadcast = None
+        if latest_sequence is not None and latest_sequence > self.last_consumed_sequence:
+            new_broadcast = latest_sequence
+            self.last_consumed_sequence = latest_sequence
+        elif latest_broadcast_time is not None and \
+                latest_broadcast_time > self.last_consumed_broadcast:
+            new_broadcast = latest_broadcast_time
+            self.last_consumed_broadcast = latest_broadcast_time
+
+        if new_broadcast is not None:
+            if self.next_check_time > time.monotonic():
+                self.logger.debug(
+                    'Read a %s broadcast from %s issued during the rate limiting delay '
+                    'and ignored it. The broadcast was %s.',
+                    self.broadcast_name, self.program_name, new_broadcast)
+                self._ignored_counter.inc()
+            else:
+                self.logger.info(
+                    'The broadcast %s from program %s has been consumed.',
+                    self.broadcast_name, self.program_name)
+                self.logger.debug('Consumed broadcast %s.', new_broadcast)
+                broadcast_updated = True
+                self._consumed_counter.inc()
+                self.next_check_time = time.monotonic() + self.minimum_delay
 
         return broadcast_updated
 
-    def _read_latest_broadcast_time(self):
-        """Retrieves the ISO formatted time from the most recent broadcast.
+    def wait(self, timeout=None, poll_interval=1):
+        """Waits until a new broadcast has been issued by calling check repeatedly.
+
+        timeout: The maximum number of seconds to wait. If None, waits indefinitely.
+        poll_interval: The number of seconds to sleep between checks.
+        Returns True if a new broadcast has been issued. Returns False if the timeout
+          expired.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.check():
+            if deadline is None:
+                time.sleep(poll_interval)
+            else:
+                remaining_time = deadline - time.monotonic()
+                if remaining_time <= 0:
+                    return False
+                time.sleep(min(poll_interval, remaining_time))
+
+        return True
+
+    def _read_latest_broadcast(self, file_list=None):
+        """Finds the most recent broadcast with this consumer's broadcast name. Broadcasts
+        in the current filename format are ordered by their sequence number. Broadcasts in
+        the old format are ordered by their ISO formatted time, and a broadcast more than
+        one second in the future is ignored.
+
+        file_list: The filenames in the broadcast directory. If None, the directory is
+          listed.
+        Returns a tuple of the highest sequence number with this consumer's broadcast
+          name, the latest ISO formatted time, and the highest sequence number of any
+          broadcast. Each is None if no matching broadcast exists.
+        """
+        latest_sequence = None
+        highest_sequence = None
+        old_format_times = []
+
+        if file_list is None and os.path.isdir(self.broadcast_path):
+            file_list = os.listdir(self.broadcast_path)
+        for filename in file_list or ():
+            parsed_filename = parse_broadcast_filename(filename)
+            if parsed_filename is None:
+                continue
+            read_broadcast_name, sequence, read_broadcast_time = parsed_filename
+            if sequence is not None and (highest_sequence is None
+                                         or sequence > highest_sequence):
+                highest_sequence = sequence
+            if read_broadcast_name != self.broadcast_name:
+                continue
+            if sequence is not None:
+                if latest_sequence is None or sequence > latest_sequence:
+                    latest_sequence = sequence
+            else:
+                old_format_times.append(read_broadcast_time)
+
+        latest_broadcast_time = None
+        if old_format_times:
+            latest_broadcast_time = self._read_latest_old_format_time(old_format_times)
+
+        return latest_sequence, latest_broadcast_time, highest_sequence
+
+    def _read_latest_old_format_time(self, old_format_times):
+        """Retrieves the latest ISO formatted time from broadcasts in the old filename
+        format, which is still read while broadcasters are upgraded.
 
+        old_format_times: The ISO formatted times of the old format broadcasts with this
+          consumer's broadcast name.
         Returns a string containing an ISO formatted timestamp of the latest broadcast file.
-           If no broadcast file exists, None is returned.
+           If every broadcast is from the future, None is returned.
         """
         latest_broadcast_time = None
 
-        if os.path.isdir(self.broadcast_path):
-            file_list = os.listdir(self.broadcast_path)
-            for filename in sorted(file_list, reverse=True):
-                (read_broadcast_name, read_broadcast_time, _) = filename.split('---')
-                if read_broadcast_name == self.broadcast_name:
-                    # Allow for up to one second of clock correction due to NTP updates.
-                    now_plus_one_second = (datetime.datetime.now() +
-                                           datetime.timedelta(seconds=1)).isoformat()
-                    if read_broadcast_time <= now_plus_one_second:
-                        latest_broadcast_time = read_broadcast_time
-                        break
-                    else:
-                        if read_broadcast_time < self.first_future_broadcast_time or \
-                                self.first_future_broadcast_time < now_plus_one_second:
-                            self.first_future_broadcast_time = read_broadcast_time
-                            self.logger.warning(
-                                'Read a %s broadcast from %s from the future and ignored '
-                                'it. The reported time was %s.',
-                                self.broadcast_name, self.program_name, read_broadcast_time)
+        for read_broadcast_time in sorted(old_format_times, reverse=True):
+            # Allow for up to one second of clock correction due to NTP updates.
+            now_plus_one_second = (datetime.datetime.now() +
+                                   datetime.timedelta(seconds=1)).isoformat()
+            if read_broadcast_time <= now_plus_one_second:
+                latest_broadcast_time = read_broadcast_time
+                break
+            else:
+                if read_broadcast_time < self.first_future_broadcast_time or \
+                        self.first_future_broadcast_time < now_plus_one_second:
+                    self.first_future_broadcast_time = read_broadcast_time
+                    self.logger.warning(
+                        'Read a %s broadcast from %s from the future and ignored '
+                        'it. The reported time was %s.',
+                        self.broadcast_name, self.program_name, read_broadcast_time)
 
         return latest_broadcast_time
+
+
+def parse_broadcast_filename(filename):
+    """Splits a broadcast filename in either the current or the old format.
+
+    filename: The name of a file in a broadcast directory.
+    Returns a tuple of the broadcast name, the sequence number, and the ISO formatted time.
+      The sequence number is None for the old format, and the time is None for the current
+      format. Returns None if the filename is not a broadcast.
+    """
+    fields = filename.split(BROADCAST_FIELD_SEPARATOR)
+    if len(fields) != 3:
+        return None
+    broadcast_name, time_field, _ = fields
+
+    sequence_text, separator, time_ns_text = time_field.partition(BROADCAST_TIME_SEPARATOR)
+    if separator and sequence_text.isdigit() and time_ns_text.isdigit():
+        return broadcast_name, int(sequence_text), None
+    return broadcast_name, None, time_field
+
+
+def _read_current_sequence(broadcast_path):
+    """Returns the highest sequence number of any broadcast currently in a broadcast
+    directory, or 0 if there is none.
+
+    broadcast_path: The broadcast directory.
+    """
+    current_sequence = 0
+    if os.path.isdir(broadcast_path):
+        for filename in os.listdir(broadcast_path):
+            parsed_filename = parse_broadcast_filename(filename)
+            if parsed_filename is not None and parsed_filename[1] is not None:
+                current_sequence = max(current_sequence, parsed_filename[1])
+    return current_sequence
+
+
+class _BroadcastPatternIndex():
+    """Maps broadcast names to the values subscribed with matching glob patterns. Each
+    pattern is indexed by its literal prefix, the part before the first wildcard, so
+    matching a name only looks up the name's prefixes of the indexed lengths instead of
+    trying every pattern. Results are cached per broadcast name until the patterns change.
+    """
+
+    def __init__(self):
+        # Lists of (pattern, compiled pattern or None, value) keyed by literal prefix. The
+        #   compiled pattern is None for patterns without wildcards.
+        self._patterns_by_prefix = {}
+        self._prefix_lengths = ()
+        self._match_cache = {}
+
+    def add(self, pattern, value):
+        """Indexes a pattern.
+
+        pattern: A glob pattern as accepted by fnmatch, matched case-sensitively.
+        value: The value returned by match for names matching the pattern.
+        """
+        wildcard_index = min([pattern.find(character) for character in WILDCARD_CHARACTERS
+                              if character in pattern] or [len(pattern)])
+        prefix = pattern[:wildcard_index]
+        compiled_pattern = None
+        if wildcard_index < len(pattern):
+            compiled_pattern = re.compile(fnmatch.translate(pattern))
+        self._patterns_by_prefix.setdefault(prefix, []).append(
+            (pattern, compiled_pattern, value))
+        self._reindex()
+
+    def patterns(self):
+        """Returns a sorted list of the distinct indexed patterns."""
+        return sorted({pattern for patterns in self._patterns_by_prefix.values()
+                       for pattern, _, _ in patterns})
+
+    def remove(self, value):
+        """Removes every pattern indexed with a value.
+
+        value: The value passed to add.
+        """
+        for prefix, patterns in list(self._patterns_by_prefix.items()):
+            patterns[:] = [pattern for pattern in patterns if pattern[2] is not value]
+            if not patterns:
+                del self._patterns_by_prefix[prefix]
+        self._reindex()
+
+    def match(self, broadcast_name):
+        """Returns a list of the values of the patterns matching a broadcast name.
+
+        broadcast_name: The broadcast name to match.
+        """
+        values = self._match_cache.get(broadcast_name)
+        if values is None:
+            values = []
+            for prefix_length in self._prefix_lengths:
+                if prefix_length > len(broadcast_name):
+                    break
+                for _, compiled_pattern, value in self._patterns_by_prefix.get(
+                        broadcast_name[:prefix_length], ()):
+                    if compiled_pattern is None:
+                        if len(broadcast_name) == prefix_length:
+                            values.append(value)
+                    elif compiled_pattern.match(broadcast_name):
+                        values.append(value)
+            if len(self._match_cache) >= PATTERN_MATCH_CACHE_SIZE:
+                self._match_cache = {}
+            self._match_cache[broadcast_name] = values
+        return values
+
+    def _reindex(self):
+        """Updates the prefix lengths to look up and clears the match cache."""
+        self._prefix_lengths = tuple(sorted({len(prefix)
+                                             for prefix in self._patterns_by_prefix}))
+        self._match_cache = {}
+
+
+class _Subscription():
+    """A pattern subscription of a WildcardBroadcastConsumer."""
+
+    def __init__(self, program_name, pattern, callback, minimum_delay):
+        self.pattern = pattern
+        self.callback = callback
+        self.minimum_delay = minimum_delay
+        self.next_check_time = time.monotonic()
+        # Labeled by pattern rather than by the broadcast names it matches, which are not
+        #   known in advance and would create an unbounded number of series.
+        self.consumed_counter = BROADCASTS_CONSUMED.labels(program_name, pattern)
+        self.ignored_counter = BROADCASTS_IGNORED.labels(program_name, pattern)
+
+
+class WildcardBroadcastConsumer():
+    """Consumes every broadcast from a program whose name matches one of a set of glob
+    patterns, such as 'cache-*'. One listing of the broadcast directory is routed to every
+    matching subscription, and the cost of routing a broadcast does not grow with the
+    number of subscriptions. Only broadcasts in the sequence filename format are routed.
+
+    Any broadcasts issued before the WildcardBroadcastConsumer is instantiated are ignored.
+    It can be added to a BroadcastPollScheduler like a BroadcastConsumer.
+
+    program_name: The name of the program that issues the broadcasts.
+    """
+    def __init__(self, program_name):
+        self.logger = cachedlogger.get_logger(__name__)
+
+        self.program_name = program_name
+        self.broadcast_path = os.path.join(SPOOL_PATH, program_name, 'ramdisk', 'broadcast')
+        self.last_consumed_sequence = _read_current_sequence(self.broadcast_path)
+
+        self._lock = threading.Lock()
+        self._index = _BroadcastPatternIndex()
+        self._check_counter = BROADCAST_CHECKS.labels(program_name, '*')
+
+        self.logger.info(
+            "The wildcard consumer for broadcasts from program '%s' has been initialized.",
+            program_name)
+
+    @property
+    def broadcast_name(self):
+        """The subscribed patterns, for log messages."""
+        with self._lock:
+            return ','.join(self._index.patterns())
+
+    def subscribe(self, pattern, callback, minimum_delay=0):
+        """Subscribes to broadcasts whose names match a glob pattern.
+
+        pattern: A glob pattern as accepted by fnmatch, matched case-sensitively.
+        callback: A function called with the broadcast name each time a matching broadcast
+          is consumed. Called from the thread calling check.
+        minimum_delay: The minimum delay in seconds between broadcasts delivered to this
+          subscription. Matching broadcasts issued before it has passed are ignored.
+        Returns the subscription, which can be passed to unsubscribe.
+        """
+        subscription = _Subscription(self.program_name, pattern, callback, minimum_delay)
+        with self._lock:
+            self._index.add(pattern, subscription)
+        self.logger.debug('Subscribed to broadcasts matching %s from program %s.', pattern,
+                          self.program_name)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Removes a subscription.
+
+        subscription: The subscription returned by subscribe.
+        """
+        with self._lock:
+            self._index.remove(subscription)
+
+    def check(self, file_list=None):
+        """Routes broadcasts issued since the last check to the matching subscriptions. If
+        several broadcasts with the same name were issued, it is delivered once.
+
+        file_list: The filenames in the broadcast directory, if they have already been
+          listed. If None, the directory is listed.
+        Returns True if a broadcast was delivered to any subscription. Returns False
+          otherwise.
+        """
+        self._check_counter.inc()
+
+        if file_list is None:
+            file_list = os.listdir(self.broadcast_path) \
+                if os.path.isdir(self.broadcast_path) else []
+
+        sequenced_broadcasts = []
+        for filename in file_list:
+            parsed_filename = parse_broadcast_filename(filename)
+            if parsed_filename is not None and parsed_filename[1] is not None:
+                sequenced_broadcasts.append(parsed_filename[:2])
+
+        # The sequence only goes down when the broadcaster's ramdisk was cleared and its
+        #   numbering restarted.
+        if sequenced_broadcasts:
+            highest_sequence = max(sequence for _, sequence in sequenced_broadcasts)
+            if highest_sequence < self.last_consumed_sequence:
+                self.logger.info(
+                    'Broadcast sequence of program %s went down from %d to %d. Restarting '
+                    'sequence tracking.', self.program_name, self.last_consumed_sequence,
+                    highest_sequence)
+                self.last_consumed_sequence = 0
+
+        new_broadcast_names = set()
+        latest_sequence = self.last_consumed_sequence
+        for broadcast_name, sequence in sequenced_broadcasts:
+            if sequence > self.last_consumed_sequence:
+                new_broadcast_names.add(broadcast_name)
+                latest_sequence = max(latest_sequence, sequence)
+        self.last_consumed_sequence = latest_sequence
+
+        broadcast_delivered = False
+        for broadcast_name in sorted(new_broadcast_names):
+            with self._lock:
+                subscriptions = list(self._index.match(broadcast_name))
+            for subscription in subscriptions:
+                if self._deliver(subscription, broadcast_name):
+                    broadcast_delivered = True
+
+        return broadcast_delivered
+
+    def _deliver(self, subscription, broadcast_name):
+        """Calls a subscription's callback unless it is within its minimum delay.
+
+        subscription: The matching subscription.
+        broadcast_name: The name of the new broadcast.
+        Returns True if the callback was called. Returns False otherwise.
+        """
+        now = time.monotonic()
+        if subscription.next_check_time > now:
+            self.logger.debug(
+                'Read a %s broadcast from %s issued during the rate limiting delay of '
+                'subscription %s and ignored it.', broadcast_name, self.program_name,
+                subscription.pattern)
+            subscription.ignored_counter.inc()
+            return False
+
+        self.logger.info('The broadcast %s from program %s has been consumed by '
+                         'subscription %s.', broadcast_name, self.program_name,
+                         subscription.pattern)
+        subscription.consumed_counter.inc()
+        subscription.next_check_time = now + subscription.minimum_delay
+        try:
+            subscription.callback(broadcast_name)
+        except Exception:
+            self.logger.exception('Callback of subscription %s failed for broadcast %s.',
+                                  subscription.pattern, broadcast_name)
+        return True
+
+
+class BroadcastPollScheduler():
+    """Checks many BroadcastConsumers from a single loop, adapting how often each one is
+    checked. A consumer is checked often right after it receives a broadcast, and its
+    interval grows exponentially while it stays idle. All consumers of the same program
+    share one listing of the broadcast directory per pass, and a consumer that is not yet
+    due is checked anyway whenever its directory is listed for another consumer.
+    """
+
+    def __init__(self, minimum_interval=0.1, maximum_interval=10, backoff_factor=2):
+        """Constructor.
+
+        minimum_interval: The number of seconds between checks of a consumer that recently
+          received a broadcast.
+        maximum_interval: The largest number of seconds between checks of an idle consumer.
+        backoff_factor: The factor the interval of an idle consumer grows by after each
+          check that finds no broadcast.
+        """
+        self.logger = cachedlogger.get_logger(__name__)
+
+        self.minimum_interval = minimum_interval
+        self.maximum_interval = maximum_interval
+        self.backoff_factor = backoff_factor
+
+        self._lock = threading.Lock()
+        # Lists of [consumer, callback, interval, next check time] keyed by broadcast path.
+        self._entries_by_path = {}
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._poll_thread = None
+
+    def add(self, consumer, callback):
+        """Adds a consumer. It is checked at the minimum interval until it goes idle.
+
+        consumer: The BroadcastConsumer to check.
+        callback: A function called with the consumer each time it receives a broadcast.
+          Called from the thread running the scheduler.
+        """
+        entry = [consumer, callback, self.minimum_interval, time.monotonic()]
+        with self._lock:
+            self._entries_by_path.setdefault(consumer.broadcast_path, []).append(entry)
+        self._wake_event.set()
+
+    def remove(self, consumer):
+        """Removes a consumer added with add.
+
+        consumer: The BroadcastConsumer to remove.
+        """
+        with self._lock:
+            entries = self._entries_by_path.get(consumer.broadcast_path, [])
+            entries[:] = [entry for entry in entries if entry[0] is not consumer]
+            if not entries:
+                self._entries_by_path.pop(consumer.broadcast_path, None)
+
+    def run_once(self):
+        """Checks every consumer that is due, along with the other consumers sharing its
+        broadcast directory, and calls the callbacks of those that received a broadcast.
+
+        Returns the number of seconds until the next consumer is due, or None if there are
+          no consumers.
+        """
+        now = time.monotonic()
+        with self._lock:
+            due_paths = [
+                (broadcast_path, list(entries))
+                for broadcast_path, entries in self._entries_by_path.items()
+                if any(entry[3] <= now for entry in entries)]
+
+        for broadcast_path, entries in due_paths:
+            try:
+                file_list = os.listdir(broadcast_path)
+            except (FileNotFoundError, NotADirectoryError):
+                file_list = []
+
+            for entry in entries:
+                consumer, callback, interval, next_check_time = entry
+                try:
+                    broadcast_updated = consumer.check(file_list)
+                except Exception:
+                    self.logger.exception(
+                        'Failed to check broadcast %s from program %s.',
+                        consumer.broadcast_name, consumer.program_name)
+                    broadcast_updated = False
+
+                if broadcast_updated:
+                    entry[2] = self.minimum_interval
+                    entry[3] = now + self.minimum_interval
+                    try:
+                        callback(consumer)
+                    except Exception:
+                        self.logger.exception(
+                            'Broadcast callback for broadcast %s from program %s failed.',
+                            consumer.broadcast_name, consumer.program_name)
+                elif next_check_time <= now:
+                    entry[2] = min(self.maximum_interval, interval * self.backoff_factor)
+                    entry[3] = now + entry[2]
+
+        with self._lock:
+            next_check_times = [entry[3] for entries in self._entries_by_path.values()
+                                for entry in entries]
+        if not next_check_times:
+            return None
+        return max(0, min(next_check_times) - time.monotonic())
+
+    def run(self):
+        """Checks consumers as they become due until stop is called."""
+        while not self._stop_event.is_set():
+            delay = self.run_once()
+            self._wake_event.wait(delay)
+            self._wake_event.clear()
+
+    def start(self):
+        """Calls run in a background thread."""
+        self._stop_event.clear()
+        self._poll_thread = threading.Thread(
+            target=self.run, name='broadcast-poll-scheduler', daemon=True)
+        self._poll_thread.start()
+
+    def stop(self):
+        """Stops run and waits for the background thread started by start."""
+        self._stop_event.set()
+        self._wake_event.set()
+        if self._poll_thread is not None:
+            self._poll_thread.join()
+            self._poll_thread = None
+
+
+class BroadcastRelay():
+    """Consumes a broadcast once in a parent process and relays it to forked child processes
+    over inherited pipes, so a process tree only watches the broadcast directory once.
+
+    The relay must be created before the children are forked. Each child calls consumer
+    with its own channel index to get a RelayedBroadcastConsumer. A channel can be reused by
+    a replacement child after the previous child exits. Broadcasts relayed while a child is
+    not running are reported once to the next child using that channel.
+
+    program_name: The name of the program that issues this broadcast.
+    broadcast_name: The name of this broadcast.
+    minimum_delay: The minimum delay in seconds between broadcasts, as in
+        BroadcastConsumer.
+    channel_count: The number of child channels to create.
+    """
+    def __init__(self, program_name, broadcast_name, minimum_delay, channel_count):
+        self.logger = cachedlogger.get_logger(__name__)
+
+        self.broadcast_consumer = BroadcastConsumer(
+            program_name, broadcast_name, minimum_delay)
+        # A list of (read fd, write fd) tuples indexed by channel index.
+        self.channels = []
+        for _ in range(channel_count):
+            read_fd, write_fd = os.pipe()
+            os.set_blocking(read_fd, False)
+            os.set_blocking(write_fd, False)
+            self.channels.append((read_fd, write_fd))
+
+        self._relay_thread = None
+        self._stop_event = threading.Event()
+
+    def fds(self):
+        """Returns all of the relay's file descriptors. Pass these to anything that closes
+        file descriptors when forking, such as WorkerSupervisor's preserved_fds.
+        """
+        return [fd for channel in self.channels for fd in channel]
+
+    def check(self):
+        """Checks for a new broadcast and relays it to every channel. Must be called in the
+        parent process.
+
+        Returns True if a new broadcast was relayed. Returns False otherwise.
+        """
+        broadcast_updated = self.broadcast_consumer.check()
+        if broadcast_updated:
+            for _, write_fd in self.channels:
+                try:
+                    os.write(write_fd, b'\0')
+                except BlockingIOError:
+                    # The child has not read earlier notifications yet. It will still see
+                    #   one broadcast.
+                    pass
+
+        return broadcast_updated
+
+    def start(self, poll_interval=1):
+        """Calls check in a background thread of the parent process until stop is called.
+
+        poll_interval: The number of seconds to sleep between checks.
+        """
+        self._stop_event.clear()
+        self._relay_thread = threading.Thread(
+            target=self._relay, args=(poll_interval,), name='broadcast-relay', daemon=True)
+        self._relay_thread.start()
+
+    def stop(self):
+        """Stops the background thread started by start."""
+        self._stop_event.set()
+        if self._relay_thread is not None:
+            self._relay_thread.join()
+            self._relay_thread = None
+
+    def consumer(self, channel_index):
+        """Returns a RelayedBroadcastConsumer for a channel. Must be called once in the
+        child process, after it is forked. Closes the child's copies of every write end and
+        of the read ends of the other channels, so a child cannot steal another child's
+        notifications and sees the channel close when the parent exits.
+
+        channel_index: The index of the channel this child reads from.
+        """
+        channel_read_fd = self.channels[channel_index][0]
+        for read_fd, write_fd in self.channels:
+            os.close(write_fd)
+            if read_fd != channel_read_fd:
+                os.close(read_fd)
+        self.channels = []
+        return RelayedBroadcastConsumer(channel_read_fd)
+
+    def _relay(self, poll_interval):
+        """Relays broadcasts until stop is called.
+
+        poll_interval: The number of seconds to sleep between checks.
+        """
+        while not self._stop_event.is_set():
+            try:
+                self.check()
+            except Exception:
+                self.logger.exception('Failed to relay broadcast %s from program %s.',
+                                      self.broadcast_consumer.broadcast_name,
+                                      self.broadcast_consumer.program_name)
+            self._stop_event.wait(poll_interval)
+
+
+class RelayedBroadcastConsumer():
+    """Receives broadcasts relayed by a BroadcastRelay in a parent process. Provides the
+    same check and wait methods as BroadcastConsumer. Rate limiting is applied by the
+    parent.
+
+    read_fd: The read end of the channel's pipe.
+    """
+    def __init__(self, read_fd):
+        self.logger = cachedlogger.get_logger(__name__)
+        self.read_fd = read_fd
+
+    def check(self):
+        """Check if a new broadcast has been relayed. Raises BroadcastCheckError if the
+        relaying process has exited.
+
+        Returns True if a new broadcast has been relayed. Returns False otherwise.
+        """
+        broadcast_updated = False
+        try:
+            while os.read(self.read_fd, 4096):
+                broadcast_updated = True
+            # Reading returns nothing only once every write end of the pipe is closed.
+            if not broadcast_updated:
+                message = 'The broadcast relay has exited.'
+                self.logger.error(message)
+                raise BroadcastCheckError(message)
+        except BlockingIOError:
+            pass
+
+        if broadcast_updated:
+            self.logger.debug('A relayed broadcast has been consumed.')
+
+        return broadcast_updated
+
+    def wait(self, timeout=None):
+        """Waits until a new broadcast has been relayed.
+
+        timeout: The maximum number of seconds to wait. If None, waits indefinitely.
+        Returns True if a new broadcast has been relayed. Returns False if the timeout
+          expired.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.check():
+            remaining_time = None
+            if deadline is not None:
+                remaining_time = deadline - time.monotonic()
+                if remaining_time <= 0:
+                    return False
+            select.select([self.read_fd], [], [], remaining_time)
+
+        return True
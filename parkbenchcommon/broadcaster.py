@@ -24,15 +24,29 @@ __all__ = ['BroadcasterIssueException',
            'BroadcasterInitException',
            'Broadcaster']
 
-import datetime
+import fcntl
 import logging
 import os
 import stat
+import time
+from parkbenchcommon import broadcastconsumer
 from parkbenchcommon import daemonhelper
+from parkbenchcommon import metrics
 from parkbenchcommon import ramdisk
+from parkbenchcommon import startuptracer
 
 SPOOL_PATH = '/var/spool'
 RAMDISK_SIZE = '1M'
+# Locked while a broadcast is issued, so broadcasters of the same program never allocate
+#   the same sequence number. It is kept outside of the broadcast directory, which
+#   consumers list.
+LOCK_FILENAME = 'broadcast.lock'
+
+BROADCASTS_ISSUED = metrics.counter(
+    'parkbench_broadcasts_issued_total', 'Broadcasts issued.', ('broadcaster', 'broadcast'))
+BROADCAST_ISSUE_FAILURES = metrics.counter(
+    'parkbench_broadcast_issue_failures_total', 'Broadcasts that could not be issued.',
+    ('broadcaster', 'broadcast'))
 
 
 class BroadcasterIssueException(Exception):
@@ -46,6 +60,7 @@ class BroadcasterInitException(Exception):
 class Broadcaster():
     """Provides the broadcasting component of a filesystem-based IPC mechanism."""
 
+    @startuptracer.traced('broadcaster.init')
     def __init__(self, program_name, broadcast_name, uid, gid):
         """Initial configuration of the broadcast directory. This must be done as root. This
         constructor mounts a ramdisk and creates any necessary spool directories with
@@ -63,10 +78,16 @@ class Broadcaster():
 
         self.program_name = program_name
         self.broadcast_name = broadcast_name
+        # The sequence number of the last broadcast this object issued.
+        self.sequence = 0
+        self._issued_counter = BROADCASTS_ISSUED.labels(program_name, broadcast_name)
+        self._issue_failure_counter = BROADCAST_ISSUE_FAILURES.labels(
+            program_name, broadcast_name)
 
         ramdisk_relative_path = os.path.join(program_name, 'ramdisk')
         ramdisk_path = os.path.join(SPOOL_PATH, ramdisk_relative_path)
         self.broadcast_path = os.path.join(ramdisk_path, 'broadcast')
+        self.lock_path = os.path.join(ramdisk_path, LOCK_FILENAME)
 
         self.logger.debug('Creating broadcast directories for program %s.', program_name)
 
@@ -93,22 +114,60 @@ class Broadcaster():
         """
         self.logger.info(
             'Issuing broadcast %s for program %s.', self.broadcast_name, self.program_name)
-        now = datetime.datetime.now().isoformat()
         # A random number is added to the filename to avoid filename collisions.
         random_number = os.urandom(16).hex()
 
-        broadcast_filename = '%s---%s---%s' % (self.broadcast_name, now, random_number)
-        broadcast_pathname = os.path.join(self.broadcast_path, broadcast_filename)
-
         try:
-            previous_broadcasts = os.listdir(self.broadcast_path)
-            open(broadcast_pathname, 'a').close()
-
-            # TODO: Delete only broadcasts with a matching broadcast name. (issue 23)
-            for broadcast_file in previous_broadcasts:
-                os.remove(os.path.join(self.broadcast_path, broadcast_file))
+            lock_fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+            try:
+                # Without the lock, two broadcasters could scan the same broadcasts and
+                #   issue the same sequence number, or both try to remove the same previous
+                #   broadcast.
+                fcntl.flock(lock_fd, fcntl.LOCK_EX)
+                self._issue_locked(random_number)
+            finally:
+                os.close(lock_fd)
 
         except Exception as exception:
+            self._issue_failure_counter.inc()
             message = 'Could not create broadcast file for broadcast %s, program %s.' % (
                 self.broadcast_name, self.program_name)
             raise BroadcasterIssueException(message) from exception
+
+        self._issued_counter.inc()
+
+    def _issue_locked(self, random_number):
+        """Creates the broadcast file and removes prior broadcasts. Must be called while
+        holding the lock on the lock file.
+
+        random_number: The random hex string added to the filename.
+        """
+        previous_broadcasts = os.listdir(self.broadcast_path)
+
+        # Scanning the existing broadcasts yields a sequence that keeps increasing if the
+        #   program restarts. Consumers order broadcasts by sequence, so clock changes
+        #   cannot delay or reorder them. The time is only informational. The ramdisk is
+        #   empty after a reboot or remount, so numbering then restarts unless this object
+        #   issued the previous broadcasts. Consumers notice that the highest sequence went
+        #   down and start over, but a consumer that does not check until the new numbering
+        #   has caught up with the sequence it last consumed misses the broadcasts issued in
+        #   between.
+        next_sequence = self.sequence
+        for broadcast_file in previous_broadcasts:
+            parsed_filename = broadcastconsumer.parse_broadcast_filename(broadcast_file)
+            if parsed_filename is not None and parsed_filename[1] is not None:
+                next_sequence = max(next_sequence, parsed_filename[1])
+        next_sequence += 1
+
+        broadcast_filename = '%s%s%d%s%d%s%s' % (
+            self.broadcast_name, broadcastconsumer.BROADCAST_FIELD_SEPARATOR,
+            next_sequence, broadcastconsumer.BROADCAST_TIME_SEPARATOR, time.time_ns(),
+            broadcastconsumer.BROADCAST_FIELD_SEPARATOR, random_number)
+        broadcast_pathname = os.path.join(self.broadcast_path, broadcast_filename)
+        open(broadcast_pathname, 'a').close()
+        # Only a broadcast that was created uses up its sequence number.
+        self.sequence = next_sequence
+
+        # TODO: Delete only broadcasts with a matching broadcast name. (issue 23)
+        for broadcast_file in previous_broadcasts:
+            os.remove(os.path.join(self.broadcast_path, broadcast_file))
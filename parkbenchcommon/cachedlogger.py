@@ -0,0 +1,158 @@
+# Copyright 2026 Joel Allen Luellwitz and Emily Frost
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Provides a logging facade that makes calls at disabled levels nearly free.
+
+A CachedLogger keeps one boolean per level, so a disabled trace or debug call costs a
+  dictionary lookup and a branch. The booleans are read again whenever the logging module
+  clears its own level cache, which Logger.setLevel, logging.disable, and dictConfig all
+  do, and when the wrapped logger is disabled or enabled.
+
+Expensive message arguments can be wrapped with lazy so they are only computed when the
+  record is actually formatted.
+"""
+
+__all__ = ['CachedLogger', 'TRACE_LEVEL_NUMBER', 'get_logger', 'lazy', 'refresh_levels']
+
+import logging
+import weakref
+
+TRACE_LEVEL_NUMBER = 5  # debug is 10, error is 20, and so on.
+
+_CACHED_LOGGERS = weakref.WeakSet()
+
+
+class CachedLogger():
+    """Wraps a logging.Logger and caches whether each level is enabled. Other attributes
+    are passed through to the wrapped logger. Records are attributed to the caller of the
+    CachedLogger, not to this module.
+    """
+
+    def __init__(self, logger):
+        """Constructor.
+
+        logger: The logging.Logger to wrap.
+        """
+        self.logger = logger
+        # Stored in the wrapped logger's level cache by refresh. The logging module clears
+        #   the level caches of all loggers whenever a level changes, so a missing marker
+        #   means the flags are stale. Its value is the logger's disabled attribute, which
+        #   can change without clearing the cache.
+        self._refresh_marker = object()
+        self.trace_enabled = False
+        self.debug_enabled = False
+        self.info_enabled = False
+        self.warning_enabled = False
+        self.refresh()
+        _CACHED_LOGGERS.add(self)
+
+    def __getattr__(self, name):
+        if name == 'logger':
+            raise AttributeError(name)
+        return getattr(self.logger, name)
+
+    def refresh(self):
+        """Updates the cached enabled flags from the wrapped logger."""
+        # Stored first, so a level change while the flags are read removes it again.
+        self.logger._cache[self._refresh_marker] = self.logger.disabled
+        self.trace_enabled = bool(self.logger.isEnabledFor(TRACE_LEVEL_NUMBER))
+        self.debug_enabled = bool(self.logger.isEnabledFor(logging.DEBUG))
+        self.info_enabled = bool(self.logger.isEnabledFor(logging.INFO))
+        self.warning_enabled = bool(self.logger.isEnabledFor(logging.WARNING))
+
+    def trace(self, message, *args, **kwargs):
+        """Logs a message at trace level if trace is enabled."""
+        if self.logger._cache.get(self._refresh_marker) is not self.logger.disabled:
+            self.refresh()
+        if self.trace_enabled:
+            self.logger.log(TRACE_LEVEL_NUMBER, message, *args, stacklevel=2, **kwargs)
+
+    def debug(self, message, *args, **kwargs):
+        """Logs a message at debug level if debug is enabled."""
+        if self.logger._cache.get(self._refresh_marker) is not self.logger.disabled:
+            self.refresh()
+        if self.debug_enabled:
+            self.logger.debug(message, *args, stacklevel=2, **kwargs)
+
+    def info(self, message, *args, **kwargs):
+        """Logs a message at info level if info is enabled."""
+        if self.logger._cache.get(self._refresh_marker) is not self.logger.disabled:
+            self.refresh()
+        if self.info_enabled:
+            self.logger.info(message, *args, stacklevel=2, **kwargs)
+
+    def warning(self, message, *args, **kwargs):
+        """Logs a message at warning level if warning is enabled."""
+        if self.logger._cache.get(self._refresh_marker) is not self.logger.disabled:
+            self.refresh()
+        if self.warning_enabled:
+            self.logger.warning(message, *args, stacklevel=2, **kwargs)
+
+    def error(self, message, *args, **kwargs):
+        """Logs a message at error level."""
+        self.logger.error(message, *args, stacklevel=2, **kwargs)
+
+    def exception(self, message, *args, **kwargs):
+        """Logs a message with exception information at error level."""
+        self.logger.error(message, *args, exc_info=True, stacklevel=2, **kwargs)
+
+    def critical(self, message, *args, **kwargs):
+        """Logs a message at critical level."""
+        self.logger.critical(message, *args, stacklevel=2, **kwargs)
+
+
+class _LazyValue():
+    """A log message argument that is computed the first time it is converted to a
+    string.
+    """
+    __slots__ = ('function', 'args', '_value')
+
+    def __init__(self, function, args):
+        self.function = function
+        self.args = args
+        self._value = None
+
+    def __str__(self):
+        if self._value is None:
+            self._value = str(self.function(*self.args))
+        return self._value
+
+    __repr__ = __str__
+
+
+def get_logger(name=None):
+    """Returns a CachedLogger wrapping logging.getLogger(name).
+
+    name: The name of the logger. None returns the root logger.
+    """
+    return CachedLogger(logging.getLogger(name))
+
+
+def lazy(function, *args):
+    """Returns a message argument whose value is function(*args), computed only if the
+    record is formatted. Use it with the %s placeholder.
+
+    function: The function that computes the value.
+    args: The arguments passed to function.
+    """
+    return _LazyValue(function, args)
+
+
+def refresh_levels():
+    """Refreshes the cached enabled flags of every CachedLogger now instead of on their
+    next call.
+    """
+    for cached_logger in list(_CACHED_LOGGERS):
+        cached_logger.refresh()
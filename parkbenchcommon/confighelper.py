@@ -15,18 +15,64 @@
 
 """ confighelper.confighelper helps read and validate options from a ConfigParser object."""
 
-__all__ = ['ConfigHelper', 'ValidationException']
+__all__ = ['ConfigHelper', 'ConfigOption', 'ConfigReloader', 'ConfigSchema', 'Settings',
+           'ValidationException']
 __author__ = 'Joel Luellwitz and Emily Frost'
 __version__ = '0.8'
 
+import array
+import atexit
+import configparser
 import logging
-import logging.config
+import logging.handlers
+import marshal
+import mmap
+import os
+import queue
+import re
 import sys
+import threading
+from parkbenchcommon import cachedlogger
+from parkbenchcommon import daemonhelper
+from parkbenchcommon import loghandlers
+from parkbenchcommon import metrics
+from parkbenchcommon import startuptracer
 
-TRACE_LEVEL_NUMBER = 5  # debug is 10, error is 20, and so on.
+TRACE_LEVEL_NUMBER = cachedlogger.TRACE_LEVEL_NUMBER
+
+LOG_BUFFER_SIZE = 65536  # The log file write buffer size in bytes when buffering.
+
+LOG_HANDLER_NAMES = ['console', 'file', 'journal', 'syslog']
+SYSLOG_SOCKET_PATH = '/dev/log'
 
 OPTION_LABEL = 'Option %s: %s'
 OPTION_MISSING_ERROR_MESSAGE = 'Option %s not found.'
+PASSWORD_EXISTS_MESSAGE = 'Password %s exists.'
+
+OPTION_TYPES = ['boolean', 'integer', 'integer_list', 'integer_set', 'number', 'number_list',
+                'password', 'string', 'string_list']
+
+# Matches one stripped item of an integer list: a single integer or an inclusive range like
+#   10-20. Whitespace is only allowed around the range separator.
+INTEGER_LIST_ITEM_PATTERN = re.compile(r'^(-?[0-9]+)(?:\s*-\s*(-?[0-9]+))?$')
+INTEGER_ARRAY_TYPECODE = 'q'
+INTEGER_LIST_MINIMUM = -2 ** 63
+INTEGER_LIST_MAXIMUM = 2 ** 63 - 1
+# The most integers a list may expand to, so a range like 0-9999999999 cannot exhaust
+#   memory.
+INTEGER_LIST_MAX_ITEMS = 1048576
+
+# A settings snapshot is the magic number, the SHA-256 digest of the configuration file, the
+#   SHA-256 digest of the schema, and then the marshalled option values.
+SETTINGS_SNAPSHOT_MAGIC = b'PBCSET01'
+SETTINGS_SNAPSHOT_DIGEST_SIZE = 32
+SETTINGS_SNAPSHOT_HEADER_SIZE = len(SETTINGS_SNAPSHOT_MAGIC) + \
+    2 * SETTINGS_SNAPSHOT_DIGEST_SIZE
+
+VALIDATION_FAILURES = metrics.counter(
+    'parkbench_config_validation_failures_total', 'Configuration validation failures.')
+CONFIG_RELOADS = metrics.counter(
+    'parkbench_config_reloads_total', 'Configuration file reloads.', ('result',))
 
 
 def _trace(self, message, *args, **kwargs):
@@ -55,20 +101,95 @@ class ConfigHelper():
 
         self.logger = logging.getLogger()
 
+        # The handlers that format and write records, as opposed to any QueueHandler placed
+        #   in front of them.
+        self.log_handlers = []
+        self.log_queue = None
+        self.log_queue_handler = None
+        self.log_queue_listener = None
+        self._log_listener_pid = None
+        self._fork_handler_registered = False
+
     def get_log_file_handle(self):
         """Returns the file handler for the log file.  Mostly used for preserving file
-        descriptors upon daemonization.
+        descriptors upon daemonization.  When processes are aggregated, forked processes
+        log through a socket instead, so use get_log_fds to get every descriptor to
+        preserve.
         """
 
+        for handler in self.log_handlers:
+            if isinstance(handler, logging.FileHandler):
+                return handler.stream.fileno()
+
+        if self.log_handlers:
+            # No file handler is configured.
+            return None
+
         return self.logger.handlers[0].stream.fileno()
 
-    def configure_logger(self, log_file, log_level):
+    def get_log_fds(self):
+        """Returns a list of the file descriptors a forked process must keep open to keep
+        logging, for example to pass as WorkerSupervisor's preserved_fds. Includes the log
+        file and, when processes are aggregated, the socket records are sent over.
+        """
+        log_fds = []
+        log_file_handle = self.get_log_file_handle()
+        if log_file_handle is not None:
+            log_fds.append(log_file_handle)
+        if isinstance(self.log_queue, loghandlers.DatagramQueue):
+            log_fds.extend(self.log_queue.fds())
+        return log_fds
+
+    @startuptracer.traced('confighelper.configure_logger')
+    def configure_logger(self, log_file, log_level, queued=False, queue_size=10000,
+                         overflow_policy='block', max_bytes=0, max_age=0, backup_count=5,
+                         buffered=False, flush_level='WARNING', flush_interval=1.0,
+                         log_format='text', rate_limit_count=0, rate_limit_interval=60,
+                         handlers=('file', 'console'), handler_levels=None,
+                         aggregate_processes=False):
         """Applies the configuration defined in _get_logger_config and adds a trace
         log level.  This should be run as soon as the log level is known.
 
-        log_file: The pathname of the file to log to.
+        log_file: The pathname of the file to log to. May be None if handlers does not
+            include 'file'.
         log_level: Indicates the verbosity of the logging. Valid levels are TRACE, DEBUG,
             INFO, WARNING, ERROR, and CRITICAL.
+        queued: If True, logging calls only place records on a queue, and a background
+            thread formats and writes them. The thread is stopped and the queue is drained
+            at exit.
+        queue_size: The maximum number of records waiting in the queue in queued mode.
+        overflow_policy: What to do with a record when the queue is full in queued mode.
+            One of 'block', 'drop_oldest', or 'drop_debug'. See loghandlers.
+        max_bytes: The size in bytes after which the log file is rotated. 0 disables size
+            based rotation.
+        max_age: The number of seconds after which the log file is rotated. 0 disables age
+            based rotation.
+        backup_count: The number of rotated log files to keep. Rotated files are compressed
+            in a background thread.
+        buffered: If True, log file writes are batched in memory. The buffer is written
+            after any record at or above flush_level and every flush_interval seconds.
+        flush_level: The level that causes a buffered log file to be written immediately.
+        flush_interval: The maximum number of seconds records stay in the buffer.
+        log_format: 'text' for the default human readable format, or 'json' or 'logfmt'
+            for one structured record per line. See loghandlers.StructuredFormatter.
+        rate_limit_count: The number of records with the same logger and message template
+            written per rate_limit_interval. Further records are counted and summarized
+            when the interval ends. 0 disables rate limiting.
+        rate_limit_interval: The length of the rate limiting interval in seconds.
+        handlers: The names of the handlers to log to. Any of 'file', 'console' (stdout),
+            'syslog' (the local syslog socket), and 'journal' (the local systemd journal
+            socket). Under a service manager that captures stdout, omit 'console' to
+            avoid writing every record twice.
+        handler_levels: A dict of log levels keyed by handler name for handlers that
+            should use a level other than log_level.
+        aggregate_processes: If True, this process and every process forked from it send
+            their records over an inherited Unix datagram socket to a background thread in
+            this process, which is the only writer of the log file. This keeps lines from
+            different processes whole and in order. Senders wait for up to a second if the
+            writer falls behind and then drop the record, so queue_size and
+            overflow_policy do not apply. Combine with buffered to batch the writer's file
+            writes. Forked processes that close inherited descriptors must keep the ones
+            returned by get_log_fds.
         """
 
         # Make it all uppercase because none of the other config file options
@@ -79,8 +200,92 @@ class ConfigHelper():
         logging.addLevelName(TRACE_LEVEL_NUMBER, 'TRACE')
         logging.Logger.trace = _trace
 
-        logging_config = self._get_logger_config(log_file, log_level)
-        logging.config.dictConfig(logging_config)
+        self._stop_log_queue_listener()
+        self.log_queue = None
+        self.log_queue_handler = None
+
+        logging_config = self._get_logger_config(
+            log_file, log_level, max_bytes=max_bytes, max_age=max_age,
+            backup_count=backup_count, buffered=buffered, flush_level=flush_level.upper(),
+            flush_interval=flush_interval, log_format=log_format, handlers=handlers,
+            handler_levels=handler_levels)
+        # Deferred because logging.config is only needed to configure the logger.
+        from logging.config import dictConfig
+        dictConfig(logging_config)
+
+        root_logger = logging.getLogger()
+        self.log_handlers = list(root_logger.handlers)
+
+        if aggregate_processes:
+            self.log_queue = loghandlers.DatagramQueue()
+            self.log_queue_handler = loghandlers.DatagramQueueHandler(self.log_queue)
+        elif queued:
+            self.log_queue = queue.Queue(queue_size)
+            self.log_queue_handler = loghandlers.BoundedQueueHandler(
+                self.log_queue, overflow_policy)
+
+        if self.log_queue_handler is not None:
+            self.log_queue_listener = logging.handlers.QueueListener(
+                self.log_queue, *self.log_handlers, respect_handler_level=True)
+            for handler in self.log_handlers:
+                root_logger.removeHandler(handler)
+            root_logger.addHandler(self.log_queue_handler)
+            self.log_queue_listener.start()
+            self._log_listener_pid = os.getpid()
+
+            if not self._fork_handler_registered:
+                atexit.register(self._stop_log_queue_listener)
+                os.register_at_fork(after_in_child=self._unqueue_logging_in_child)
+                self._fork_handler_registered = True
+
+        cachedlogger.refresh_levels()
+
+        if rate_limit_count:
+            # Filter before queueing so suppressed records never reach the queue.
+            front_handlers = self.log_handlers if self.log_queue_handler is None \
+                else [self.log_queue_handler]
+            for handler in front_handlers:
+                handler.addFilter(loghandlers.RateLimitingFilter(
+                    handler, rate_limit_count, rate_limit_interval))
+
+    def _stop_log_queue_listener(self):
+        """Stops the background logging thread, if any, after it writes all queued
+        records.
+        """
+        # Forked children inherit atexit handlers but must not stop the parent's listener.
+        if self.log_queue_listener is not None and self._log_listener_pid == os.getpid():
+            self.log_queue_listener.stop()
+            if isinstance(self.log_queue, loghandlers.DatagramQueue):
+                self.log_queue.close()
+            self.log_queue_listener = None
+            self.log_queue_handler = None
+            self.log_queue = None
+
+    def _unqueue_logging_in_child(self):
+        """Makes a forked child write log records directly, because the background logging
+        thread does not exist in the child. Children keep sending records to the parent
+        when processes are aggregated. Filters on the queue handler, such as rate
+        limiting, move to the handlers the child writes to.
+        """
+        if isinstance(self.log_queue, loghandlers.DatagramQueue):
+            # Otherwise, the socket pair would still have a reader after this process's
+            #   parent exits, and sends would wait for the timeout instead of failing.
+            self.log_queue.close_receiver()
+            self.log_queue_listener = None
+        elif self.log_queue_listener is not None:
+            root_logger = logging.getLogger()
+            root_logger.removeHandler(self.log_queue_handler)
+            for handler in self.log_handlers:
+                for log_filter in self.log_queue_handler.filters:
+                    if isinstance(log_filter, loghandlers.RateLimitingFilter):
+                        # Summaries must go to the handler the filter is attached to.
+                        log_filter = loghandlers.RateLimitingFilter(
+                            handler, log_filter.max_count, log_filter.interval)
+                    handler.addFilter(log_filter)
+                root_logger.addHandler(handler)
+            self.log_queue_listener = None
+            self.log_queue_handler = None
+            self.log_queue = None
 
     def verify_string_exists(self, config_file, option_name):
         """Verifies an option exists in the application configuration file.  This method
@@ -96,6 +301,7 @@ class ConfigHelper():
 
         return option_text
 
+    @startuptracer.traced('confighelper.read_option')
     def verify_password_exists(self, config_file, option_name):
         """Verifies a password exists in the application configuration file.  This method
         does not log the value of the config parameter.  This method assumes a logger has
@@ -117,9 +323,10 @@ class ConfigHelper():
         if option_value is None:
             message = OPTION_MISSING_ERROR_MESSAGE % option_name
             self.logger.error(message)
+            VALIDATION_FAILURES.inc()
             raise ValidationException(message)
 
-        self.logger.info('Password %s exists.', option_name)
+        self.logger.info(PASSWORD_EXISTS_MESSAGE, option_name)
         return option_value
 
     def verify_number_exists(self, config_file, option_name):
@@ -134,15 +341,7 @@ class ConfigHelper():
         self.logger.debug('Verifying numeric option %s.', option_name)
         option_text = self._require_option(config_file, option_name)
 
-        try:
-            float_value = float(option_text)
-        except ValueError:
-            message = 'Option %s has a value of %s but that is not a number.' % (
-                option_name, option_text)
-            self.logger.error(message)
-            raise ValidationException(message)
-
-        return float_value
+        return self._parse_number(option_name, option_text)
 
     def verify_integer_exists(self, config_file, option_name):
         """Verifies an integer option exists in the application configuration file.  This
@@ -156,16 +355,7 @@ class ConfigHelper():
         self.logger.debug('Verifying integer option %s.', option_name)
         option_text = self._require_option(config_file, option_name)
 
-        try:
-            int_value = int(option_text)
-        except ValueError:
-            message = \
-                'Option %s has a value of %s but that is not an integer.' % \
-                (option_name, option_text)
-            self.logger.error(message)
-            raise ValidationException(message)
-
-        return int_value
+        return self._parse_integer(option_name, option_text)
 
     def verify_number_within_range(
             self, config_file, option_name, lower_bound=None, upper_bound=None):
@@ -216,6 +406,7 @@ class ConfigHelper():
                 message = 'Option has a value of %s, which is below lower boundary %s.' % (
                     value, lower_bound)
                 self.logger.error(message)
+                VALIDATION_FAILURES.inc()
                 raise ValidationException(message)
 
         if upper_bound is not None:
@@ -223,6 +414,7 @@ class ConfigHelper():
                 message = 'Option has a value of %s, which is equal to or above upper ' \
                           'boundary %s.' % (value, upper_bound)
                 self.logger.error(message)
+                VALIDATION_FAILURES.inc()
                 raise ValidationException(message)
 
     def verify_valid_integer_in_list(self, config_file, option_name, valid_options):
@@ -237,14 +429,24 @@ class ConfigHelper():
 
         self.logger.debug('Verifying integer option %s.', option_name)
         int_value = self.verify_integer_exists(config_file, option_name)
+        self._valid_value_check(option_name, int_value, valid_options)
 
-        if int_value not in valid_options:
-            message = '%s is not a valid value for %s.' % (int_value, option_name)
+        return int_value
+
+    def _valid_value_check(self, option_name, value, valid_options):
+        """Checks that the value is one of the valid options and raises a
+        ValidationException if it is not.
+
+        option_name: The name of the option being validated.
+        value: The value being validated.
+        valid_options: A container of acceptable values.
+        """
+        if value not in valid_options:
+            message = '%s is not a valid value for %s.' % (value, option_name)
             self.logger.error(message)
+            VALIDATION_FAILURES.inc()
             raise ValidationException(message)
 
-        return int_value
-
     def verify_number_list_exists(self, config_file, option_name):
         """Verifies an option in the application configuration file contains a comma
         delimited list of numbers.  This method assumes a logger has been instantiated.
@@ -257,20 +459,31 @@ class ConfigHelper():
         self.logger.debug('Verifying numeric list option %s.', option_name)
         option_text = self._require_option(config_file, option_name)
 
-        string_array = option_text.split(',')
-        float_array = []
+        return self._parse_number_list(option_name, option_text)
 
-        for string_value in string_array:
-            try:
-                float_value = float(string_value.strip())
-            except ValueError:
-                message = 'Option %s has a value of %s but that is not a list of numbers.' \
-                    % (option_name, option_text)
-                self.logger.error(message)
-                raise ValidationException(message)
-            float_array.append(float_value)
+    def verify_integer_list_exists(self, config_file, option_name, lower_bound=None,
+                                   upper_bound=None, as_set=False):
+        """Verifies an option in the application configuration file contains a comma
+        delimited list of integers and inclusive integer ranges, such as
+        '1-1024,2000,3000-3100', and that every integer is within the bounds.  This method
+        assumes a logger has been instantiated.
 
-        return float_array
+        config_file: The ConfigParser instance.
+        option_name: The name of the option being retrieved.
+        lower_bound: The quantity no value should be less than.
+        upper_bound: The quantity no value should be equal to or greater than.
+        as_set: If True, returns a frozenset for fast membership tests instead of an array.
+        Returns the option value as an array.array of 64-bit integers in the listed order,
+          or as a frozenset.
+        """
+
+        self.logger.debug('Verifying integer list option %s.', option_name)
+        option_text = self._require_option(config_file, option_name)
+
+        integers = self._parse_integer_list(
+            option_name, option_text, lower_bound, upper_bound)
+
+        return frozenset(integers) if as_set else integers
 
     def get_string_list_if_exists(self, config_file, option_name):
         """Parses a comma-delimited list of strings into an actual list and strips
@@ -286,10 +499,7 @@ class ConfigHelper():
 
         strings = []
         if option_text:
-            raw_strings = option_text.split(',')
-
-            # run strip() on each item in raw_string_array
-            strings = [string.strip() for string in raw_strings]
+            strings = self._parse_string_list(option_text)
         return strings
 
     def verify_string_list_exists(self, config_file, option_name):
@@ -301,11 +511,8 @@ class ConfigHelper():
         Returns the option value as an array of strings.
         """
         option_text = self.verify_string_exists(config_file, option_name)
-        raw_strings = option_text.split(',')
 
-        # run strip() on each item in raw_string_array
-        trimmed_strings = [string.strip() for string in raw_strings]
-        return trimmed_strings
+        return self._parse_string_list(option_text)
 
     def verify_boolean_exists(self, config_file, option_name):
         """Verifies a boolean option exists in the application configuration file.  This
@@ -315,17 +522,9 @@ class ConfigHelper():
         option_name: The name of the option being retrieved.
         Returns the option value as a boolean.
         """
-        option_text = self._require_option(config_file, option_name).lower()
-        if option_text == 'true':
-            boolean_value = True
-        elif option_text == 'false':
-            boolean_value = False
-        else:
-            message = 'Option %s is not "true" or "false".' % option_name
-            self.logger.error(message)
-            raise ValidationException(message)
+        option_text = self._require_option(config_file, option_name)
 
-        return boolean_value
+        return self._parse_boolean(option_name, option_text)
 
     def get_string_if_exists(self, config_file, option_name):
         """Just grab a string from the config file.  Don't verify anything, and
@@ -341,6 +540,345 @@ class ConfigHelper():
 
         return option_value
 
+    def load_settings(self, config_file, schema):
+        """Validates every option declared in a ConfigSchema in a single pass over the
+        configuration file and returns them as an immutable Settings object. Options are
+        validated with the same rules as the corresponding verify_* methods.  This method
+        assumes a logger has been instantiated.
+
+        config_file: The ConfigParser instance.
+        schema: The ConfigSchema declaring the options to read.
+        Returns an instance of schema.settings_class with one attribute per option.
+        """
+        self.logger.debug('Loading settings.')
+
+        section = {}
+        if config_file.has_section(self.global_section_name):
+            section = dict(config_file.items(self.global_section_name))
+
+        values = []
+        for option in schema.options:
+            option_text = section.get(option.name)
+            if not option_text:
+                if option.required:
+                    message = OPTION_MISSING_ERROR_MESSAGE % option.name
+                    self.logger.error(message)
+                    VALIDATION_FAILURES.inc()
+                    raise ValidationException(message)
+                values.append(option.default)
+                continue
+
+            if option.option_type == 'password':
+                self.logger.info(PASSWORD_EXISTS_MESSAGE, option.name)
+            else:
+                self.logger.info(OPTION_LABEL, option.name, option_text)
+
+            value = self._parse_option(option, option_text)
+            if option.option_type in ('integer', 'number') and (
+                    option.lower_bound is not None or option.upper_bound is not None):
+                self._boundary_check(value, lower_bound=option.lower_bound,
+                                     upper_bound=option.upper_bound)
+            if option.valid_values is not None:
+                self._valid_value_check(option.name, value, option.valid_values)
+            values.append(value)
+
+        return schema.settings_class(values)
+
+    def publish_settings_snapshot(self, config_path, schema, snapshot_path,
+                                  config_parser_class=configparser.ConfigParser,
+                                  mode=0o600):
+        """Reads and validates a configuration file and publishes the validated values as an
+        immutable binary snapshot that worker processes can load with
+        load_settings_snapshot. The snapshot is keyed by a hash of the configuration file
+        and of the schema, so if a snapshot of the same file and schema already exists,
+        its values are used and the file is not validated again. The snapshot is written
+        to a temporary file and renamed into place, so readers never see a partial
+        snapshot. It should be published on the program's ramdisk, especially when the
+        schema contains passwords.
+
+        config_path: The pathname of the configuration file.
+        schema: The ConfigSchema declaring the options to read.
+        snapshot_path: The pathname of the snapshot to write.
+        config_parser_class: The ConfigParser class used to read the file.
+        mode: The permissions of the snapshot file.
+        Returns the Settings object.
+        """
+        import hashlib
+        with open(config_path, 'rb') as config_stream:
+            config_bytes = config_stream.read()
+        config_digest = hashlib.sha256(config_bytes).digest()
+
+        try:
+            with open(snapshot_path, 'rb') as snapshot_file:
+                header = snapshot_file.read(SETTINGS_SNAPSHOT_HEADER_SIZE)
+        except FileNotFoundError:
+            header = None
+        if header == SETTINGS_SNAPSHOT_MAGIC + config_digest + schema.digest:
+            self.logger.info(
+                'Configuration file %s is unchanged. Using settings snapshot %s.',
+                config_path, snapshot_path)
+            return self.load_settings_snapshot(snapshot_path, schema)
+
+        config_file = config_parser_class()
+        config_file.read_string(config_bytes.decode(), config_path)
+        settings = self.load_settings(config_file, schema)
+
+        values = []
+        for option in schema.options:
+            value = getattr(settings, option.attribute_name)
+            if isinstance(value, array.array):
+                value = value.tobytes()
+            values.append(value)
+
+        with daemonhelper.write_atomically(snapshot_path, mode, binary=True) \
+                as snapshot_file:
+            snapshot_file.write(SETTINGS_SNAPSHOT_MAGIC + config_digest + schema.digest)
+            marshal.dump(tuple(values), snapshot_file)
+
+        self.logger.info('Published settings snapshot %s.', snapshot_path)
+        return settings
+
+    def load_settings_snapshot(self, snapshot_path, schema):
+        """Loads a settings snapshot written by publish_settings_snapshot. The snapshot is
+        mapped read-only and its values are used without parsing, validating, or logging
+        them again. Raises a ValidationException if the snapshot is missing, corrupt, or
+        was written for a different schema.
+
+        snapshot_path: The pathname of the snapshot.
+        schema: The ConfigSchema the snapshot was written with.
+        Returns the Settings object.
+        """
+        try:
+            with open(snapshot_path, 'rb') as snapshot_file:
+                if os.fstat(snapshot_file.fileno()).st_size <= \
+                        SETTINGS_SNAPSHOT_HEADER_SIZE:
+                    raise ValueError('Snapshot is truncated.')
+                with mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ) \
+                        as snapshot_map:
+                    values = self._read_settings_snapshot(snapshot_map, schema)
+        except (OSError, ValueError, EOFError, TypeError) as exception:
+            message = 'Could not load settings snapshot %s. %s' % (snapshot_path, exception)
+            self.logger.error(message)
+            VALIDATION_FAILURES.inc()
+            raise ValidationException(message)
+
+        for index, option in enumerate(schema.options):
+            if option.option_type == 'integer_list' and isinstance(values[index], bytes):
+                values[index] = array.array(INTEGER_ARRAY_TYPECODE, values[index])
+
+        return schema.settings_class(values)
+
+    def _read_settings_snapshot(self, snapshot_map, schema):
+        """Checks the header of a mapped settings snapshot and unmarshals its values.
+
+        snapshot_map: The mmap of the snapshot file.
+        schema: The ConfigSchema the snapshot was written with.
+        Returns the option values as a list in schema order.
+        """
+        magic_size = len(SETTINGS_SNAPSHOT_MAGIC)
+        if snapshot_map[:magic_size] != SETTINGS_SNAPSHOT_MAGIC:
+            raise ValueError('Not a settings snapshot.')
+        if snapshot_map[magic_size + SETTINGS_SNAPSHOT_DIGEST_SIZE:
+                        SETTINGS_SNAPSHOT_HEADER_SIZE] != schema.digest:
+            raise ValueError('Snapshot was written for a different schema.')
+
+        with memoryview(snapshot_map) as snapshot_view:
+            with snapshot_view[SETTINGS_SNAPSHOT_HEADER_SIZE:] as values_view:
+                values = list(marshal.loads(values_view))
+
+        if len(values) != len(schema.options):
+            raise ValueError('Snapshot has the wrong number of options.')
+        return values
+
+    def _parse_option(self, option, option_text):
+        """Converts the text of an option to the type declared by its ConfigOption.
+
+        option: The ConfigOption declaring the option.
+        option_text: The option value as a non-empty string.
+        Returns the converted option value.
+        """
+        option_type = option.option_type
+        if option_type in ('string', 'password'):
+            value = option_text
+        elif option_type == 'number':
+            value = self._parse_number(option.name, option_text)
+        elif option_type == 'integer':
+            value = self._parse_integer(option.name, option_text)
+        elif option_type == 'boolean':
+            value = self._parse_boolean(option.name, option_text)
+        elif option_type == 'number_list':
+            value = self._parse_number_list(option.name, option_text)
+        elif option_type in ('integer_list', 'integer_set'):
+            value = self._parse_integer_list(
+                option.name, option_text, option.lower_bound, option.upper_bound)
+            if option_type == 'integer_set':
+                value = frozenset(value)
+        else:
+            value = self._parse_string_list(option_text)
+        return value
+
+    def _parse_number(self, option_name, option_text):
+        """Converts option text to a number and raises a ValidationException if it is not
+        a number.
+
+        option_name: The name of the option being converted.
+        option_text: The option value as a string.
+        Returns the option value as a number.
+        """
+        try:
+            float_value = float(option_text)
+        except ValueError:
+            message = 'Option %s has a value of %s but that is not a number.' % (
+                option_name, option_text)
+            self.logger.error(message)
+            VALIDATION_FAILURES.inc()
+            raise ValidationException(message)
+
+        return float_value
+
+    def _parse_integer(self, option_name, option_text):
+        """Converts option text to an integer and raises a ValidationException if it is
+        not an integer.
+
+        option_name: The name of the option being converted.
+        option_text: The option value as a string.
+        Returns the option value as an integer.
+        """
+        try:
+            int_value = int(option_text)
+        except ValueError:
+            message = \
+                'Option %s has a value of %s but that is not an integer.' % \
+                (option_name, option_text)
+            self.logger.error(message)
+            VALIDATION_FAILURES.inc()
+            raise ValidationException(message)
+
+        return int_value
+
+    def _parse_boolean(self, option_name, option_text):
+        """Converts option text to a boolean and raises a ValidationException if it is not
+        "true" or "false".
+
+        option_name: The name of the option being converted.
+        option_text: The option value as a string.
+        Returns the option value as a boolean.
+        """
+        option_text = option_text.lower()
+        if option_text == 'true':
+            boolean_value = True
+        elif option_text == 'false':
+            boolean_value = False
+        else:
+            message = 'Option %s is not "true" or "false".' % option_name
+            self.logger.error(message)
+            VALIDATION_FAILURES.inc()
+            raise ValidationException(message)
+
+        return boolean_value
+
+    def _parse_number_list(self, option_name, option_text):
+        """Converts a comma delimited option to a list of numbers and raises a
+        ValidationException if any item is not a number.
+
+        option_name: The name of the option being converted.
+        option_text: The option value as a string.
+        Returns the option value as an array of numbers.
+        """
+        string_array = option_text.split(',')
+        float_array = []
+
+        for string_value in string_array:
+            try:
+                float_value = float(string_value.strip())
+            except ValueError:
+                message = 'Option %s has a value of %s but that is not a list of numbers.' \
+                    % (option_name, option_text)
+                self.logger.error(message)
+                VALIDATION_FAILURES.inc()
+                raise ValidationException(message)
+            float_array.append(float_value)
+
+        return float_array
+
+    def _parse_integer_list(self, option_name, option_text, lower_bound=None,
+                            upper_bound=None):
+        """Converts a comma delimited list of integers and inclusive integer ranges to an
+        array and raises a ValidationException if any item is invalid, does not fit in 64
+        bits, or is outside the bounds, or if the list expands to more than
+        INTEGER_LIST_MAX_ITEMS integers. Everything is checked before any range is
+        expanded.
+
+        option_name: The name of the option being converted.
+        option_text: The option value as a string.
+        lower_bound: The quantity no value should be less than.
+        upper_bound: The quantity no value should be equal to or greater than.
+        Returns the option value as an array.array of 64-bit integers.
+        """
+        ranges = []
+        item_count = 0
+
+        for item in option_text.split(','):
+            item = item.strip()
+            match = INTEGER_LIST_ITEM_PATTERN.match(item)
+            if match is None:
+                message = 'Option %s has a value of %s but that is not a list of integers.' \
+                    % (option_name, option_text)
+                self.logger.error(message)
+                VALIDATION_FAILURES.inc()
+                raise ValidationException(message)
+
+            range_start, range_end = match.groups()
+            range_start = int(range_start)
+            range_end = range_start if range_end is None else int(range_end)
+            for value in (range_start, range_end):
+                if value < INTEGER_LIST_MINIMUM or value > INTEGER_LIST_MAXIMUM:
+                    message = 'Option %s has a value of %s, which does not fit in 64 ' \
+                        'bits.' % (option_name, value)
+                    self.logger.error(message)
+                    VALIDATION_FAILURES.inc()
+                    raise ValidationException(message)
+            if range_end < range_start:
+                message = 'Option %s has a range %s that ends before it starts.' % (
+                    option_name, item)
+                self.logger.error(message)
+                VALIDATION_FAILURES.inc()
+                raise ValidationException(message)
+
+            # Every value in a range is within the bounds if both of its ends are.
+            if lower_bound is not None or upper_bound is not None:
+                self._boundary_check(range_start, lower_bound=lower_bound,
+                                     upper_bound=upper_bound)
+                self._boundary_check(range_end, lower_bound=lower_bound,
+                                     upper_bound=upper_bound)
+
+            item_count += range_end - range_start + 1
+            if item_count > INTEGER_LIST_MAX_ITEMS:
+                message = 'Option %s has more than %d integers.' % (
+                    option_name, INTEGER_LIST_MAX_ITEMS)
+                self.logger.error(message)
+                VALIDATION_FAILURES.inc()
+                raise ValidationException(message)
+            ranges.append((range_start, range_end))
+
+        integers = array.array(INTEGER_ARRAY_TYPECODE)
+        for range_start, range_end in ranges:
+            integers.extend(range(range_start, range_end + 1))
+
+        return integers
+
+    def _parse_string_list(self, option_text):
+        """Splits a comma delimited option into a list of strings with leading and trailing
+        whitespace stripped.
+
+        option_text: The option value as a string.
+        Returns the option value as an array of strings.
+        """
+        raw_strings = option_text.split(',')
+
+        # run strip() on each item in raw_string_array
+        return [string.strip() for string in raw_strings]
+
     def _require_option(self, config_file, option_name):
         """Retrieves the requested option from the ConfigParser instance and throws a
         ValidationException if the option does not exist.
@@ -354,10 +892,12 @@ class ConfigHelper():
         if option_value is None:
             message = OPTION_MISSING_ERROR_MESSAGE % option_name
             self.logger.error(message)
+            VALIDATION_FAILURES.inc()
             raise ValidationException(message)
 
         return option_value
 
+    @startuptracer.traced('confighelper.read_option')
     def _get_option(self, config_file, option_name):
         """Retrieves the requested option from the ConfigParser instance.
 
@@ -377,19 +917,33 @@ class ConfigHelper():
 
         return option_value
 
-    # TODO: Eventually, look into adding log rotation to our logging config. (issue 4)
-    def _get_logger_config(self, log_file, log_level):
+    def _get_logger_config(self, log_file, log_level, max_bytes=0, max_age=0,
+                           backup_count=5, buffered=False, flush_level='WARNING',
+                           flush_interval=1.0, log_format='text',
+                           handlers=('file', 'console'), handler_levels=None):
         """Returns a dict that defines the logging options we like:
-        The informative formatter.
+        The informative formatter, or a structured formatter if log_format is not 'text'.
         A stdout handler.
-        A file handler.
+        A file handler, which rotates the log file if max_bytes or max_age is set and
+          batches writes if buffered is set.
+        Syslog and journal handlers, which leave timestamps to the receiving daemon.
+        Only the handlers named in handlers are attached.
         """
+        for handler_name in handlers:
+            if handler_name not in LOG_HANDLER_NAMES:
+                raise ValueError('Unknown log handler %s.' % handler_name)
 
         logger_config = {
             'version': 1,
             'formatters': {
                 'default': {
                     'format': '%(asctime)s [%(levelname)s] %(name)s: %(message)s'
+                },
+                'syslog': {
+                    'format': '[%(levelname)s] %(name)s: %(message)s'
+                },
+                'message': {
+                    'format': '%(message)s'
                 }
             },
             'handlers': {
@@ -404,13 +958,318 @@ class ConfigHelper():
                     'formatter': 'default',
                     'filename': log_file,
                     'level': log_level
+                },
+                'syslog': {
+                    'class': 'logging.handlers.SysLogHandler',
+                    'formatter': 'syslog',
+                    'address': SYSLOG_SOCKET_PATH,
+                    'level': log_level
+                },
+                'journal': {
+                    'class': 'parkbenchcommon.loghandlers.JournalHandler',
+                    'formatter': 'message',
+                    'level': log_level
                 }
             },
             'loggers': {
                 '': {
-                    'handlers': ['file', 'console'],
+                    'handlers': list(handlers),
                     'level': log_level
                 }
             }
         }
+
+        # dictConfig instantiates every defined handler, so drop the unused ones.
+        for handler_name in LOG_HANDLER_NAMES:
+            if handler_name not in handlers:
+                del logger_config['handlers'][handler_name]
+
+        if handler_levels:
+            for handler_name, handler_level in handler_levels.items():
+                if handler_name in handlers:
+                    logger_config['handlers'][handler_name]['level'] = handler_level.upper()
+            # The root logger must pass records at the lowest level any handler accepts.
+            logger_config['loggers']['']['level'] = min(
+                [log_level] + [handler_config['level'] for handler_config in
+                               logger_config['handlers'].values()],
+                key=logging.getLevelName)
+        if log_format != 'text':
+            logger_config['formatters']['default'] = {
+                '()': 'parkbenchcommon.loghandlers.StructuredFormatter',
+                'output_format': log_format}
+
+        if buffered and 'file' in handlers:
+            logger_config['handlers']['file'].update({
+                'class': 'parkbenchcommon.loghandlers.BufferedFileHandler',
+                'buffer_size': LOG_BUFFER_SIZE,
+                'flush_level': flush_level,
+                'flush_interval': flush_interval})
+
+        if (max_bytes or max_age) and 'file' in handlers:
+            logger_config['handlers']['file'].update({
+                'class': 'parkbenchcommon.loghandlers.CompressingRotatingFileHandler',
+                'max_bytes': max_bytes,
+                'max_age': max_age,
+                'backup_count': backup_count})
+
         return logger_config
+
+
+class ConfigOption():
+    """Declares a single option of a ConfigSchema."""
+
+    def __init__(self, name, option_type='string', lower_bound=None, upper_bound=None,
+                 valid_values=None, required=True, default=None):
+        """Constructor.
+
+        name: The name of the option in the configuration file. The settings attribute name
+          is the option name with dashes replaced by underscores.
+        option_type: One of OPTION_TYPES. 'password' options are strings whose values are
+          never logged. List types are comma delimited. 'integer_list' and 'integer_set'
+          items may also be inclusive ranges like 10-20 and are returned as an array.array
+          and a frozenset respectively.
+        lower_bound: The quantity a numeric value, or every value of an integer list, should
+          not be less than.
+        upper_bound: The quantity a numeric value, or every value of an integer list, should
+          not be equal to or greater than.
+        valid_values: A container of acceptable values, or None to accept any value.
+        required: If True, a ValidationException is raised when the option is missing or
+          blank.
+        default: The value used when an optional option is missing or blank.
+        """
+        if option_type not in OPTION_TYPES:
+            raise ValueError('Option %s has unknown type %s.' % (name, option_type))
+
+        self.name = name
+        self.attribute_name = name.replace('-', '_')
+        self.option_type = option_type
+        self.lower_bound = lower_bound
+        self.upper_bound = upper_bound
+        self.valid_values = valid_values
+        self.required = required
+        self.default = default
+
+        if not self.attribute_name.isidentifier():
+            raise ValueError('Option %s cannot be used as an attribute name.' % name)
+
+
+class Settings():
+    """Base class of the immutable settings objects returned by ConfigHelper.load_settings.
+    Each ConfigSchema creates a subclass with one slot per option.
+    """
+    __slots__ = ()
+    _password_attributes = frozenset()
+
+    def __init__(self, values):
+        """Constructor.
+
+        values: The option values in the order of the slots.
+        """
+        for attribute_name, value in zip(self.__slots__, values):
+            object.__setattr__(self, attribute_name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Settings are read-only.')
+
+    def __delattr__(self, name):
+        raise AttributeError('Settings are read-only.')
+
+    def __repr__(self):
+        return '%s(%s)' % (type(self).__name__, ', '.join(
+            '%s=%r' % (attribute_name, getattr(self, attribute_name))
+            for attribute_name in self.__slots__
+            if attribute_name not in self._password_attributes))
+
+
+class ConfigSchema():
+    """A declarative list of options that ConfigHelper.load_settings validates in one pass.
+
+    options: An iterable of ConfigOption objects.
+    """
+
+    def __init__(self, options):
+        self.options = tuple(options)
+
+        attribute_names = [option.attribute_name for option in self.options]
+        if len(set(attribute_names)) != len(attribute_names):
+            raise ValueError('Schema options must have unique attribute names.')
+
+        password_attributes = frozenset(
+            option.attribute_name for option in self.options
+            if option.option_type == 'password')
+
+        self.settings_class = type('Settings', (Settings,), {
+            '__slots__': tuple(attribute_names),
+            '_password_attributes': password_attributes})
+        self._digest = None
+
+    @property
+    def digest(self):
+        """The SHA-256 digest identifying the schema in settings snapshots. Computed on
+        first use so programs that never use snapshots do not import hashlib.
+        """
+        if self._digest is None:
+            import hashlib
+            # Valid values are sorted so the digest does not depend on set iteration order.
+            schema_description = repr(tuple(
+                (option.name, option.option_type, option.lower_bound, option.upper_bound,
+                 None if option.valid_values is None
+                 else sorted(map(repr, option.valid_values)),
+                 option.required, option.default)
+                for option in self.options))
+            self._digest = hashlib.sha256(schema_description.encode()).digest()
+        return self._digest
+
+
+class ConfigReloader():
+    """Reloads a configuration file when it changes and atomically swaps in a new immutable
+    Settings snapshot. Threads read the current snapshot from the settings attribute
+    without locking; a snapshot never changes once published, so a thread that keeps a
+    reference to one sees a consistent set of values.
+
+    The file is checked by comparing its modification time, size, and inode. If the new
+    file does not pass validation, an error is logged and the previous snapshot is kept.
+    """
+
+    def __init__(self, config_helper, config_path, schema,
+                 config_parser_class=configparser.ConfigParser):
+        """Constructor. Loads and validates the configuration file and raises a
+        ValidationException if it is invalid.
+
+        config_helper: The ConfigHelper used to validate the options.
+        config_path: The pathname of the configuration file.
+        schema: The ConfigSchema declaring the options to read.
+        config_parser_class: The ConfigParser class used to read the file.
+        """
+        self.logger = logging.getLogger(__name__)
+
+        self.config_helper = config_helper
+        self.config_path = config_path
+        self.schema = schema
+        self.config_parser_class = config_parser_class
+
+        # A list of (callback, option names) tuples.
+        self._callbacks = []
+        self._reload_lock = threading.Lock()
+        self._reload_thread = None
+        self._stop_event = threading.Event()
+
+        self._file_signature = self._get_file_signature()
+        self.settings = self._load()
+
+    def add_callback(self, callback, option_names=None):
+        """Registers a function to call after a reload changes option values. Callbacks are
+        called in the thread that performed the reload.
+
+        callback: A function taking the old Settings, the new Settings, and a set of the
+          names of the options that changed.
+        option_names: An iterable of option names the callback is interested in. The
+          callback is only called when one of these options changes. If None, the callback
+          is called when any option changes.
+        """
+        if option_names is not None:
+            option_names = frozenset(option_names)
+        self._callbacks.append((callback, option_names))
+
+    def check(self):
+        """Reloads the configuration file if it has changed since it was last read.
+
+        Returns True if a new snapshot was published. Returns False otherwise.
+        """
+        file_signature = self._get_file_signature()
+        if file_signature == self._file_signature:
+            return False
+
+        return self.reload(file_signature)
+
+    def reload(self, file_signature=None):
+        """Reloads the configuration file, publishes a new snapshot if it is valid, and
+        calls the callbacks for the options that changed.
+
+        file_signature: The signature of the file being loaded, if already known.
+        Returns True if a new snapshot was published. Returns False otherwise.
+        """
+        with self._reload_lock:
+            if file_signature is None:
+                file_signature = self._get_file_signature()
+            self._file_signature = file_signature
+
+            self.logger.info('Reloading configuration file %s.', self.config_path)
+            try:
+                new_settings = self._load()
+            except (ValidationException, configparser.Error, OSError):
+                self.logger.exception(
+                    'Configuration file %s is invalid. Keeping the previous configuration.',
+                    self.config_path)
+                CONFIG_RELOADS.labels('failure').inc()
+                return False
+
+            old_settings = self.settings
+            changed_option_names = {
+                option.name for option in self.schema.options
+                if getattr(old_settings, option.attribute_name) !=
+                getattr(new_settings, option.attribute_name)}
+            self.settings = new_settings
+            CONFIG_RELOADS.labels('success').inc()
+
+            self.logger.info('Configuration reloaded. %d options changed.',
+                             len(changed_option_names))
+
+            if changed_option_names:
+                for callback, option_names in self._callbacks:
+                    if option_names is None or option_names & changed_option_names:
+                        try:
+                            callback(old_settings, new_settings, changed_option_names)
+                        except Exception:
+                            self.logger.exception('Configuration reload callback failed.')
+
+        return True
+
+    def start(self, poll_interval=5):
+        """Calls check in a background thread until stop is called.
+
+        poll_interval: The number of seconds to wait between checks.
+        """
+        self._stop_event.clear()
+        self._reload_thread = threading.Thread(
+            target=self._poll, args=(poll_interval,), name='config-reloader', daemon=True)
+        self._reload_thread.start()
+
+    def stop(self):
+        """Stops the background thread started by start."""
+        self._stop_event.set()
+        if self._reload_thread is not None:
+            self._reload_thread.join()
+            self._reload_thread = None
+
+    def _poll(self, poll_interval):
+        """Checks the configuration file until stop is called.
+
+        poll_interval: The number of seconds to wait between checks.
+        """
+        while not self._stop_event.wait(poll_interval):
+            try:
+                self.check()
+            except Exception:
+                self.logger.exception('Failed to check configuration file %s.',
+                                      self.config_path)
+
+    def _load(self):
+        """Reads and validates the configuration file.
+
+        Returns a new Settings object.
+        """
+        config_file = self.config_parser_class()
+        with open(self.config_path) as config_stream:
+            config_file.read_file(config_stream, self.config_path)
+        return self.config_helper.load_settings(config_file, self.schema)
+
+    def _get_file_signature(self):
+        """Returns a tuple that changes whenever the configuration file is modified or
+        replaced, or None if the file does not exist.
+        """
+        try:
+            config_stat = os.stat(self.config_path)
+        except FileNotFoundError:
+            return None
+        return (config_stat.st_mtime_ns, config_stat.st_size, config_stat.st_ino)
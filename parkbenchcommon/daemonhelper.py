@@ -15,7 +15,29 @@
 
 """Provides daemon-related helper functions for Parkbench projects."""
 
+import contextlib
+import errno
+import logging
 import os
+import select
+import signal
+import stat
+import threading
+import time
+from parkbenchcommon import metrics
+from parkbenchcommon import startuptracer
+
+# How often a worker being stopped is checked for exit, in seconds.
+WORKER_EXIT_POLL_INTERVAL = 0.05
+
+REPORT_TIMESTAMP_FORMAT = '%Y%m%d-%H%M%S'
+
+PERMISSION_CHANGES = metrics.counter(
+    'parkbench_permission_changes_total',
+    'Entries whose ownership or mode was changed by reconcile_tree_permissions.')
+WORKER_EXITS = metrics.counter(
+    'parkbench_worker_exits_total', 'Worker processes that exited unexpectedly.')
+
 
 def create_directories(system_path, program_dirs, uid, gid, mode,
                        keep_existing_permissions=False):
@@ -33,16 +55,755 @@ def create_directories(system_path, program_dirs, uid, gid, mode,
     keep_existing_permissions: If True, do not modify permissions or ownership of any
       directories that already exist.
     """
+    create_directory_trees(
+        system_path, [(program_dirs, uid, gid, mode)], keep_existing_permissions)
+
+
+@startuptracer.traced('daemonhelper.create_directories')
+def create_directory_trees(system_path, directory_specs, keep_existing_permissions=False):
+    """Creates many directory trees under a common system path in one pass and sets the
+    specified ownership and permissions. Directories are created and modified relative to
+    open file descriptors of their parent directories, so symbolic links and renames of
+    path components cannot redirect the changes. Ownership and permissions are only
+    changed when they differ from the requested values.
+
+    system_path: The system path that the directories should be created under.  This is
+      assumed to already exist. The ownership and permissions on this directory are not
+      modified.
+    directory_specs: An iterable of (program_dirs, uid, gid, mode) tuples. program_dirs is
+      a string representing directories that should be created under the system path and
+      the remaining values are the ownership and access mode those directories should take
+      on, as in create_directories. When specs share leading directories, the shared
+      directories are only visited once and take on the ownership and mode of the last
+      spec that lists them.
+    keep_existing_permissions: If True, do not modify permissions or ownership of any
+      directories that already exist.
+    """
+    # Each node is a list of [(uid, gid, mode), children] keyed by directory name.
+    directory_tree = {}
+    for program_dirs, uid, gid, mode in directory_specs:
+        children = directory_tree
+        for directory in program_dirs.strip('/').split('/'):
+            node = children.setdefault(directory, [None, {}])
+            node[0] = (uid, gid, mode)
+            children = node[1]
+
+    system_fd = os.open(system_path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        _create_directory_tree(system_fd, directory_tree, keep_existing_permissions)
+    finally:
+        os.close(system_fd)
 
-    path = system_path
-    for directory in program_dirs.strip('/').split('/'):
-        path = os.path.join(path, directory)
+
+def _create_directory_tree(parent_fd, directory_tree, keep_existing_permissions):
+    """Recursively creates the directories in directory_tree relative to parent_fd and sets
+    their ownership and permissions.
+
+    parent_fd: An open file descriptor of the directory the tree should be created in.
+    directory_tree: A dict of [(uid, gid, mode), children] lists keyed by directory name.
+    keep_existing_permissions: If True, do not modify permissions or ownership of any
+      directories that already exist.
+    """
+    for directory, ((uid, gid, mode), children) in directory_tree.items():
         new_directory = False
-        if not os.path.isdir(path):
-            # Will throw exception if file cannot be created.
-            os.makedirs(path, mode)
+        try:
+            os.mkdir(directory, mode, dir_fd=parent_fd)
             new_directory = True
+        except FileExistsError:
+            pass
+
+        # Will throw exception if the path is not a directory or is a symbolic link.
+        directory_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW,
+                               dir_fd=parent_fd)
+        try:
+            if not keep_existing_permissions or new_directory:
+                directory_stat = os.fstat(directory_fd)
+                ownership_changed = False
+                if directory_stat.st_uid != uid or directory_stat.st_gid != gid:
+                    os.fchown(directory_fd, uid, gid)
+                    ownership_changed = True
+                # Changing ownership can clear setuid and setgid bits, so always reapply the
+                #   mode in that case.
+                if ownership_changed or stat.S_IMODE(directory_stat.st_mode) != mode:
+                    os.fchmod(directory_fd, mode)
+
+            _create_directory_tree(directory_fd, children, keep_existing_permissions)
+        finally:
+            os.close(directory_fd)
+
+
+@startuptracer.traced('daemonhelper.reconcile_tree_permissions')
+def reconcile_tree_permissions(path, uid, gid, directory_mode, file_mode=None,
+                               max_workers=None):
+    """Sets the ownership and permissions of a directory and everything under it, like a
+    recursive chown and chmod, but only changes entries whose ownership or mode differs.
+    Directories are streamed with os.scandir and entries are opened relative to open file
+    descriptors of their parent directories without following symbolic links, so symbolic
+    links and renames of path components cannot redirect the changes. Symbolic links are
+    skipped.
+
+    path: The root of the directory tree to reconcile. The root itself is also reconciled.
+      It must be a directory and must not be a symbolic link.
+    uid: The system user ID that should own the entries.
+    gid: The system group ID that should be associated with the entries.
+    directory_mode: The access mode directories should have.
+    file_mode: The access mode regular files should have. If None, only the ownership of
+      files is reconciled.
+    max_workers: The number of threads to scan directories with. If None or 1, the tree is
+      scanned in the calling thread.
+    Returns the number of entries that were changed.
+    """
+    # Will throw exception if the path is not a directory or is a symbolic link.
+    root_fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW)
+    try:
+        changed_count, subdirectory_names = _reconcile_directory(
+            root_fd, uid, gid, directory_mode, file_mode)
+    except BaseException:
+        os.close(root_fd)
+        raise
+
+    # Subdirectories are opened relative to their parent only when they are scanned, and a
+    #   directory is closed as soon as all of its subdirectories have been scanned, so the
+    #   number of open file descriptors grows with the depth of the tree instead of with
+    #   the number of directories in it.
+    pending_directories = [_PendingDirectory(root_fd, subdirectory_names)]
+    if max_workers is None or max_workers <= 1:
+        try:
+            while pending_directories:
+                parent_directory = pending_directories[-1]
+                if not parent_directory.subdirectory_names:
+                    os.close(pending_directories.pop().directory_fd)
+                    continue
+
+                scan_result = _scan_subdirectory(
+                    parent_directory.directory_fd,
+                    parent_directory.subdirectory_names.pop(), uid, gid, directory_mode,
+                    file_mode)
+                if scan_result is not None:
+                    changed_count += scan_result[2]
+                    pending_directories.append(_PendingDirectory(*scan_result[:2]))
+        finally:
+            for pending_directory in pending_directories:
+                os.close(pending_directory.directory_fd)
+
+    else:
+        # Deferred because most programs never reconcile permissions in parallel.
+        import concurrent.futures
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            running_futures = {}
+            try:
+                while pending_directories:
+                    # Scans the most recently found directories first, so branches are
+                    #   finished and closed before other branches are opened.
+                    for parent_directory in reversed(pending_directories):
+                        while parent_directory.subdirectory_names \
+                                and len(running_futures) < max_workers:
+                            future = executor.submit(
+                                _scan_subdirectory, parent_directory.directory_fd,
+                                parent_directory.subdirectory_names.pop(), uid, gid,
+                                directory_mode, file_mode)
+                            running_futures[future] = parent_directory
+                            parent_directory.running_count += 1
+
+                    done_futures, _ = concurrent.futures.wait(
+                        running_futures, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done_futures:
+                        running_futures.pop(future).running_count -= 1
+                        # Will throw exception if the directory could not be reconciled.
+                        scan_result = future.result()
+                        if scan_result is not None:
+                            changed_count += scan_result[2]
+                            pending_directories.append(
+                                _PendingDirectory(*scan_result[:2]))
+
+                    unfinished_directories = []
+                    for pending_directory in pending_directories:
+                        if pending_directory.subdirectory_names \
+                                or pending_directory.running_count:
+                            unfinished_directories.append(pending_directory)
+                        else:
+                            os.close(pending_directory.directory_fd)
+                    pending_directories = unfinished_directories
+
+            finally:
+                # Directories opened by the remaining scans would otherwise never be
+                #   closed. The scans must finish before their parents are closed.
+                for future in concurrent.futures.as_completed(running_futures):
+                    if future.exception() is None and future.result() is not None:
+                        os.close(future.result()[0])
+                for pending_directory in pending_directories:
+                    os.close(pending_directory.directory_fd)
+
+    PERMISSION_CHANGES.inc(changed_count)
+    return changed_count
+
+
+class _PendingDirectory():
+    """An open directory whose subdirectories have not all been scanned yet."""
+
+    def __init__(self, directory_fd, subdirectory_names):
+        """Constructor.
+
+        directory_fd: An open file descriptor of the directory.
+        subdirectory_names: A list of the names of the subdirectories that have not been
+          scanned yet.
+        """
+        self.directory_fd = directory_fd
+        self.subdirectory_names = subdirectory_names
+        # The number of subdirectories being scanned in other threads.
+        self.running_count = 0
+
+
+def _scan_subdirectory(parent_fd, name, uid, gid, directory_mode, file_mode):
+    """Opens a subdirectory without following symbolic links and reconciles it and the
+    entries in it.
+
+    parent_fd: An open file descriptor of the parent directory.
+    name: The name of the subdirectory.
+    uid: The system user ID that should own the entries.
+    gid: The system group ID that should be associated with the entries.
+    directory_mode: The access mode directories should have.
+    file_mode: The access mode regular files should have, or None.
+    Returns None if the subdirectory was removed or replaced by a symbolic link since it
+      was scanned. Otherwise, returns a tuple of an open file descriptor of the
+      subdirectory, which the caller must close, the list of the names of its
+      subdirectories, and the number of entries changed.
+    """
+    try:
+        directory_fd = os.open(name, os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW,
+                               dir_fd=parent_fd)
+    except FileNotFoundError:
+        return None
+    except OSError as os_error:
+        # ENOTDIR means the directory was replaced by a file.
+        if os_error.errno not in (errno.ELOOP, errno.ENOTDIR):
+            raise
+        return None
+
+    try:
+        changed_count, subdirectory_names = _reconcile_directory(
+            directory_fd, uid, gid, directory_mode, file_mode)
+    except BaseException:
+        os.close(directory_fd)
+        raise
+    return directory_fd, subdirectory_names, changed_count
+
+
+def _reconcile_directory(directory_fd, uid, gid, directory_mode, file_mode):
+    """Reconciles the ownership and permissions of a directory and of its immediate
+    children that are not directories.
+
+    directory_fd: An open file descriptor of the directory.
+    uid: The system user ID that should own the entries.
+    gid: The system group ID that should be associated with the entries.
+    directory_mode: The access mode directories should have.
+    file_mode: The access mode regular files should have, or None.
+    Returns a tuple of the number of entries changed and the list of the names of the
+      subdirectories, which the caller must reconcile with _scan_subdirectory.
+    """
+    changed_count = _reconcile_fd(directory_fd, uid, gid, directory_mode)
+    subdirectory_names = []
+    with os.scandir(directory_fd) as entries:
+        for entry in entries:
+            if entry.is_symlink():
+                continue
+
+            entry_stat = entry.stat(follow_symlinks=False)
+            if stat.S_ISDIR(entry_stat.st_mode):
+                subdirectory_names.append(entry.name)
+                continue
+
+            if not stat.S_ISREG(entry_stat.st_mode):
+                # Opening devices, FIFOs, or sockets can have side effects, so only their
+                #   ownership is reconciled, relative to the directory.
+                if entry_stat.st_uid != uid or entry_stat.st_gid != gid:
+                    os.chown(entry.name, uid, gid, dir_fd=directory_fd,
+                             follow_symlinks=False)
+                    changed_count += 1
+                continue
+
+            # Skips the file if it was removed or replaced by a symbolic link since it was
+            #   scanned. O_NONBLOCK keeps the open from hanging if the file is replaced by a
+            #   FIFO.
+            try:
+                file_fd = os.open(
+                    entry.name, os.O_RDONLY | os.O_NONBLOCK | os.O_NOCTTY | os.O_NOFOLLOW,
+                    dir_fd=directory_fd)
+            except FileNotFoundError:
+                continue
+            except OSError as os_error:
+                if os_error.errno != errno.ELOOP:
+                    raise
+                continue
+
+            try:
+                changed_count += _reconcile_fd(file_fd, uid, gid, file_mode)
+            finally:
+                os.close(file_fd)
+
+    return changed_count, subdirectory_names
+
+
+def _reconcile_fd(entry_fd, uid, gid, mode):
+    """Changes the ownership and permissions of an open entry if they differ from the
+    requested values.
+
+    entry_fd: An open file descriptor of the entry.
+    uid: The system user ID that should own the entry.
+    gid: The system group ID that should be associated with the entry.
+    mode: The access mode the entry should have, or None to leave the mode alone.
+    Returns 1 if the entry was changed. Returns 0 otherwise.
+    """
+    entry_stat = os.fstat(entry_fd)
+    changed = False
+    if entry_stat.st_uid != uid or entry_stat.st_gid != gid:
+        os.fchown(entry_fd, uid, gid)
+        changed = True
+        # Changing ownership can clear setuid and setgid bits, so reapply the prior mode.
+        if mode is None:
+            mode = stat.S_IMODE(entry_stat.st_mode)
+
+    if mode is not None and (changed or stat.S_IMODE(entry_stat.st_mode) != mode):
+        os.fchmod(entry_fd, mode)
+        changed = True
+
+    return 1 if changed else 0
+
+
+@contextlib.contextmanager
+def write_atomically(path, mode=0o600, binary=False):
+    """Opens a uniquely named temporary file next to path for writing and renames it to
+    path when the with block completes, so readers never see a partial file and a failed
+    write never replaces an existing one. The temporary file is synced to disk before it is
+    renamed and is removed if the with block raises an exception. For example:
+
+      with daemonhelper.write_atomically(path) as output_file:
+          output_file.write(text)
+
+    path: The pathname of the file to write. The temporary file is named path followed by
+      a random suffix ending in '.tmp'.
+    mode: The permissions of the file.
+    binary: If True, the file is opened in binary mode. Otherwise, it is opened in text
+      mode.
+    Returns a context manager that yields the open temporary file.
+    """
+    temporary_path = '%s.%s.tmp' % (path, os.urandom(8).hex())
+    temporary_fd = os.open(
+        temporary_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_NOFOLLOW, mode)
+    try:
+        with os.fdopen(temporary_fd, 'wb' if binary else 'w') as temporary_file:
+            yield temporary_file
+            temporary_file.flush()
+            os.fsync(temporary_file.fileno())
+        os.rename(temporary_path, path)
+    except BaseException:
+        try:
+            os.unlink(temporary_path)
+        except OSError:
+            pass
+        raise
+
+
+class WorkerSupervisor():
+    """Preforks and supervises worker processes. The supervising process should load and
+    validate its configuration and open any shared resources (log files, listening
+    sockets) before calling run so every worker inherits them.
+
+    Crashed workers are restarted with an exponential backoff. A worker that exits with a
+    status of 0 is restarted immediately and does not count as a crash. Only the
+    supervisor's own workers are waited for, so the supervising process can run other
+    child processes and wait for them itself. Sending SIGHUP to the
+    supervisor restarts the workers one at a time, starting each replacement before
+    stopping the worker it replaces. Sending SIGTERM or SIGINT stops all workers and
+    returns from run.
+    """
 
-        if not keep_existing_permissions or new_directory:
-            os.chown(path, uid, gid)
-            os.chmod(path, mode)
+    def __init__(self, worker_function, worker_count=None, preserved_fds=None,
+                 minimum_restart_delay=1, maximum_restart_delay=60, stop_timeout=10):
+        """Constructor.
+
+        worker_function: The function each worker process runs. It is passed the index of
+          the worker, from 0 to worker_count - 1. The worker exits with a status of 0 when
+          the function returns and 1 when it raises an exception.
+        worker_count: The number of worker processes. Defaults to the number of CPUs
+          available to this process.
+        preserved_fds: A container of file descriptors workers should keep open, such as the
+          descriptor returned by ConfigHelper.get_log_file_handle. Standard input, output,
+          and error are always kept. If None, workers keep every inherited descriptor.
+        minimum_restart_delay: The delay in seconds before restarting a worker that failed
+          once.
+        maximum_restart_delay: The maximum delay in seconds before restarting a worker
+          that keeps failing. A worker that runs at least this long resets its backoff.
+        stop_timeout: The number of seconds to wait for workers to exit after SIGTERM
+          before killing them.
+        """
+        self.logger = logging.getLogger(__name__)
+
+        if worker_count is None:
+            worker_count = len(os.sched_getaffinity(0))
+
+        self.worker_function = worker_function
+        self.worker_count = worker_count
+        self.preserved_fds = preserved_fds
+        self.minimum_restart_delay = minimum_restart_delay
+        self.maximum_restart_delay = maximum_restart_delay
+        self.stop_timeout = stop_timeout
+
+        # The PID, start time, consecutive failure count, and next start time of each
+        #   worker, indexed by worker index. The PID is None when the worker is not running.
+        self.worker_pids = [None] * worker_count
+        self._worker_start_times = [None] * worker_count
+        self._worker_failures = [0] * worker_count
+        self._worker_next_start_times = [0] * worker_count
+
+        self._stop_requested = False
+        self._restart_requested = False
+        self._wakeup_read_fd = None
+        self._wakeup_write_fd = None
+
+    def run(self):
+        """Starts the workers and supervises them until SIGTERM or SIGINT is received or
+        stop is called from a signal handler. Must be called from the main thread.
+        """
+        self.logger.info('Starting %d worker processes.', self.worker_count)
+        self._wakeup_read_fd, self._wakeup_write_fd = os.pipe()
+        os.set_blocking(self._wakeup_read_fd, False)
+        os.set_blocking(self._wakeup_write_fd, False)
+        previous_wakeup_fd = signal.set_wakeup_fd(self._wakeup_write_fd)
+        previous_handlers = {
+            signal.SIGCHLD: signal.signal(signal.SIGCHLD, self._handle_child_signal),
+            signal.SIGHUP: signal.signal(signal.SIGHUP, self._handle_restart_signal),
+            signal.SIGINT: signal.signal(signal.SIGINT, self._handle_stop_signal),
+            signal.SIGTERM: signal.signal(signal.SIGTERM, self._handle_stop_signal)}
+
+        try:
+            self._stop_requested = False
+            while not self._stop_requested:
+                self._reap_workers()
+                if self._restart_requested:
+                    self._restart_requested = False
+                    self._rolling_restart()
+                self._start_due_workers()
+                self._wait_for_event()
+
+        finally:
+            self._stop_workers()
+            signal.set_wakeup_fd(previous_wakeup_fd)
+            for signal_number, handler in previous_handlers.items():
+                signal.signal(signal_number, handler)
+            os.close(self._wakeup_read_fd)
+            os.close(self._wakeup_write_fd)
+
+        self.logger.info('All worker processes have stopped.')
+
+    def stop(self):
+        """Requests that run stop all workers and return."""
+        self._stop_requested = True
+
+    def rolling_restart(self):
+        """Requests that run restart all workers one at a time."""
+        self._restart_requested = True
+
+    def _handle_child_signal(self, signal_number, frame):
+        """Does nothing. The signal only needs to wake up the supervisor loop."""
+
+    def _handle_restart_signal(self, signal_number, frame):
+        """Requests a rolling restart when SIGHUP is received."""
+        self.rolling_restart()
+
+    def _handle_stop_signal(self, signal_number, frame):
+        """Requests that all workers stop when SIGTERM or SIGINT is received."""
+        self.stop()
+
+    def _wait_for_event(self):
+        """Waits until a signal is received or the next worker restart is due."""
+        timeout = None
+        for worker_index, pid in enumerate(self.worker_pids):
+            if pid is None:
+                delay = max(
+                    0, self._worker_next_start_times[worker_index] - time.monotonic())
+                timeout = delay if timeout is None else min(timeout, delay)
+
+        if not (self._stop_requested or self._restart_requested):
+            try:
+                select.select([self._wakeup_read_fd], [], [], timeout)
+            except InterruptedError:
+                pass
+
+        try:
+            while os.read(self._wakeup_read_fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _start_due_workers(self):
+        """Starts every worker that is not running and whose restart delay has passed."""
+        now = time.monotonic()
+        for worker_index, pid in enumerate(self.worker_pids):
+            if pid is None and self._worker_next_start_times[worker_index] <= now:
+                self._start_worker(worker_index)
+
+    def _start_worker(self, worker_index):
+        """Forks a worker process.
+
+        worker_index: The index of the worker to start.
+        Returns the PID of the new worker.
+        """
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker(worker_index)
+
+        self.logger.info('Started worker %d with PID %d.', worker_index, pid)
+        self.worker_pids[worker_index] = pid
+        self._worker_start_times[worker_index] = time.monotonic()
+        return pid
+
+    def _run_worker(self, worker_index):
+        """Runs the worker function in a newly forked process. Never returns.
+
+        worker_index: The index of this worker.
+        """
+        exit_status = 1
+        try:
+            signal.set_wakeup_fd(-1)
+            for signal_number in (signal.SIGCHLD, signal.SIGHUP, signal.SIGINT,
+                                  signal.SIGTERM):
+                signal.signal(signal_number, signal.SIG_DFL)
+            os.close(self._wakeup_read_fd)
+            os.close(self._wakeup_write_fd)
+            if self.preserved_fds is not None:
+                _close_fds_except({0, 1, 2}.union(self.preserved_fds))
+
+            self.worker_function(worker_index)
+            exit_status = 0
+
+        except SystemExit as system_exit:
+            exit_status = system_exit.code if isinstance(system_exit.code, int) else \
+                int(system_exit.code is not None)
+
+        except BaseException:
+            self.logger.exception('Worker %d failed.', worker_index)
+
+        finally:
+            logging.shutdown()
+            # Exit immediately so the worker never returns into the supervisor's code.
+            os._exit(exit_status)
+
+    def _reap_workers(self):
+        """Collects exited workers and schedules their restarts."""
+        for worker_index, pid in enumerate(self.worker_pids):
+            if pid is None:
+                continue
+            try:
+                reaped_pid, status = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                # Something else already waited for the worker, so its status is lost.
+                reaped_pid, status = pid, None
+            if reaped_pid == pid:
+                self._worker_exited(worker_index, status)
+
+    def _worker_exited(self, worker_index, status):
+        """Records that a worker exited and schedules its restart, with backoff if it
+        crashed.
+
+        worker_index: The index of the worker that exited.
+        status: The exit status returned by waitpid, or None if it is unknown.
+        """
+        now = time.monotonic()
+        uptime = now - self._worker_start_times[worker_index]
+        self.worker_pids[worker_index] = None
+
+        if status is not None and os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0:
+            self._worker_failures[worker_index] = 0
+            self._worker_next_start_times[worker_index] = now
+            self.logger.info('Worker %d exited after %.1f seconds. Restarting it.',
+                             worker_index, uptime)
+            return
+
+        if uptime >= self.maximum_restart_delay:
+            self._worker_failures[worker_index] = 0
+        delay = 0
+        if self._worker_failures[worker_index]:
+            delay = min(self.maximum_restart_delay, self.minimum_restart_delay
+                        * 2 ** (self._worker_failures[worker_index] - 1))
+        self._worker_failures[worker_index] += 1
+        self._worker_next_start_times[worker_index] = now + delay
+        WORKER_EXITS.inc()
+
+        self.logger.warning(
+            'Worker %d exited unexpectedly with status %s after %.1f seconds. Restarting '
+            'in %.1f seconds.', worker_index, _describe_wait_status(status), uptime, delay)
+
+    def _rolling_restart(self):
+        """Replaces every running worker, one at a time, starting the replacement before
+        stopping the old worker.
+        """
+        self.logger.info('Restarting worker processes.')
+        for worker_index, old_pid in enumerate(self.worker_pids):
+            if self._stop_requested:
+                break
+            if old_pid is None:
+                continue
+
+            self._start_worker(worker_index)
+            self._worker_failures[worker_index] = 0
+            self._terminate_workers([old_pid])
+
+        self.logger.info('Worker processes restarted.')
+
+    def _stop_workers(self):
+        """Stops all running workers."""
+        running_pids = [pid for pid in self.worker_pids if pid is not None]
+        self.logger.info('Stopping %d worker processes.', len(running_pids))
+        self._terminate_workers(running_pids)
+        self.worker_pids = [None] * self.worker_count
+
+    def _terminate_workers(self, pids):
+        """Sends SIGTERM to the given workers, waits for them to exit, and kills any that do
+        not exit within stop_timeout seconds.
+
+        pids: The PIDs of the workers to terminate.
+        """
+        remaining_pids = set()
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+                remaining_pids.add(pid)
+            except ProcessLookupError:
+                # Exited but not yet reaped.
+                remaining_pids.add(pid)
+
+        deadline = time.monotonic() + self.stop_timeout
+        while remaining_pids:
+            for pid in list(remaining_pids):
+                try:
+                    reaped_pid, _ = os.waitpid(pid, os.WNOHANG)
+                except ChildProcessError:
+                    reaped_pid = pid
+                if reaped_pid == pid:
+                    remaining_pids.remove(pid)
+
+            if remaining_pids:
+                if time.monotonic() >= deadline:
+                    for pid in remaining_pids:
+                        self.logger.warning('Worker with PID %d did not stop. Killing it.',
+                                            pid)
+                        try:
+                            os.kill(pid, signal.SIGKILL)
+                            os.waitpid(pid, 0)
+                        except (ProcessLookupError, ChildProcessError):
+                            # Exited and was reaped since it was last checked.
+                            pass
+                    remaining_pids.clear()
+                else:
+                    time.sleep(WORKER_EXIT_POLL_INTERVAL)
+
+
+class SignalTriggeredReporter():
+    """Base class for diagnostics that a running daemon produces when it receives a signal
+    and writes as reports to a directory, usually the program's ramdisk. Subclasses
+    implement _handle_trigger.
+
+    The signal handler only sets an event. A trigger thread started by install waits for
+    the event and calls _handle_trigger, because a signal handler that takes a lock,
+    starts a thread, or logs can deadlock if the signal interrupts the main thread while it
+    holds the same lock.
+    """
+
+    def __init__(self, output_directory, signal_number, thread_name):
+        """Constructor.
+
+        output_directory: The directory reports are written to, or None.
+        signal_number: The signal that triggers a report once install is called.
+        thread_name: The name of the trigger thread.
+        """
+        self.output_directory = output_directory
+        self.signal_number = signal_number
+        self.thread_name = thread_name
+
+        self._previous_handler = None
+        self._trigger_event = threading.Event()
+        self._trigger_thread = None
+        # Numbers the reports so reports written in the same second do not collide.
+        self._report_count = 0
+
+    def install(self):
+        """Installs the signal handler and starts the trigger thread. Must be called from
+        the main thread.
+        """
+        self._trigger_thread = threading.Thread(
+            target=self._wait_for_trigger, name=self.thread_name, daemon=True)
+        self._trigger_thread.start()
+        self._previous_handler = signal.signal(self.signal_number, self._handle_signal)
+
+    def uninstall(self):
+        """Restores the signal handler that was installed before install was called and
+        stops the trigger thread.
+        """
+        if self._previous_handler is not None:
+            signal.signal(self.signal_number, self._previous_handler)
+            self._previous_handler = None
+        self._trigger_thread = None
+        self._trigger_event.set()
+
+    def _handle_signal(self, signal_number, frame):
+        """Wakes the trigger thread when the signal is received."""
+        self._trigger_event.set()
+
+    def _wait_for_trigger(self):
+        """Calls _handle_trigger each time the signal handler sets the trigger event, until
+        uninstall is called. Runs in the trigger thread.
+        """
+        while True:
+            self._trigger_event.wait()
+            self._trigger_event.clear()
+            if self._trigger_thread is not threading.current_thread():
+                return
+            self._handle_trigger()
+
+    def _handle_trigger(self):
+        """Produces a report. Runs in the trigger thread and must not raise exceptions."""
+        raise NotImplementedError()
+
+    def _write_report(self, filename_format, report_lines):
+        """Atomically writes a report to a new file in the output directory.
+
+        filename_format: The report filename, formatted with the process ID, a timestamp,
+          and a report number.
+        report_lines: An iterable of the lines of the report.
+        Returns the pathname of the report.
+        """
+        self._report_count += 1
+        report_path = os.path.join(self.output_directory, filename_format % (
+            os.getpid(), time.strftime(REPORT_TIMESTAMP_FORMAT), self._report_count))
+        with write_atomically(report_path) as report_file:
+            for line in report_lines:
+                report_file.write(line + '\n')
+        return report_path
+
+
+def _close_fds_except(preserved_fds):
+    """Closes every open file descriptor that is not in preserved_fds.
+
+    preserved_fds: A set of file descriptors to keep open.
+    """
+    low_fd = 0
+    for preserved_fd in sorted(preserved_fds):
+        # Empty ranges are skipped, because os.closerange(0, 0) closes every descriptor on
+        #   Linux in some Python versions.
+        if preserved_fd > low_fd:
+            os.closerange(low_fd, preserved_fd)
+        low_fd = preserved_fd + 1
+    os.closerange(low_fd, os.sysconf('SC_OPEN_MAX'))
+
+
+def _describe_wait_status(status):
+    """Returns a readable description of a status returned by waitpid.
+
+    status: The exit status returned by waitpid, or None if it is unknown.
+    """
+    if status is None:
+        return 'unknown'
+    if os.WIFSIGNALED(status):
+        return 'signal %d' % os.WTERMSIG(status)
+    return str(os.WEXITSTATUS(status))
@@ -0,0 +1,857 @@
+# Copyright 2026 Joel Allen Luellwitz and Emily Frost
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Provides the logging handlers used by ConfigHelper.configure_logger."""
+
+__all__ = ['BoundedQueueHandler', 'BufferedFileHandler', 'CompressingRotatingFileHandler',
+           'DatagramQueue', 'DatagramQueueHandler', 'JournalHandler', 'OVERFLOW_POLICIES',
+           'RateLimitingFilter', 'STRUCTURED_FORMATS', 'StructuredFormatter']
+
+import atexit
+import copy
+import errno
+import logging
+import logging.handlers
+import os
+import pickle
+import queue
+import re
+import socket
+import struct
+import sys
+import threading
+import time
+import weakref
+from parkbenchcommon import metrics
+
+# What a BoundedQueueHandler does with a record when its queue is full.
+#   block: Wait for the listener to make room.
+#   drop_oldest: Discard the oldest queued record.
+#   drop_debug: Discard the record if it is DEBUG or lower. Otherwise, wait.
+OVERFLOW_POLICIES = ['block', 'drop_oldest', 'drop_debug']
+# A BoundedQueueHandler that dropped records queues a warning with the number dropped at
+#   most once per this many seconds.
+DROPPED_REPORT_INTERVAL = 60
+DROPPED_MESSAGE = 'Dropped %d log records because the log queue was full.'
+
+STRUCTURED_FORMATS = ['json', 'logfmt']
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+JOURNAL_SOCKET_PATH = '/run/systemd/journal/socket'
+# Syslog priorities keyed by the lowest logging level that maps to them.
+JOURNAL_PRIORITIES = [(logging.CRITICAL, 2), (logging.ERROR, 3), (logging.WARNING, 4),
+                      (logging.INFO, 6)]
+JOURNAL_DEBUG_PRIORITY = 7
+
+# The largest record sent through a DatagramQueue. Longer messages are truncated.
+MAX_DATAGRAM_SIZE = 65536
+TRUNCATED_SUFFIX = '... (truncated)'
+# How long a DatagramQueue sender waits for the listener to make room before it drops a
+#   record, in seconds.
+DATAGRAM_SEND_TIMEOUT = 1
+
+SUPPRESSED_MESSAGE = 'Suppressed %d similar messages like "%s" in the last %s seconds.'
+
+LOG_RECORDS_DROPPED = metrics.counter(
+    'parkbench_log_records_dropped_total',
+    'Log records dropped by the overflow policy because the log queue was full.')
+
+# Open BufferedFileHandlers, flushed before every fork so a child process never inherits
+#   and later writes a copy of its parent's buffered records.
+_BUFFERED_FILE_HANDLERS = weakref.WeakSet()
+# Open RateLimitingFilters, whose pending summaries are sent at exit.
+_RATE_LIMITING_FILTERS = weakref.WeakSet()
+
+ROTATED_SUFFIX_FORMAT = '%Y%m%d-%H%M%S'
+COMPRESSED_SUFFIX = '.gz'
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """A QueueHandler for a bounded queue.Queue that applies an overflow policy when the
+    queue is full. Only the message arguments are merged in the logging thread. Formatting
+    and I/O are left to the QueueListener's handlers.
+
+    Dropped records are counted in parkbench_log_records_dropped_total, and once the queue
+    has room again, a warning with the number of records dropped is queued at most once per
+    DROPPED_REPORT_INTERVAL seconds.
+    """
+
+    def __init__(self, log_queue, overflow_policy='block'):
+        """Constructor.
+
+        log_queue: The queue.Queue records are placed on.
+        overflow_policy: One of OVERFLOW_POLICIES.
+        """
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError('Unknown log queue overflow policy %s.' % overflow_policy)
+
+        super().__init__(log_queue)
+        self.overflow_policy = overflow_policy
+        self.dropped_count = 0
+        # Records dropped since the last warning was queued.
+        self._unreported_count = 0
+        self._next_report_time = 0
+
+    def prepare(self, record):
+        """Merges the message arguments so that later changes to mutable arguments do not
+        affect the logged message. Exception information is kept for the listener's
+        formatters.
+
+        record: The LogRecord being queued.
+        Returns a copy of the record.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        """Places the record on the queue, applying the overflow policy if it is full.
+
+        record: The prepared LogRecord.
+        """
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if self.overflow_policy == 'drop_oldest':
+                while True:
+                    try:
+                        self.queue.get_nowait()
+                        self._count_dropped_record()
+                    except queue.Empty:
+                        pass
+                    try:
+                        self.queue.put_nowait(record)
+                        break
+                    except queue.Full:
+                        pass
+            elif self.overflow_policy == 'drop_debug' and record.levelno <= logging.DEBUG:
+                self._count_dropped_record()
+                return
+            else:
+                self.queue.put(record)
+
+        if self._unreported_count and record.created >= self._next_report_time:
+            self._report_dropped_records(record.created)
+
+    def _count_dropped_record(self):
+        """Counts a record dropped by the overflow policy."""
+        self.dropped_count += 1
+        self._unreported_count += 1
+        LOG_RECORDS_DROPPED.inc()
+
+    def _report_dropped_records(self, now):
+        """Queues a warning with the number of records dropped since the last warning, if
+        the queue has room for it.
+
+        now: The current time.
+        """
+        warning_record = logging.makeLogRecord({
+            'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+            'msg': DROPPED_MESSAGE % self._unreported_count})
+        try:
+            self.queue.put_nowait(warning_record)
+        except queue.Full:
+            return
+        self._unreported_count = 0
+        self._next_report_time = now + DROPPED_REPORT_INTERVAL
+
+
+class DatagramQueue():
+    """A queue-like object backed by a Unix datagram socket pair, used to send log records
+    from many processes to a single QueueListener. Processes forked after the queue is
+    created inherit the sending socket, and each record is sent as one atomic datagram, so
+    records from different processes never interleave.
+
+    Records are pickled. Only processes that inherited the socket pair can send to it. A
+    process that closes every other descriptor after it is forked must keep the
+    descriptors returned by fds open.
+    """
+
+    def __init__(self):
+        self.send_socket, self.receive_socket = socket.socketpair(
+            socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.send_socket.settimeout(DATAGRAM_SEND_TIMEOUT)
+        # The number of records this process dropped because the listener was stuck or
+        #   gone.
+        self.dropped_count = 0
+
+    def fds(self):
+        """Returns a list of the file descriptors a forked process needs to send records,
+        for example to pass as WorkerSupervisor's preserved_fds.
+        """
+        return [self.send_socket.fileno()]
+
+    def put_nowait(self, record):
+        """Sends a record prepared by DatagramQueueHandler. If the receiving socket's
+        buffer is full, waits up to DATAGRAM_SEND_TIMEOUT seconds and then drops the
+        record. Raises an OSError with errno EMSGSIZE if the pickled record is larger than
+        MAX_DATAGRAM_SIZE, because the receiver would only read part of it.
+
+        record: The LogRecord to send, or None to stop the listener.
+        """
+        if record is None:
+            datagram = b''
+        else:
+            datagram = pickle.dumps(record.__dict__, pickle.HIGHEST_PROTOCOL)
+            if len(datagram) > MAX_DATAGRAM_SIZE:
+                raise OSError(errno.EMSGSIZE, os.strerror(errno.EMSGSIZE))
+        try:
+            self.send_socket.send(datagram)
+        except (socket.timeout, ConnectionRefusedError):
+            # A stuck or exited listener must not hang every process that logs.
+            self.dropped_count += 1
+
+    put = put_nowait
+
+    def get(self, block=True):
+        """Receives the next record. Called by the QueueListener.
+
+        block: Ignored. Always blocks until a record is received.
+        Returns the LogRecord, or None if the listener should stop.
+        """
+        while True:
+            # One extra byte is read so an oversized datagram is detected rather than
+            #   silently truncated.
+            datagram = self.receive_socket.recv(MAX_DATAGRAM_SIZE + 1)
+            if not datagram:
+                return None
+            try:
+                if len(datagram) > MAX_DATAGRAM_SIZE:
+                    raise ValueError('Datagram is larger than %d bytes.' % MAX_DATAGRAM_SIZE)
+                return logging.makeLogRecord(pickle.loads(datagram))
+            except Exception as exception:
+                # The listener thread must not die, so a bad record is dropped and reported
+                #   on stderr the same way logging reports handler errors.
+                if logging.raiseExceptions:
+                    sys.stderr.write('Dropped an unreadable log record: %s\n' % exception)
+
+    def task_done(self):
+        """Does nothing. Present for compatibility with QueueListener."""
+
+    def close_receiver(self):
+        """Closes the receiving socket. Called in forked processes, so the socket pair
+        stops accepting records once the listening process exits.
+        """
+        self.receive_socket.close()
+
+    def close(self):
+        """Closes both sockets."""
+        self.send_socket.close()
+        self.receive_socket.close()
+
+
+class DatagramQueueHandler(logging.handlers.QueueHandler):
+    """A QueueHandler that sends records to a DatagramQueue. Messages and exceptions are
+    rendered to strings in the sending process because they cannot be pickled reliably.
+    """
+
+    def prepare(self, record):
+        """Renders the message and any exception text so the record can be pickled.
+
+        record: The LogRecord being sent.
+        Returns a copy of the record.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        """Sends the record, truncating its message if it is too large for a datagram.
+
+        record: The prepared LogRecord.
+        """
+        try:
+            self.queue.put_nowait(record)
+        except OSError as os_error:
+            if os_error.errno != errno.EMSGSIZE:
+                raise
+            # A character can take up to four bytes once pickled, so these limits keep
+            #   even a message of multibyte characters well under MAX_DATAGRAM_SIZE.
+            record.msg = record.msg[:MAX_DATAGRAM_SIZE // 8] + TRUNCATED_SUFFIX
+            if record.exc_text:
+                record.exc_text = record.exc_text[-MAX_DATAGRAM_SIZE // 16:]
+            self.queue.put_nowait(record)
+
+
+class BufferedFileHandler(logging.FileHandler):
+    """A FileHandler that writes records into a large in-memory buffer instead of issuing
+    one write per record. The buffer is written to the file when it fills, immediately
+    after a record at or above the flush level, and at a fixed interval by a background
+    thread. Records below the flush level may be lost if the process is killed.
+    """
+
+    def __init__(self, filename, mode='a', encoding=None, delay=False, buffer_size=65536,
+                 flush_level=logging.WARNING, flush_interval=1.0):
+        """Constructor.
+
+        filename: The pathname of the log file.
+        mode: The mode the log file is opened with.
+        encoding: The encoding of the log file.
+        delay: If True, the file is not opened until the first record is written.
+        buffer_size: The size of the write buffer in bytes.
+        flush_level: Records at or above this level are written to the file immediately.
+          logging.NOTSET writes every record immediately.
+        flush_interval: The maximum number of seconds other records stay in the buffer.
+        """
+        self.buffer_size = buffer_size
+        level_number = flush_level
+        if isinstance(flush_level, str):
+            level_number = logging.getLevelName(flush_level)
+        # getLevelName returns a string for unknown level names.
+        if not isinstance(level_number, int):
+            raise ValueError('Unknown flush level %s.' % flush_level)
+        self.flush_level = level_number
+        self.flush_interval = flush_interval
+        self._flush_pid = None
+        self._closed_event = threading.Event()
+        super().__init__(filename, mode, encoding, delay)
+        _BUFFERED_FILE_HANDLERS.add(self)
+
+    def _open(self):
+        """Opens the log file with a write buffer of buffer_size bytes.
+
+        Returns the opened stream.
+        """
+        return open(self.baseFilename, self.mode, buffering=self.buffer_size,
+                    encoding=self.encoding, errors=getattr(self, 'errors', None))
+
+    def emit(self, record):
+        """Writes the record to the buffer, flushing the buffer if the record is at or
+        above the flush level.
+
+        record: The LogRecord to write.
+        """
+        try:
+            message = self.format(record) + self.terminator
+            if self.stream is None:
+                self.stream = self._open()
+            self._prepare_write(record, message)
+            self.stream.write(message)
+            if record.levelno >= self.flush_level:
+                self.flush()
+            elif self._flush_pid != os.getpid():
+                self._start_flush_thread()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        """Stops the flush thread and closes the log file."""
+        self._closed_event.set()
+        _BUFFERED_FILE_HANDLERS.discard(self)
+        super().close()
+
+    def _prepare_write(self, record, message):
+        """Called before each formatted record is written. Does nothing by default.
+
+        record: The LogRecord about to be written.
+        message: The formatted record.
+        """
+
+    def _start_flush_thread(self):
+        """Starts the thread that periodically flushes the buffer in this process."""
+        self._flush_pid = os.getpid()
+        threading.Thread(target=self._flush_periodically, name='log-flush',
+                         daemon=True).start()
+
+    def _flush_periodically(self):
+        """Flushes the buffer every flush_interval seconds until the handler is closed.
+        Runs in the flush thread.
+        """
+        while not self._closed_event.wait(self.flush_interval):
+            self.flush()
+
+
+def _flush_buffered_file_handlers():
+    """Flushes every open BufferedFileHandler. Registered to run before fork."""
+    for handler in list(_BUFFERED_FILE_HANDLERS):
+        try:
+            handler.flush()
+        except Exception:
+            # A failed flush must not prevent the fork.
+            pass
+
+
+os.register_at_fork(before=_flush_buffered_file_handlers)
+
+
+class CompressingRotatingFileHandler(BufferedFileHandler):
+    """A FileHandler that rotates the log file when it reaches a maximum size or age.
+    Rotation only renames the file and opens a new one, so writers are blocked for a
+    negligible amount of time. Rotated files are named after the time they were rotated
+    and are compressed with gzip in a background thread, which also deletes the oldest
+    rotated files beyond the retained count.
+    """
+
+    def __init__(self, filename, max_bytes=0, max_age=0, backup_count=5, mode='a',
+                 encoding=None, delay=False, buffer_size=-1, flush_level=logging.NOTSET,
+                 flush_interval=1.0):
+        """Constructor.
+
+        filename: The pathname of the log file.
+        max_bytes: The size in bytes after which the file is rotated. 0 disables size based
+          rotation.
+        max_age: The number of seconds after which the file is rotated, counted from when
+          the handler opened it. 0 disables age based rotation.
+        backup_count: The number of rotated files to keep.
+        mode: The mode the log file is opened with.
+        encoding: The encoding of the log file.
+        delay: If True, the file is not opened until the first record is written.
+        buffer_size: The size of the write buffer in bytes. -1 uses the default size.
+        flush_level: Records at or above this level are written to the file immediately.
+          The default writes every record immediately.
+        flush_interval: The maximum number of seconds other records stay in the buffer.
+        """
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.backup_count = backup_count
+        self._file_size = 0
+        self._opened_time = time.time()
+        self._compression_queue = None
+        self._compression_pid = None
+        super().__init__(filename, mode, encoding, delay, buffer_size, flush_level,
+                         flush_interval)
+
+        self._rotated_pattern = re.compile(
+            re.escape(os.path.basename(self.baseFilename)) +
+            r'\.(\d{8}-\d{6})(?:\.(\d+))?(?:%s)?$' % re.escape(COMPRESSED_SUFFIX))
+
+    def _open(self):
+        """Opens the log file and records its size and opening time.
+
+        Returns the opened stream.
+        """
+        stream = super()._open()
+        self._file_size = os.fstat(stream.fileno()).st_size
+        self._opened_time = time.time()
+        return stream
+
+    def _prepare_write(self, record, message):
+        """Rotates the log file if writing the record would exceed its limits.
+
+        record: The LogRecord about to be written.
+        message: The formatted record.
+        """
+        if self._should_rotate(record, len(message)):
+            self._rotate()
+        self._file_size += len(message)
+
+    def _should_rotate(self, record, message_length):
+        """Returns True if writing the record would exceed the maximum size or the file is
+        older than the maximum age and the file is not empty.
+
+        record: The LogRecord about to be written.
+        message_length: The length of the formatted record.
+        """
+        return self._file_size > 0 and (
+            self.max_bytes and self._file_size + message_length > self.max_bytes or
+            self.max_age and record.created - self._opened_time >= self.max_age)
+
+    def _rotate(self):
+        """Renames the log file, opens a new one, and queues the renamed file for
+        compression.
+        """
+        self.stream.close()
+        self.stream = None
+
+        rotated_base = '%s.%s' % (self.baseFilename, time.strftime(ROTATED_SUFFIX_FORMAT))
+        rotated_filename = rotated_base
+        duplicate_count = 0
+        while os.path.exists(rotated_filename) or \
+                os.path.exists(rotated_filename + COMPRESSED_SUFFIX):
+            duplicate_count += 1
+            rotated_filename = '%s.%d' % (rotated_base, duplicate_count)
+
+        os.rename(self.baseFilename, rotated_filename)
+        self.stream = self._open()
+        self._get_compression_queue().put(rotated_filename)
+
+    def _get_compression_queue(self):
+        """Returns the queue of the compression thread, starting the thread if it is not
+        running in this process. A new thread also compresses rotated files left
+        uncompressed by a previous process.
+        """
+        if self._compression_pid != os.getpid():
+            self._compression_queue = queue.Queue()
+            self._compression_pid = os.getpid()
+            for filename in self._list_rotated_files():
+                if not filename.endswith(COMPRESSED_SUFFIX):
+                    self._compression_queue.put(filename)
+            threading.Thread(target=self._compress_rotated_files,
+                             args=(self._compression_queue,),
+                             name='log-compression', daemon=True).start()
+        return self._compression_queue
+
+    def _compress_rotated_files(self, compression_queue):
+        """Compresses rotated files as they are queued and deletes the oldest rotated files.
+        Runs in the compression thread.
+
+        compression_queue: The queue of rotated file pathnames to compress.
+        """
+        # Deferred so programs that never rotate do not import compression modules.
+        import gzip
+        import shutil
+
+        while True:
+            rotated_filename = compression_queue.get()
+            try:
+                if os.path.exists(rotated_filename):
+                    compressed_filename = rotated_filename + COMPRESSED_SUFFIX
+                    temporary_filename = compressed_filename + '.tmp'
+                    with open(rotated_filename, 'rb') as rotated_file, \
+                            gzip.open(temporary_filename, 'wb') as compressed_file:
+                        shutil.copyfileobj(rotated_file, compressed_file)
+                    os.rename(temporary_filename, compressed_filename)
+                    os.remove(rotated_filename)
+
+                rotated_filenames = self._list_rotated_files()
+                for old_filename in rotated_filenames[:-self.backup_count or None]:
+                    os.remove(old_filename)
+
+            except Exception:
+                # Logging here could recurse into this handler.
+                logging.lastResort.handle(logging.makeLogRecord({
+                    'msg': 'Could not compress rotated log file %s.',
+                    'args': (rotated_filename,), 'levelno': logging.ERROR,
+                    'levelname': 'ERROR'}))
+
+            finally:
+                compression_queue.task_done()
+
+    def _list_rotated_files(self):
+        """Returns the pathnames of the rotated log files, oldest first."""
+        directory = os.path.dirname(self.baseFilename)
+        rotated_files = []
+        for filename in os.listdir(directory):
+            match = self._rotated_pattern.match(filename)
+            if match:
+                rotation_time, duplicate_number = match.groups()
+                rotated_files.append(((rotation_time, int(duplicate_number or 0)),
+                                      os.path.join(directory, filename)))
+
+        return [pathname for _, pathname in sorted(rotated_files)]
+
+
+class StructuredFormatter(logging.Formatter):
+    """Formats records as single JSON objects or logfmt lines with the keys time, level,
+    logger, message, and, when present, exception, always in that order. The timestamp
+    prefix is only rendered once per second.
+    """
+
+    def __init__(self, output_format='json'):
+        """Constructor.
+
+        output_format: One of STRUCTURED_FORMATS.
+        """
+        if output_format not in STRUCTURED_FORMATS:
+            raise ValueError('Unknown structured log format %s.' % output_format)
+
+        super().__init__()
+        self.output_format = output_format
+        # Imported here, not per record, so programs logging plain text never import json.
+        import json
+        self._json_dumps = json.dumps
+        # A (second, rendered timestamp) tuple, replaced as a whole so threads sharing the
+        #   formatter never see a mismatched pair.
+        self._timestamp_cache = (None, None)
+
+    def format(self, record):
+        """Formats the record.
+
+        record: The LogRecord to format.
+        Returns the formatted record as a string.
+        """
+        if record.args:
+            message = record.getMessage()
+        elif isinstance(record.msg, str):
+            message = record.msg
+        else:
+            message = str(record.msg)
+
+        fields = [('time', self._format_timestamp(record)), ('level', record.levelname),
+                  ('logger', record.name), ('message', message)]
+
+        exception_texts = []
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            exception_texts.append(record.exc_text)
+        if record.stack_info:
+            exception_texts.append(self.formatStack(record.stack_info))
+        if exception_texts:
+            fields.append(('exception', '\n'.join(exception_texts)))
+
+        if self.output_format == 'json':
+            formatted_record = '{%s}' % ','.join(
+                '"%s":%s' % (key, self._json_dumps(value)) for key, value in fields)
+        else:
+            formatted_record = ' '.join(
+                '%s=%s' % (key, _format_logfmt_value(value)) for key, value in fields)
+        return formatted_record
+
+    def _format_timestamp(self, record):
+        """Returns the record's creation time as an ISO 8601 local timestamp with
+        milliseconds, reusing the rendering of the whole seconds when possible.
+
+        record: The LogRecord being formatted.
+        """
+        second = int(record.created)
+        cached_second, timestamp = self._timestamp_cache
+        if second != cached_second:
+            timestamp = time.strftime(TIMESTAMP_FORMAT, self.converter(second))
+            self._timestamp_cache = (second, timestamp)
+        return '%s.%03d' % (timestamp, record.msecs)
+
+
+def _format_logfmt_value(value):
+    """Returns a value quoted and escaped as needed for logfmt.
+
+    value: The string value to format.
+    """
+    if value and not any(character in value for character in ' ="\\\n\t'):
+        return value
+    return '"%s"' % value.replace('\\', '\\\\').replace('"', '\\"').replace(
+        '\n', '\\n').replace('\t', '\\t')
+
+
+class RateLimitingFilter(logging.Filter):
+    """A handler filter that passes at most max_count records with the same logger name and
+    message template per interval. When an interval in which records were suppressed ends,
+    a summary record with the number of suppressed records is sent to the handler, either
+    with the next record or by a background thread that checks once per interval. Pending
+    summaries are also sent when the filter is closed or the process exits.
+    """
+
+    def __init__(self, handler, max_count, interval):
+        """Constructor.
+
+        handler: The handler this filter is attached to. Summary records are sent to it.
+        max_count: The number of identical records passed per interval.
+        interval: The length of an interval in seconds.
+        """
+        super().__init__()
+        self.handler = handler
+        self.max_count = max_count
+        self.interval = interval
+
+        # Lists of [interval start time, record count, suppressed count, first record]
+        #   keyed by (logger name, message template).
+        self._intervals = {}
+        self._lock = threading.Lock()
+        self._next_sweep_time = 0
+        self._summary_pid = None
+        self._closed_event = threading.Event()
+        _RATE_LIMITING_FILTERS.add(self)
+
+    def filter(self, record):
+        """Decides whether the record is passed to the handler.
+
+        record: The LogRecord being handled.
+        Returns True if the record should be handled. Returns False otherwise.
+        """
+        if getattr(record, 'rate_limit_summary', False):
+            return True
+
+        try:
+            key = (record.name, record.msg)
+            hash(key)
+        except TypeError:
+            return True
+
+        now = record.created
+        summary_records = []
+        start_summary_thread = False
+        with self._lock:
+            if now >= self._next_sweep_time:
+                summary_records = self._sweep(now)
+                self._next_sweep_time = now + self.interval
+
+            interval_state = self._intervals.get(key)
+            if interval_state is not None and now - interval_state[0] >= self.interval:
+                if interval_state[2]:
+                    summary_records.append(self._make_summary(interval_state))
+                interval_state = None
+            if interval_state is None:
+                interval_state = [now, 0, 0, record]
+                self._intervals[key] = interval_state
+
+            interval_state[1] += 1
+            passed = interval_state[1] <= self.max_count
+            if not passed:
+                interval_state[2] += 1
+                start_summary_thread = self._summary_pid != os.getpid()
+                if start_summary_thread:
+                    self._summary_pid = os.getpid()
+
+        if start_summary_thread:
+            threading.Thread(target=self._send_summaries_periodically,
+                             name='log-rate-limit', daemon=True).start()
+        for summary_record in summary_records:
+            self.handler.handle(summary_record)
+
+        return passed
+
+    def flush(self):
+        """Sends summaries for every interval that suppressed records, including
+        intervals that have not ended yet, and forgets those intervals.
+        """
+        with self._lock:
+            summary_records = self._sweep(float('inf'))
+        for summary_record in summary_records:
+            self.handler.handle(summary_record)
+
+    def close(self):
+        """Stops the summary thread and sends any pending summaries."""
+        self._closed_event.set()
+        _RATE_LIMITING_FILTERS.discard(self)
+        self.flush()
+
+    def _send_summaries_periodically(self):
+        """Sends summaries for ended intervals once per interval, so a summary is sent even
+        if no further record arrives, until the filter is closed. Runs in the summary
+        thread.
+        """
+        while not self._closed_event.wait(self.interval):
+            now = time.time()
+            with self._lock:
+                summary_records = self._sweep(now)
+                self._next_sweep_time = now + self.interval
+            for summary_record in summary_records:
+                self.handler.handle(summary_record)
+
+    def _sweep(self, now):
+        """Forgets every interval that has ended.
+
+        now: The current time.
+        Returns a list of summary records for the ended intervals that suppressed records.
+        """
+        summary_records = []
+        for key, interval_state in list(self._intervals.items()):
+            if now - interval_state[0] >= self.interval:
+                if interval_state[2]:
+                    summary_records.append(self._make_summary(interval_state))
+                del self._intervals[key]
+        return summary_records
+
+    def _make_summary(self, interval_state):
+        """Returns a record summarizing the records suppressed during an interval.
+
+        interval_state: The [start time, count, suppressed count, first record] list.
+        """
+        first_record = interval_state[3]
+        return logging.makeLogRecord({
+            'name': first_record.name, 'levelno': first_record.levelno,
+            'levelname': first_record.levelname, 'msg': SUPPRESSED_MESSAGE,
+            'args': (interval_state[2], first_record.msg, self.interval),
+            'rate_limit_summary': True})
+
+
+def _flush_rate_limiting_filters():
+    """Sends the pending summaries of every open RateLimitingFilter. Registered to run at
+    exit, before logging closes the handlers.
+    """
+    for rate_limiting_filter in list(_RATE_LIMITING_FILTERS):
+        try:
+            rate_limiting_filter.flush()
+        except Exception:
+            pass
+
+
+# atexit calls functions in reverse order of registration, and logging registered its
+#   shutdown when it was imported, so this runs first.
+atexit.register(_flush_rate_limiting_filters)
+
+
+class JournalHandler(logging.Handler):
+    """Sends records to the local systemd journal as datagrams using the journal's native
+    protocol, so records are written once by the journal instead of being captured from
+    stdout. The logger name, level, and source location are sent as separate fields.
+    """
+
+    def __init__(self, socket_path=JOURNAL_SOCKET_PATH, identifier=None):
+        """Constructor.
+
+        socket_path: The pathname of the journal's datagram socket.
+        identifier: The SYSLOG_IDENTIFIER of the records. Defaults to the program name.
+        """
+        super().__init__()
+        self.socket_path = socket_path
+        if identifier is None:
+            identifier = os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] \
+                else 'python'
+        self.identifier = identifier
+        self.socket = None
+
+    def emit(self, record):
+        """Sends the record to the journal.
+
+        record: The LogRecord to send.
+        """
+        try:
+            priority = JOURNAL_DEBUG_PRIORITY
+            for level, level_priority in JOURNAL_PRIORITIES:
+                if record.levelno >= level:
+                    priority = level_priority
+                    break
+
+            fields = [('MESSAGE', self.format(record)), ('PRIORITY', str(priority)),
+                      ('SYSLOG_IDENTIFIER', self.identifier), ('LOGGER', record.name),
+                      ('CODE_FILE', record.pathname), ('CODE_LINE', str(record.lineno)),
+                      ('CODE_FUNC', record.funcName)]
+            datagram = b''.join(_encode_journal_field(name, value) for name, value in fields)
+
+            if self.socket is None:
+                self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+                self.socket.connect(self.socket_path)
+            self.socket.send(datagram)
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        """Closes the journal socket."""
+        self.acquire()
+        try:
+            if self.socket is not None:
+                self.socket.close()
+                self.socket = None
+            super().close()
+        finally:
+            self.release()
+
+
+def _encode_journal_field(name, value):
+    """Encodes a field using the journal's native protocol.
+
+    name: The field name.
+    value: The field value as a string.
+    Returns the encoded field as bytes.
+    """
+    encoded_value = str(value).encode('utf-8', 'replace')
+    if b'\n' in encoded_value:
+        # Values containing newlines are sent with an explicit length.
+        encoded_field = name.encode('ascii') + b'\n' + \
+            struct.pack('<Q', len(encoded_value)) + encoded_value + b'\n'
+    else:
+        encoded_field = name.encode('ascii') + b'=' + encoded_value + b'\n'
+    return encoded_field
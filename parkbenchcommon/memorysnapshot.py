@@ -0,0 +1,165 @@
+# Copyright 2026 Joel Allen Luellwitz and Emily Frost
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Provides on-demand tracemalloc snapshots that a running daemon takes when it receives a
+signal.
+
+A daemon calls install during setup. Each time the signal arrives, a snapshot of the
+  memory allocated by Python is taken and compared with the previous snapshot, and the
+  allocation sites that grew the most are logged and, optionally, written to a report on
+  the program's ramdisk. Tracing slows allocations down, so by default it is not started
+  until the first signal arrives; that first signal only starts tracing, and the reports
+  begin with the second. For example:
+
+  memorysnapshot.install('/var/spool/myprogram/ramdisk')
+  ...
+  $ kill -USR1 <pid>
+"""
+
+__all__ = ['MemorySnapshotter', 'install']
+
+import logging
+import signal
+import threading
+import tracemalloc
+from parkbenchcommon import daemonhelper
+
+REPORT_FILENAME_FORMAT = 'memory-%d-%s-%d.txt'
+STATISTIC_KEY_TYPES = ['filename', 'lineno', 'traceback']
+
+# Allocations made by the import machinery and by tracemalloc itself are not interesting.
+SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<unknown>')]
+
+
+class MemorySnapshotter(daemonhelper.SignalTriggeredReporter):
+    """Takes tracemalloc snapshots and reports where memory grew since the previous one."""
+
+    def __init__(self, output_directory=None, top_count=25, key_type='lineno',
+                 frame_count=1, trace_immediately=False, signal_number=signal.SIGUSR1):
+        """Constructor.
+
+        output_directory: The directory reports are written to, usually the program's
+          ramdisk. If None, reports are only logged.
+        top_count: The number of allocation sites included in each report.
+        key_type: How allocations are grouped. One of STATISTIC_KEY_TYPES.
+        frame_count: The number of frames recorded for each allocation. More frames make
+          'traceback' reports more useful but make tracing slower.
+        trace_immediately: If True, tracing starts now. Otherwise, tracing starts the first
+          time a snapshot is requested.
+        signal_number: The signal that requests a snapshot once install is called.
+        """
+        if key_type not in STATISTIC_KEY_TYPES:
+            raise ValueError('Unknown statistic key type %s.' % key_type)
+
+        super().__init__(output_directory, signal_number, 'memory-snapshot')
+        self.logger = logging.getLogger(__name__)
+
+        self.top_count = top_count
+        self.key_type = key_type
+        self.frame_count = frame_count
+
+        self._lock = threading.Lock()
+        self._previous_snapshot = None
+
+        if trace_immediately:
+            self._start_tracing()
+
+    def install(self):
+        """Installs the signal handler that requests snapshots and starts the thread that
+        waits for it. Must be called from the main thread.
+        """
+        super().install()
+        self.logger.info('Memory snapshotter installed. Send signal %s to take a snapshot.',
+                         signal.Signals(self.signal_number).name)
+
+    def take_snapshot(self):
+        """Takes a snapshot and reports the allocation sites that grew the most since the
+        previous snapshot, or the largest allocation sites if there is no previous
+        snapshot. If tracing has not started, it is started instead and nothing is
+        reported.
+
+        Returns the report as a list of lines, or None if tracing was just started.
+        """
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                self._start_tracing()
+                self._previous_snapshot = None
+                return None
+
+            snapshot = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+            traced_size, peak_traced_size = tracemalloc.get_traced_memory()
+
+            if self._previous_snapshot is None:
+                statistics = snapshot.statistics(self.key_type)
+                report_lines = ['Largest allocation sites:']
+            else:
+                statistics = snapshot.compare_to(self._previous_snapshot, self.key_type)
+                report_lines = ['Allocation growth since the previous snapshot:']
+            self._previous_snapshot = snapshot
+
+        report_lines.insert(0, 'Traced memory: %d KiB, peak %d KiB.' % (
+            traced_size // 1024, peak_traced_size // 1024))
+        for statistic in statistics[:self.top_count]:
+            report_lines.append(str(statistic))
+            if self.key_type == 'traceback':
+                report_lines.extend(statistic.traceback.format())
+
+        self.logger.info('Memory snapshot:\n%s', '\n'.join(report_lines))
+        if self.output_directory is not None:
+            report_path = self._write_report(REPORT_FILENAME_FORMAT, report_lines)
+            self.logger.info('Wrote memory snapshot report to %s.', report_path)
+
+        return report_lines
+
+    def _start_tracing(self):
+        """Starts tracing Python memory allocations."""
+        tracemalloc.start(self.frame_count)
+        self.logger.info('Started tracing memory allocations. Request another snapshot to '
+                         'get a report.')
+
+    def _handle_trigger(self):
+        """Takes a snapshot when the snapshot signal is received and logs any exception
+        instead of raising it. The snapshot is taken in the trigger thread, so the main
+        thread is not blocked while the snapshot is compared.
+        """
+        try:
+            self.take_snapshot()
+        except Exception:
+            self.logger.exception('Memory snapshot failed.')
+
+
+def install(output_directory=None, top_count=25, key_type='lineno', frame_count=1,
+            trace_immediately=False, signal_number=signal.SIGUSR1):
+    """Creates a MemorySnapshotter and installs its signal handler. Must be called from the
+    main thread.
+
+    output_directory: The directory reports are written to. If None, reports are only
+      logged.
+    top_count: The number of allocation sites included in each report.
+    key_type: How allocations are grouped. One of STATISTIC_KEY_TYPES.
+    frame_count: The number of frames recorded for each allocation.
+    trace_immediately: If True, tracing starts now. Otherwise, tracing starts the first
+      time a snapshot is requested.
+    signal_number: The signal that requests a snapshot.
+    Returns the MemorySnapshotter.
+    """
+    snapshotter = MemorySnapshotter(output_directory, top_count, key_type, frame_count,
+                                    trace_immediately, signal_number)
+    snapshotter.install()
+    return snapshotter
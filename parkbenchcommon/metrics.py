@@ -0,0 +1,478 @@
+# Copyright 2026 Joel Allen Luellwitz and Emily Frost
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Provides a small registry of counters, gauges, and histograms and exports it as a
+Prometheus textfile.
+
+The parkbenchcommon modules record their own metrics (broadcasts issued and consumed,
+  broadcast checks, ramdisk mount and snapshot times, permission changes, worker restarts,
+  and configuration validation failures) in the shared registry. A program can add its own
+  metrics with counter, gauge, and histogram, and calls start_exporter to periodically
+  write every metric to a file on its ramdisk, where a node exporter textfile collector
+  can scrape it without any I/O on persistent storage.
+"""
+
+__all__ = ['Counter', 'DEFAULT_BUCKETS', 'Gauge', 'Histogram', 'MetricsRegistry', 'counter',
+           'gauge', 'histogram', 'render', 'start_exporter', 'stop_exporter',
+           'write_textfile']
+
+import bisect
+import contextlib
+import logging
+import re
+import threading
+import time
+
+# Histogram bucket upper bounds in seconds, suitable for timing most operations.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 60)
+
+METRIC_NAME_PATTERN = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*$')
+LABEL_NAME_PATTERN = re.compile(r'^[a-zA-Z_][a-zA-Z0-9_]*$')
+
+
+class _Metric():
+    """The base class of all metrics. A metric has one child per distinct combination of
+    label values, and each child holds the values of one time series.
+    """
+    metric_type = None
+
+    def __init__(self, name, help_text, label_names=()):
+        """Constructor.
+
+        name: The name of the metric.
+        help_text: A description of the metric.
+        label_names: The names of the labels distinguishing the metric's time series.
+        """
+        if not METRIC_NAME_PATTERN.match(name):
+            raise ValueError('Invalid metric name %s.' % name)
+        for label_name in label_names:
+            if not LABEL_NAME_PATTERN.match(label_name):
+                raise ValueError('Invalid label name %s for metric %s.' % (label_name, name))
+
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+
+        self._lock = threading.Lock()
+        # Children keyed by a tuple of label values.
+        self._children = {}
+        self._unlabelled_child = None if self.label_names else self.labels()
+
+    def labels(self, *label_values):
+        """Returns the child holding the time series with the given label values. Callers
+        on hot paths should keep the returned child instead of calling this repeatedly.
+
+        label_values: One value for each label name, in the same order.
+        """
+        if len(label_values) != len(self.label_names):
+            raise ValueError('Metric %s expects %d label values but got %d.' % (
+                self.name, len(self.label_names), len(label_values)))
+
+        label_values = tuple(str(label_value) for label_value in label_values)
+        with self._lock:
+            child = self._children.get(label_values)
+            if child is None:
+                child = self._create_child()
+                self._children[label_values] = child
+        return child
+
+    def _create_child(self):
+        """Returns a new child holding the values of one time series."""
+        raise NotImplementedError()
+
+    def _get_unlabelled_child(self):
+        """Returns the only child of a metric without labels."""
+        if self._unlabelled_child is None:
+            raise ValueError('Metric %s has labels. Call labels first.' % self.name)
+        return self._unlabelled_child
+
+    def render(self, constant_labels=()):
+        """Renders the metric in the Prometheus text exposition format.
+
+        constant_labels: A sequence of (name, value) tuples added to every sample.
+        Returns a list of lines.
+        """
+        lines = ['# HELP %s %s' % (self.name, _escape_help_text(self.help_text)),
+                 '# TYPE %s %s' % (self.name, self.metric_type)]
+        with self._lock:
+            children = sorted(self._children.items())
+        for label_values, child in children:
+            labels = list(constant_labels) + list(zip(self.label_names, label_values))
+            lines.extend(self._render_child(child, labels))
+        return lines
+
+    def _render_child(self, child, labels):
+        """Renders the samples of one child.
+
+        child: The child to render.
+        labels: A list of (name, value) tuples identifying the child.
+        Returns a list of lines.
+        """
+        return ['%s%s %s' % (self.name, _format_labels(labels), _format_value(child.value))]
+
+
+class _CounterChild():
+    """One time series of a Counter."""
+    __slots__ = ('_lock', 'value')
+
+    def __init__(self, lock):
+        self._lock = lock
+        self.value = 0
+
+    def inc(self, amount=1):
+        """Increases the counter.
+
+        amount: The non-negative amount to add.
+        """
+        if amount < 0:
+            raise ValueError('Counters can only increase.')
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    """A value that only increases, such as the number of broadcasts issued."""
+    metric_type = 'counter'
+
+    def _create_child(self):
+        return _CounterChild(self._lock)
+
+    def inc(self, amount=1):
+        """Increases a counter without labels.
+
+        amount: The non-negative amount to add.
+        """
+        self._get_unlabelled_child().inc(amount)
+
+
+class _GaugeChild():
+    """One time series of a Gauge."""
+    __slots__ = ('_lock', 'value')
+
+    def __init__(self, lock):
+        self._lock = lock
+        self.value = 0
+
+    def set(self, value):
+        """Sets the gauge.
+
+        value: The new value.
+        """
+        self.value = value
+
+    def inc(self, amount=1):
+        """Increases the gauge.
+
+        amount: The amount to add.
+        """
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        """Decreases the gauge.
+
+        amount: The amount to subtract.
+        """
+        with self._lock:
+            self.value -= amount
+
+
+class Gauge(_Metric):
+    """A value that can go up and down, such as the number of running workers."""
+    metric_type = 'gauge'
+
+    def _create_child(self):
+        return _GaugeChild(self._lock)
+
+    def set(self, value):
+        """Sets a gauge without labels.
+
+        value: The new value.
+        """
+        self._get_unlabelled_child().set(value)
+
+    def inc(self, amount=1):
+        """Increases a gauge without labels.
+
+        amount: The amount to add.
+        """
+        self._get_unlabelled_child().inc(amount)
+
+    def dec(self, amount=1):
+        """Decreases a gauge without labels.
+
+        amount: The amount to subtract.
+        """
+        self._get_unlabelled_child().dec(amount)
+
+
+class _HistogramChild():
+    """One time series of a Histogram."""
+    __slots__ = ('_lock', '_buckets', 'bucket_counts', 'sum')
+
+    def __init__(self, lock, buckets):
+        self._lock = lock
+        self._buckets = buckets
+        # Non-cumulative counts. The last count is for values above the largest bucket.
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        """Records a value.
+
+        value: The value to record.
+        """
+        bucket_index = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            self.bucket_counts[bucket_index] += 1
+            self.sum += value
+
+    @contextlib.contextmanager
+    def time(self):
+        """Context manager that records the number of seconds its body takes."""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start_time)
+
+
+class Histogram(_Metric):
+    """Counts values, such as durations, in buckets of increasing size."""
+    metric_type = 'histogram'
+
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        """Constructor.
+
+        name: The name of the metric.
+        help_text: A description of the metric.
+        label_names: The names of the labels distinguishing the metric's time series.
+        buckets: The increasing upper bounds of the buckets. A bucket for values above the
+          largest bound is added automatically.
+        """
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help_text, label_names)
+
+    def _create_child(self):
+        return _HistogramChild(self._lock, self.buckets)
+
+    def observe(self, value):
+        """Records a value in a histogram without labels.
+
+        value: The value to record.
+        """
+        self._get_unlabelled_child().observe(value)
+
+    def time(self):
+        """Context manager that records the number of seconds its body takes in a histogram
+        without labels.
+        """
+        return self._get_unlabelled_child().time()
+
+    def _render_child(self, child, labels):
+        with self._lock:
+            bucket_counts = list(child.bucket_counts)
+            value_sum = child.sum
+
+        lines = []
+        cumulative_count = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), bucket_counts):
+            cumulative_count += bucket_count
+            lines.append('%s_bucket%s %d' % (
+                self.name, _format_labels(labels + [('le', _format_value(bound))]),
+                cumulative_count))
+        lines.append('%s_sum%s %s' % (self.name, _format_labels(labels),
+                                      _format_value(value_sum)))
+        lines.append('%s_count%s %d' % (self.name, _format_labels(labels), cumulative_count))
+        return lines
+
+
+class MetricsRegistry():
+    """Holds a set of metrics and exports them in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._export_thread = None
+        self._stop_event = threading.Event()
+
+    def counter(self, name, help_text, label_names=()):
+        """Returns the counter with the given name, creating it if necessary.
+
+        name: The name of the metric.
+        help_text: A description of the metric.
+        label_names: The names of the labels distinguishing the metric's time series.
+        """
+        return self._register(Counter, name, help_text, label_names)
+
+    def gauge(self, name, help_text, label_names=()):
+        """Returns the gauge with the given name, creating it if necessary.
+
+        name: The name of the metric.
+        help_text: A description of the metric.
+        label_names: The names of the labels distinguishing the metric's time series.
+        """
+        return self._register(Gauge, name, help_text, label_names)
+
+    def histogram(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        """Returns the histogram with the given name, creating it if necessary.
+
+        name: The name of the metric.
+        help_text: A description of the metric.
+        label_names: The names of the labels distinguishing the metric's time series.
+        buckets: The increasing upper bounds of the buckets.
+        """
+        return self._register(Histogram, name, help_text, label_names, buckets=buckets)
+
+    def _register(self, metric_class, name, help_text, label_names, **kwargs):
+        """Returns the registered metric with the given name, or creates and registers a new
+        one. Raises a ValueError if a different kind of metric has the same name.
+
+        metric_class: The class of the metric.
+        name: The name of the metric.
+        help_text: A description of the metric.
+        label_names: The names of the labels distinguishing the metric's time series.
+        kwargs: Additional arguments for the metric's constructor.
+        """
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = metric_class(name, help_text, label_names, **kwargs)
+                self._metrics[name] = metric
+            elif type(metric) is not metric_class or \
+                    metric.label_names != tuple(label_names):
+                raise ValueError('Metric %s is already registered with a different type or '
+                                 'labels.' % name)
+        return metric
+
+    def render(self, constant_labels=None):
+        """Renders every metric in the Prometheus text exposition format.
+
+        constant_labels: A dictionary of labels added to every sample, such as the program
+          name. Needed when several programs export metrics with the same names.
+        Returns the rendered metrics as a string.
+        """
+        constant_labels = sorted((constant_labels or {}).items())
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+
+        lines = []
+        for _, metric in metrics:
+            lines.extend(metric.render(constant_labels))
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path, constant_labels=None, mode=0o644):
+        """Writes every metric to a Prometheus textfile. The file is written to a temporary
+        file and renamed into place, so a scraper never reads a partial file.
+
+        path: The pathname of the textfile, usually on the program's ramdisk. The node
+          exporter textfile collector only reads files ending in .prom.
+        constant_labels: A dictionary of labels added to every sample.
+        mode: The permissions of the textfile.
+        """
+        # Deferred because daemonhelper imports this module. The temporary file's name ends
+        #   in .tmp, so the collector never reads it.
+        from parkbenchcommon import daemonhelper
+        text = self.render(constant_labels)
+        with daemonhelper.write_atomically(path, mode) as textfile:
+            textfile.write(text)
+
+    def start_exporter(self, path, interval=15, constant_labels=None):
+        """Calls write_textfile in a background thread every interval seconds until
+        stop_exporter is called.
+
+        path: The pathname of the textfile.
+        interval: The number of seconds between writes.
+        constant_labels: A dictionary of labels added to every sample.
+        """
+        self._stop_event.clear()
+        self._export_thread = threading.Thread(
+            target=self._export, args=(path, interval, constant_labels),
+            name='metrics-exporter', daemon=True)
+        self._export_thread.start()
+
+    def stop_exporter(self):
+        """Stops the background thread started by start_exporter."""
+        self._stop_event.set()
+        if self._export_thread is not None:
+            self._export_thread.join()
+            self._export_thread = None
+
+    def _export(self, path, interval, constant_labels):
+        """Writes the textfile until stop_exporter is called. Metrics are written once more
+        when stopping so the last values are not lost.
+
+        path: The pathname of the textfile.
+        interval: The number of seconds between writes.
+        constant_labels: A dictionary of labels added to every sample.
+        """
+        stopping = False
+        while not stopping:
+            stopping = self._stop_event.wait(interval)
+            try:
+                self.write_textfile(path, constant_labels)
+            except Exception:
+                self.logger.exception('Failed to write metrics textfile %s.', path)
+
+
+def _format_labels(labels):
+    """Formats labels for a sample line.
+
+    labels: A sequence of (name, value) tuples.
+    Returns the formatted labels, or an empty string if there are no labels.
+    """
+    if not labels:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (name, _escape_label_value(str(value)))
+                             for name, value in labels)
+
+
+def _escape_label_value(value):
+    """Escapes backslashes, double quotes, and newlines in a label value."""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _escape_help_text(help_text):
+    """Escapes backslashes and newlines in help text."""
+    return help_text.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def _format_value(value):
+    """Formats a sample value.
+
+    value: An int or float.
+    Returns the formatted value.
+    """
+    if isinstance(value, int):
+        return str(value)
+    if value == float('inf'):
+        return '+Inf'
+    if value == float('-inf'):
+        return '-Inf'
+    return repr(float(value))
+
+
+# The registry shared by all parkbenchcommon modules.
+_REGISTRY = MetricsRegistry()
+
+counter = _REGISTRY.counter
+gauge = _REGISTRY.gauge
+histogram = _REGISTRY.histogram
+render = _REGISTRY.render
+write_textfile = _REGISTRY.write_textfile
+start_exporter = _REGISTRY.start_exporter
+stop_exporter = _REGISTRY.stop_exporter
@@ -15,15 +15,28 @@
 
 """Provides a class for managing ramdisks."""
 
-__all__ = ['Ramdisk', 'RamdiskMountError', 'RamdiskOptionError']
+__all__ = ['Ramdisk', 'RamdiskMountError', 'RamdiskOptionError', 'RamdiskRestoreError',
+           'RamdiskSnapshotError']
 
 import logging
 import os
-import subprocess
+import threading
+from parkbenchcommon import daemonhelper
+from parkbenchcommon import metrics
+from parkbenchcommon import startuptracer
 
 # This is easy to edit, just in case someone wants a disk measurable in terabytes.
 VALID_TMPFS_SIZE_SUFFIXES = ['K', 'k', 'M', 'm', 'G', 'g', '%']
 
+# Snapshots are extracted into a directory with this prefix on the ramdisk and moved into
+#   place once the whole archive has been extracted.
+RESTORE_DIRECTORY_PREFIX = '.restore-'
+
+MOUNT_SECONDS = metrics.histogram(
+    'parkbench_ramdisk_mount_seconds', 'Time taken to mount a ramdisk.')
+SNAPSHOT_SECONDS = metrics.histogram(
+    'parkbench_ramdisk_snapshot_seconds', 'Time taken to write a ramdisk snapshot.')
+
 
 class RamdiskMountError(Exception):
     """Raised when a ramdisk mount operation fails."""
@@ -33,6 +46,14 @@ class RamdiskOptionError(ValueError):
     """Raised when an option for a ramdisk mount is invalid."""
 
 
+class RamdiskSnapshotError(Exception):
+    """Raised when the contents of a ramdisk cannot be saved to a snapshot archive."""
+
+
+class RamdiskRestoreError(Exception):
+    """Raised when the contents of a ramdisk cannot be restored from a snapshot archive."""
+
+
 class Ramdisk:
     """A class for managing ramdisks."""
 
@@ -46,7 +67,11 @@ class Ramdisk:
         # The mount command outputs the canonical path of all mountpoints. Python calls this
         #   realpath.
         self.path = os.path.realpath(path)
+        # The RamdiskSnapshotError raised by the last completed snapshot, or None if it
+        #   succeeded or no snapshot has completed.
+        self.last_snapshot_error = None
 
+    @startuptracer.traced('ramdisk.mount')
     def mount(self, size, uid, gid, mode):
         """Mounts the ramdisk. Raises an exception on failure, and does nothing if the disk
         is already mounted.
@@ -84,19 +109,193 @@ class Ramdisk:
             if not os.listdir(self.path) == []:
                 self.logger.warning('Ramdisk mountpoint %s is not empty.', self.path)
 
-            return_code = subprocess.call(
-                ['mount', '-t', 'tmpfs', '-o', mount_options, 'none', self.path])
+            # Deferred so processes that never mount a ramdisk do not import subprocess.
+            import subprocess
+            with MOUNT_SECONDS.time():
+                return_code = subprocess.call(
+                    ['mount', '-t', 'tmpfs', '-o', mount_options, 'none', self.path])
 
             if not self.is_mounted():
                 raise RamdiskMountError(
                     'Could not mount ramdisk on %s. Mount return code was %s.' %
                     (self.path, return_code))
 
+    def snapshot(self, archive_path, background=True):
+        """Saves the contents of the ramdisk to a gzip compressed tar archive on persistent
+        storage so it can be restored after a reboot. The archive is streamed to a
+        temporary file next to archive_path and renamed into place once complete, so a
+        failed or interrupted snapshot never replaces a good one.
+
+        archive_path: The pathname of the archive to write. The directory containing it must
+          already exist.
+        background: If True, the snapshot is written in a separate thread and this method
+          returns immediately. A failure in the thread is logged and stored in
+          last_snapshot_error instead of being raised.
+        Returns the thread writing the snapshot if background is True. Otherwise, returns
+          None after the snapshot has been written. Call join() on the returned thread to
+          wait for the snapshot to complete, and then check last_snapshot_error.
+        """
+        if not self.is_mounted():
+            message = 'Could not snapshot ramdisk %s. Ramdisk is not mounted.' % self.path
+            self.logger.error(message)
+            raise RamdiskSnapshotError(message)
+
+        snapshot_thread = None
+        if background:
+            snapshot_thread = threading.Thread(
+                target=self._write_snapshot_in_background, args=(archive_path,),
+                name='ramdisk-snapshot', daemon=False)
+            snapshot_thread.start()
+        else:
+            self._write_snapshot(archive_path)
+
+        return snapshot_thread
+
+    def restore(self, archive_path):
+        """Restores the contents of the ramdisk from an archive written by snapshot. This
+        should be called right after mount and before the program starts using the ramdisk.
+        Ownership and permissions of the restored files are preserved. The archive is
+        extracted into a temporary directory on the ramdisk first, so a damaged or unsafe
+        archive leaves the ramdisk unchanged. Existing entries with the same names as
+        entries in the archive are replaced.
+
+        archive_path: The pathname of the archive to read.
+        Returns True if the snapshot was restored. Returns False if no snapshot exists.
+        """
+        if not self.is_mounted():
+            message = 'Could not restore ramdisk %s. Ramdisk is not mounted.' % self.path
+            self.logger.error(message)
+            raise RamdiskRestoreError(message)
+
+        if not os.path.isfile(archive_path):
+            self.logger.info('No snapshot found at %s for ramdisk %s.', archive_path,
+                             self.path)
+            return False
+
+        self.logger.info('Restoring ramdisk %s from snapshot %s.', self.path, archive_path)
+        # Deferred so processes that never restore a ramdisk do not import these modules.
+        import shutil
+        import tarfile
+        extract_path = os.path.join(
+            self.path, RESTORE_DIRECTORY_PREFIX + os.urandom(8).hex())
+        try:
+            os.mkdir(extract_path, 0o700)
+            try:
+                # Streaming mode reads the archive sequentially and never seeks.
+                with tarfile.open(archive_path, 'r|gz') as archive:
+                    self._extract_snapshot(archive, extract_path)
+                for filename in os.listdir(extract_path):
+                    target_path = os.path.join(self.path, filename)
+                    if os.path.isdir(target_path) and not os.path.islink(target_path):
+                        shutil.rmtree(target_path)
+                    elif os.path.lexists(target_path):
+                        os.unlink(target_path)
+                    os.rename(os.path.join(extract_path, filename), target_path)
+            finally:
+                shutil.rmtree(extract_path)
+        except RamdiskRestoreError:
+            raise
+        except Exception as exception:
+            message = 'Could not restore ramdisk %s from snapshot %s.' % (
+                self.path, archive_path)
+            self.logger.error(message)
+            raise RamdiskRestoreError(message) from exception
+
+        self.logger.info('Ramdisk %s restored from snapshot %s.', self.path, archive_path)
+        return True
+
+    def _write_snapshot_in_background(self, archive_path):
+        """Writes a snapshot and stores any failure in last_snapshot_error instead of
+        raising it, because an exception raised in a thread is lost. Runs in the snapshot
+        thread.
+
+        archive_path: The pathname of the archive to write.
+        """
+        try:
+            self._write_snapshot(archive_path)
+        except RamdiskSnapshotError:
+            # _write_snapshot already logged the failure and stored it.
+            pass
+
+    def _write_snapshot(self, archive_path):
+        """Streams the contents of the ramdisk to a temporary archive and atomically
+        renames it to archive_path. Records the outcome in last_snapshot_error.
+
+        archive_path: The pathname of the archive to write.
+        """
+        self.logger.info('Writing snapshot of ramdisk %s to %s.', self.path, archive_path)
+        import tarfile
+        try:
+            with SNAPSHOT_SECONDS.time(), daemonhelper.write_atomically(
+                    archive_path, binary=True) as archive_file:
+                with tarfile.open(fileobj=archive_file, mode='w|gz') as archive:
+                    for filename in sorted(os.listdir(self.path)):
+                        archive.add(os.path.join(self.path, filename), arcname=filename)
+
+        except Exception as exception:
+            message = 'Could not write snapshot of ramdisk %s to %s. %s' % (
+                self.path, archive_path, exception)
+            self.logger.error(message)
+            self.last_snapshot_error = RamdiskSnapshotError(message)
+            raise self.last_snapshot_error from exception
+
+        self.last_snapshot_error = None
+        self.logger.info('Snapshot of ramdisk %s written to %s.', self.path, archive_path)
+
+    def _extract_snapshot(self, archive, extract_path):
+        """Checks and extracts every member of a snapshot archive. Like
+        TarFile.extractall, directory ownership and permissions are applied after all
+        members are extracted, so a read-only directory can still be filled.
+
+        archive: The TarFile to extract.
+        extract_path: The directory to extract the archive into.
+        """
+        import tarfile
+        extract_arguments = {'numeric_owner': True}
+        # Members are checked by _check_snapshot_member. The default filter of newer Python
+        #   versions would discard the ownership the snapshot preserves.
+        if hasattr(tarfile, 'fully_trusted_filter'):
+            extract_arguments['filter'] = 'fully_trusted'
+
+        def checked_members():
+            for member in archive:
+                self._check_snapshot_member(member, extract_path)
+                yield member
+
+        archive.extractall(extract_path, checked_members(), **extract_arguments)
+
+    def _check_snapshot_member(self, member, extract_path):
+        """Raises an exception if extracting the archive member would write outside of the
+        extraction directory, create a device file, or create a link that points outside of
+        the ramdisk.
+
+        member: The TarInfo object to check.
+        extract_path: The directory the archive is extracted into.
+        """
+        member_path = os.path.realpath(os.path.join(extract_path, member.name))
+        unsafe = os.path.commonpath([extract_path, member_path]) != extract_path \
+            or member.isdev()
+        if member.issym():
+            # Absolute links may point to anywhere on the ramdisk.
+            link_path = os.path.realpath(os.path.join(
+                os.path.dirname(member_path), member.linkname))
+            unsafe = unsafe or os.path.commonpath([self.path, link_path]) != self.path
+        elif member.islnk():
+            link_path = os.path.realpath(os.path.join(extract_path, member.linkname))
+            unsafe = unsafe or os.path.commonpath([extract_path, link_path]) != extract_path
+
+        if unsafe:
+            message = 'Snapshot member %s for ramdisk %s is not safe to extract.' % (
+                member.name, self.path)
+            self.logger.error(message)
+            raise RamdiskRestoreError(message)
+
     def is_mounted(self):
         """Checks whether the ramdisk is mounted.
 
         Returns True if is mounted, returns False otherwise.
         """
+        import subprocess
         return 'none on %s type tmpfs' % self.path in str(subprocess.check_output('mount'))
 
     def _validate_integer_option(self, option_name, value):
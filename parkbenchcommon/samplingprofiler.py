@@ -0,0 +1,196 @@
+# Copyright 2026 Joel Allen Luellwitz and Emily Frost
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Provides a sampling profiler that a running daemon starts when it receives a signal.
+
+A daemon calls install during setup. Until the signal arrives, the only cost is the signal
+  handler. When the signal arrives, a background thread samples the stacks of every thread
+  at a fixed rate for a fixed time, and then writes the samples in the collapsed stack
+  format used by flamegraph.pl and speedscope to a file on the program's ramdisk. For
+  example:
+
+  samplingprofiler.install('/var/spool/myprogram/ramdisk')
+  ...
+  $ kill -USR2 <pid>
+"""
+
+__all__ = ['SamplingProfiler', 'install']
+
+import logging
+import signal
+import sys
+import threading
+import time
+from parkbenchcommon import daemonhelper
+
+PROFILE_FILENAME_FORMAT = 'profile-%d-%s-%d.folded'
+
+
+class SamplingProfiler(daemonhelper.SignalTriggeredReporter):
+    """Samples the stacks of all threads at a fixed rate and writes collapsed stacks."""
+
+    def __init__(self, output_directory, sample_rate=100, duration=10,
+                 signal_number=signal.SIGUSR2):
+        """Constructor.
+
+        output_directory: The directory profiles are written to, usually the program's
+          ramdisk.
+        sample_rate: The number of samples to take per second.
+        duration: The number of seconds to sample for each time profiling is triggered.
+        signal_number: The signal that triggers profiling once install is called.
+        """
+        super().__init__(output_directory, signal_number, 'sampling-profiler-trigger')
+        self.logger = logging.getLogger(__name__)
+
+        self.sample_rate = sample_rate
+        self.duration = duration
+
+        self._lock = threading.Lock()
+        self._sampling_thread = None
+        # Frame labels keyed by code object, so each function is only formatted once.
+        self._frame_labels = {}
+
+    def install(self):
+        """Installs the signal handler that triggers profiling and starts the thread that
+        waits for it. Must be called from the main thread.
+        """
+        super().install()
+        self.logger.info('Sampling profiler installed. Send signal %s to profile for %s '
+                         'seconds.', signal.Signals(self.signal_number).name, self.duration)
+
+    def start(self, duration=None):
+        """Starts sampling in a background thread. Does nothing if sampling is already in
+        progress.
+
+        duration: The number of seconds to sample. If None, the duration passed to the
+          constructor is used.
+        Returns the sampling thread, or None if sampling was already in progress. Call
+          join() on the returned thread to wait for the profile to be written.
+        """
+        if duration is None:
+            duration = self.duration
+
+        with self._lock:
+            if self._sampling_thread is not None and self._sampling_thread.is_alive():
+                self.logger.warning('Sampling profiler is already running.')
+                return None
+            self._sampling_thread = threading.Thread(
+                target=self._profile, args=(duration,), name='sampling-profiler',
+                daemon=True)
+            self._sampling_thread.start()
+        return self._sampling_thread
+
+    def _handle_trigger(self):
+        """Starts sampling when the profiling signal is received."""
+        self.start()
+
+    def _profile(self, duration):
+        """Samples for the given duration and writes the profile. Runs in the sampling
+        thread.
+
+        duration: The number of seconds to sample.
+        """
+        self.logger.info('Sampling all threads %d times per second for %s seconds.',
+                         self.sample_rate, duration)
+        try:
+            stack_counts, sample_count = self._sample(duration)
+            profile_path = self._write_profile(stack_counts)
+            self.logger.info('Wrote profile of %d samples to %s.', sample_count,
+                             profile_path)
+        except Exception:
+            self.logger.exception('Sampling profiler failed.')
+
+    def _sample(self, duration):
+        """Repeatedly records the stack of every thread except the sampling and trigger
+        threads.
+
+        duration: The number of seconds to sample.
+        Returns a tuple of a dictionary of sample counts keyed by collapsed stack and the
+          number of times the threads were sampled.
+        """
+        trigger_thread = self._trigger_thread
+        ignored_thread_ids = {threading.get_ident(),
+                              trigger_thread.ident if trigger_thread else None}
+        interval = 1 / self.sample_rate
+        stack_counts = {}
+        sample_count = 0
+
+        start_time = time.monotonic()
+        next_sample_time = start_time
+        while next_sample_time - start_time < duration:
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id in ignored_thread_ids:
+                    continue
+                stack = self._collapse_stack(
+                    thread_names.get(thread_id, 'thread-%d' % thread_id), frame)
+                stack_counts[stack] = stack_counts.get(stack, 0) + 1
+            # Frames are released before sleeping so sampling does not keep them alive.
+            frame = None
+            sample_count += 1
+
+            # Sampling is scheduled at fixed times so the rate does not drift by the time
+            #   each sample takes.
+            next_sample_time += interval
+            delay = next_sample_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+        return stack_counts, sample_count
+
+    def _collapse_stack(self, thread_name, frame):
+        """Converts a stack to a semicolon separated list of frames, outermost first.
+
+        thread_name: The name of the thread, used as the root frame.
+        frame: The innermost frame of the thread.
+        Returns the collapsed stack.
+        """
+        labels = []
+        while frame is not None:
+            code = frame.f_code
+            label = self._frame_labels.get(code)
+            if label is None:
+                label = ('%s (%s:%d)' % (code.co_name, code.co_filename,
+                                         code.co_firstlineno)).replace(';', ':')
+                self._frame_labels[code] = label
+            labels.append(label)
+            frame = frame.f_back
+        labels.append(thread_name.replace(';', ':'))
+        labels.reverse()
+        return ';'.join(labels)
+
+    def _write_profile(self, stack_counts):
+        """Writes the samples to a new file in the output directory.
+
+        stack_counts: A dictionary of sample counts keyed by collapsed stack.
+        Returns the pathname of the profile.
+        """
+        return self._write_report(PROFILE_FILENAME_FORMAT, (
+            '%s %d' % (stack, count) for stack, count in sorted(stack_counts.items())))
+
+
+def install(output_directory, sample_rate=100, duration=10, signal_number=signal.SIGUSR2):
+    """Creates a SamplingProfiler and installs its signal handler. Must be called from the
+    main thread.
+
+    output_directory: The directory profiles are written to, usually the program's ramdisk.
+    sample_rate: The number of samples to take per second.
+    duration: The number of seconds to sample each time profiling is triggered.
+    signal_number: The signal that triggers profiling.
+    Returns the SamplingProfiler.
+    """
+    profiler = SamplingProfiler(output_directory, sample_rate, duration, signal_number)
+    profiler.install()
+    return profiler
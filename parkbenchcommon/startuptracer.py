@@ -0,0 +1,152 @@
+# Copyright 2026 Joel Allen Luellwitz and Emily Frost
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Provides a lightweight tracer that records how long each phase of daemon startup takes.
+
+The parkbenchcommon modules report their own phases (reading options, configuring the
+  logger, mounting ramdisks, creating directories, and initializing broadcasters). A
+  program calls start() as early as possible, optionally wraps its own startup steps in
+  phase(), and calls finish() once initialization is complete to log or write the timing
+  breakdown. Phases are not recorded unless the tracer has been started.
+"""
+
+__all__ = ['StartupTracer', 'finish', 'phase', 'start', 'traced']
+
+import contextlib
+import functools
+import logging
+import threading
+import time
+
+PHASE_SEPARATOR = '/'
+REPORT_HEADER = '%-60s %8s %12s %12s' % ('Phase', 'Count', 'Wall (ms)', 'CPU (ms)')
+REPORT_LINE = '%-60s %8d %12.3f %12.3f'
+
+
+class StartupTracer():
+    """Records the wall clock and CPU time spent in named, possibly nested, startup phases.
+    Phases with the same name and parent are aggregated.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._thread_state = threading.local()
+        # Lists of [count, wall seconds, CPU seconds] keyed by phase path, in the order the
+        #   phases were first entered.
+        self._phases = {}
+        self._start_wall_time = None
+        self._start_cpu_time = None
+
+    def start(self):
+        """Discards any previously recorded phases and starts recording."""
+        with self._lock:
+            self._phases = {}
+            self._start_wall_time = time.perf_counter()
+            self._start_cpu_time = time.process_time()
+            self.enabled = True
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Context manager that records the time spent in its body as the named phase. Does
+        nothing if the tracer has not been started.
+
+        name: The name of the phase.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        phase_stack = getattr(self._thread_state, 'phase_stack', None)
+        if phase_stack is None:
+            phase_stack = []
+            self._thread_state.phase_stack = phase_stack
+
+        phase_stack.append(name)
+        phase_path = PHASE_SEPARATOR.join(phase_stack)
+        with self._lock:
+            # Registered on entry so that parents are reported before their children.
+            totals = self._phases.setdefault(phase_path, [0, 0.0, 0.0])
+        start_wall_time = time.perf_counter()
+        start_cpu_time = time.process_time()
+        try:
+            yield
+        finally:
+            wall_time = time.perf_counter() - start_wall_time
+            cpu_time = time.process_time() - start_cpu_time
+            phase_stack.pop()
+            with self._lock:
+                totals[0] += 1
+                totals[1] += wall_time
+                totals[2] += cpu_time
+
+    def traced(self, name):
+        """Decorator that records each call of the decorated function as the named phase.
+
+        name: The name of the phase.
+        """
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with self.phase(name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def finish(self, report_path=None):
+        """Stops recording and logs the timing breakdown of all recorded phases at info
+        level.
+
+        report_path: If not None, the breakdown is also written to this file.
+        Returns the breakdown as a list of lines, or None if the tracer was not started.
+        """
+        with self._lock:
+            if not self.enabled:
+                return None
+            self.enabled = False
+            phases = self._phases
+            self._phases = {}
+            total_wall_time = time.perf_counter() - self._start_wall_time
+            total_cpu_time = time.process_time() - self._start_cpu_time
+
+        report_lines = [REPORT_HEADER]
+        for phase_path, (count, wall_time, cpu_time) in phases.items():
+            depth = phase_path.count(PHASE_SEPARATOR)
+            label = '  ' * depth + phase_path.rsplit(PHASE_SEPARATOR, 1)[-1]
+            report_lines.append(
+                REPORT_LINE % (label, count, wall_time * 1000, cpu_time * 1000))
+        report_lines.append(
+            REPORT_LINE % ('total', 1, total_wall_time * 1000, total_cpu_time * 1000))
+
+        self.logger.info('Startup timing breakdown:\n%s', '\n'.join(report_lines))
+
+        if report_path is not None:
+            with open(report_path, 'w') as report_file:
+                report_file.write('\n'.join(report_lines) + '\n')
+
+        return report_lines
+
+
+# The tracer shared by all parkbenchcommon modules.
+_TRACER = StartupTracer()
+
+start = _TRACER.start
+phase = _TRACER.phase
+traced = _TRACER.traced
+finish = _TRACER.finish
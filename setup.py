@@ -23,4 +23,5 @@ setuptools.setup(name='parkbenchcommon',
                  author_email='eviljoel@linux.com, emfrost@posteo.net',
                  license='GPLv3',
                  packages=['parkbenchcommon'],
+                 python_requires='>=3.8',
                  zipsafe=False)
@@ -24,7 +24,18 @@ __author__ = 'Joel Luellwitz and Emily Frost'
 __version__ = '0.8'
 
 import unittest
+from tests.broadcastconsumertest import BroadcastConsumerTest
+from tests.broadcastertest import BroadcasterTest
+from tests.cachedloggertest import CachedLoggerTest
 from tests.confighelpertest import ConfigHelperTest
+from tests.daemonhelpertest import DaemonHelperTest
+from tests.importtest import ImportTest
+from tests.loghandlerstest import LogHandlersTest
+from tests.memorysnapshottest import MemorySnapshotterTest
+from tests.metricstest import MetricsTest
+from tests.ramdisktest import RamdiskTest
+from tests.samplingprofilertest import SamplingProfilerTest
+from tests.startuptracertest import StartupTracerTest
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+
+# Copyright 2026 Joel Allen Luellwitz and Emily Frost
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests the broadcastconsumer module."""
+
+__author__ = 'Joel Luellwitz and Emily Frost'
+__version__ = '0.8'
+
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, call, patch
+from parkbenchcommon import broadcastconsumer
+from parkbenchcommon.broadcastconsumer import BroadcastCheckError, BroadcastConsumer, \
+    BroadcastPollScheduler, BroadcastRelay, WildcardBroadcastConsumer
+
+
+class BroadcastConsumerTest(unittest.TestCase):
+    "Tests the broadcast consumers and the BroadcastPollScheduler."
+
+    def setUp(self):
+        self.broadcast_directory = tempfile.TemporaryDirectory()
+        self.broadcast_path = self.broadcast_directory.name
+
+    def tearDown(self):
+        self.broadcast_directory.cleanup()
+
+    def _create_consumer(self, consumer_class, *args):
+        """Returns a consumer of program 'program' whose spool path is in the temporary
+        directory.
+        """
+        with patch('parkbenchcommon.broadcastconsumer.SPOOL_PATH', self.broadcast_path):
+            consumer = consumer_class('program', *args)
+        consumer.logger = MagicMock()
+        return consumer
+
+    def test_parse_broadcast_filename_when_sequence_format(self):
+        self.assertEqual(
+            ('cache-flush', 12, None), broadcastconsumer.parse_broadcast_filename(
+                'cache-flush---12-1700000000000000000---0a1b'))
+
+    def test_parse_broadcast_filename_when_old_format(self):
+        self.assertEqual(
+            ('cache-flush', None, '2024-01-02T03:04:05.678901'),
+            broadcastconsumer.parse_broadcast_filename(
+                'cache-flush---2024-01-02T03:04:05.678901---0a1b'))
+
+    def test_parse_broadcast_filename_when_not_a_broadcast(self):
+        for filename in ['cache-flush', 'cache-flush---12-1', 'a---b---c---d']:
+            with self.subTest(filename=filename):
+                self.assertIsNone(broadcastconsumer.parse_broadcast_filename(filename))
+
+    def test_consumer_ignores_existing_and_consumes_higher_sequence(self):
+        broadcast_path = os.path.join(self.broadcast_path, 'program', 'ramdisk', 'broadcast')
+        os.makedirs(broadcast_path)
+        open(os.path.join(broadcast_path, 'name---5-1---0'), 'w').close()
+        consumer = self._create_consumer(BroadcastConsumer, 'name', 0)
+
+        self.assertFalse(consumer.check())
+        self.assertFalse(consumer.check(['other---6-2---0']))
+        self.assertTrue(consumer.check(['name---7-1---0', 'other---6-2---0']))
+        self.assertEqual(7, consumer.last_consumed_sequence)
+
+    def test_consumer_restarts_when_sequence_goes_down(self):
+        consumer = self._create_consumer(BroadcastConsumer, 'name', 0)
+        consumer.last_consumed_sequence = 5
+
+        self.assertFalse(consumer.check(['name---4-2---0', 'other---5-3---0']))
+        self.assertTrue(consumer.check(['name---1-4---0']))
+        self.assertEqual(1, consumer.last_consumed_sequence)
+
+    def test_consumer_ignores_broadcast_during_minimum_delay(self):
+        consumer = self._create_consumer(BroadcastConsumer, 'name', 60)
+
+        self.assertTrue(consumer.check(['name---1-1---0']))
+        self.assertFalse(consumer.check(['name---2-2---0']))
+        self.assertEqual(2, consumer.last_consumed_sequence)
+
+    def test_pattern_index_matches_literal_and_wildcard_patterns(self):
+        pattern_index = broadcastconsumer._BroadcastPatternIndex()
+        pattern_index.add('cache-flush', 'literal')
+        pattern_index.add('cache-*', 'prefix')
+        pattern_index.add('*', 'everything')
+        pattern_index.add('cache-[ab]', 'set')
+
+        self.assertEqual(['everything', 'prefix', 'literal'],
+                         pattern_index.match('cache-flush'))
+        self.assertEqual(['everything', 'prefix', 'set'], pattern_index.match('cache-a'))
+        self.assertEqual(['everything'], pattern_index.match('cache'))
+        self.assertEqual(['*', 'cache-*', 'cache-[ab]', 'cache-flush'],
+                         pattern_index.patterns())
+
+    def test_pattern_index_is_case_sensitive(self):
+        pattern_index = broadcastconsumer._BroadcastPatternIndex()
+        pattern_index.add('cache-*', 'prefix')
+
+        self.assertEqual([], pattern_index.match('Cache-flush'))
+
+    def test_pattern_index_remove_clears_cached_matches(self):
+        pattern_index = broadcastconsumer._BroadcastPatternIndex()
+        value = object()
+        pattern_index.add('cache-*', value)
+        pattern_index.add('cache-flush', value)
+        pattern_index.match('cache-flush')
+
+        pattern_index.remove(value)
+
+        self.assertEqual([], pattern_index.match('cache-flush'))
+        self.assertEqual([], pattern_index.patterns())
+
+    def test_wildcard_consumer_delivers_new_broadcasts_once(self):
+        consumer = self._create_consumer(WildcardBroadcastConsumer)
+        cache_callback = MagicMock()
+        other_callback = MagicMock()
+        consumer.subscribe('cache-*', cache_callback)
+        consumer.subscribe('other', other_callback)
+
+        delivered = consumer.check(
+            ['cache-a---1-1---0', 'cache-a---2-2---0', 'cache-b---3-3---0'])
+
+        self.assertTrue(delivered)
+        self.assertEqual([call('cache-a'), call('cache-b')],
+                         cache_callback.call_args_list)
+        other_callback.assert_not_called()
+        self.assertFalse(consumer.check(['cache-b---3-3---0']))
+
+    def test_wildcard_consumer_counts_by_pattern(self):
+        consumer = self._create_consumer(WildcardBroadcastConsumer)
+        subscription = consumer.subscribe('counted-*', MagicMock(), minimum_delay=60)
+        consumed_count = subscription.consumed_counter.value
+        ignored_count = subscription.ignored_counter.value
+
+        consumer.check(['counted-a---1-1---0'])
+        consumer.check(['counted-b---2-2---0'])
+
+        self.assertEqual(consumed_count + 1, subscription.consumed_counter.value)
+        self.assertEqual(ignored_count + 1, subscription.ignored_counter.value)
+        self.assertIs(subscription.consumed_counter,
+                      broadcastconsumer.BROADCASTS_CONSUMED.labels('program', 'counted-*'))
+
+    def test_wildcard_consumer_unsubscribe(self):
+        consumer = self._create_consumer(WildcardBroadcastConsumer)
+        callback = MagicMock()
+        consumer.unsubscribe(consumer.subscribe('cache-*', callback))
+
+        self.assertFalse(consumer.check(['cache-a---1-1---0']))
+        callback.assert_not_called()
+
+    def _is_fd_open(self, fd):
+        """Checks whether a file descriptor is open in this process.
+
+        fd: The file descriptor to check.
+        Returns True if the file descriptor is open. Returns False otherwise.
+        """
+        try:
+            os.fstat(fd)
+        except OSError:
+            return False
+        return True
+
+    def test_relay_consumer_closes_other_channel_ends(self):
+        relay = self._create_consumer(BroadcastRelay, 'name', 0, 3)
+        relay_fds = relay.fds()
+        read_fd = relay.channels[1][0]
+        consumer = relay.consumer(1)
+        self.addCleanup(os.close, read_fd)
+
+        self.assertEqual(read_fd, consumer.read_fd)
+        self.assertEqual([], relay.channels)
+        for fd in relay_fds:
+            with self.subTest(fd=fd):
+                self.assertEqual(fd == read_fd, self._is_fd_open(fd))
+
+    def test_relayed_consumer_check_when_relay_exited(self):
+        read_fd, write_fd = os.pipe()
+        self.addCleanup(os.close, read_fd)
+        os.set_blocking(read_fd, False)
+        consumer = broadcastconsumer.RelayedBroadcastConsumer(read_fd)
+        consumer.logger = MagicMock()
+
+        self.assertFalse(consumer.check())
+        os.write(write_fd, b'\x00')
+        os.close(write_fd)
+        self.assertTrue(consumer.check())
+        with self.assertRaises(BroadcastCheckError):
+            consumer.check()
+        consumer.logger.error.assert_called_once()
+
+    def _create_scheduler_consumer(self, *check_results):
+        """Returns a mock consumer of the temporary broadcast directory whose check method
+        returns check_results in order.
+        """
+        consumer = MagicMock()
+        consumer.broadcast_path = self.broadcast_path
+        consumer.check.side_effect = check_results
+        return consumer
+
+    def test_scheduler_backs_off_idle_consumer(self):
+        scheduler = BroadcastPollScheduler(
+            minimum_interval=1, maximum_interval=4, backoff_factor=2)
+        consumer = self._create_scheduler_consumer(False, False, False)
+        callback = MagicMock()
+
+        with patch('parkbenchcommon.broadcastconsumer.time') as mock_time:
+            mock_time.monotonic.return_value = 100
+            scheduler.add(consumer, callback)
+            delays = [scheduler.run_once()]
+            mock_time.monotonic.return_value = 102
+            delays.append(scheduler.run_once())
+            mock_time.monotonic.return_value = 106
+            delays.append(scheduler.run_once())
+
+        self.assertEqual([2, 4, 4], delays)
+        self.assertEqual(3, consumer.check.call_count)
+        callback.assert_not_called()
+
+    def test_scheduler_resets_interval_after_broadcast(self):
+        scheduler = BroadcastPollScheduler(
+            minimum_interval=1, maximum_interval=8, backoff_factor=2)
+        consumer = self._create_scheduler_consumer(False, True)
+        callback = MagicMock()
+
+        with patch('parkbenchcommon.broadcastconsumer.time') as mock_time:
+            mock_time.monotonic.return_value = 100
+            scheduler.add(consumer, callback)
+            scheduler.run_once()
+            mock_time.monotonic.return_value = 102
+            delay = scheduler.run_once()
+
+        self.assertEqual(1, delay)
+        callback.assert_called_once_with(consumer)
+
+    def test_scheduler_does_not_check_consumer_before_due(self):
+        scheduler = BroadcastPollScheduler(minimum_interval=1)
+        consumer = self._create_scheduler_consumer(False)
+
+        with patch('parkbenchcommon.broadcastconsumer.time') as mock_time:
+            mock_time.monotonic.return_value = 100
+            scheduler.add(consumer, MagicMock())
+            scheduler.run_once()
+            mock_time.monotonic.return_value = 101
+            delay = scheduler.run_once()
+
+        self.assertEqual(1, consumer.check.call_count)
+        self.assertEqual(1, delay)
+
+    def test_scheduler_shares_listing_with_consumers_not_due(self):
+        scheduler = BroadcastPollScheduler(minimum_interval=1)
+        open(os.path.join(self.broadcast_path, 'name---1-1---0'), 'w').close()
+        due_consumer = self._create_scheduler_consumer(False, False)
+        waiting_consumer = self._create_scheduler_consumer(False, True)
+        callback = MagicMock()
+
+        with patch('parkbenchcommon.broadcastconsumer.time') as mock_time:
+            mock_time.monotonic.return_value = 100
+            scheduler.add(due_consumer, callback)
+            scheduler.add(waiting_consumer, callback)
+            scheduler.run_once()
+            scheduler.remove(due_consumer)
+            scheduler.add(due_consumer, callback)
+            mock_time.monotonic.return_value = 101
+            scheduler.run_once()
+
+        waiting_consumer.check.assert_called_with(['name---1-1---0'])
+        self.assertEqual(2, waiting_consumer.check.call_count)
+        callback.assert_called_once_with(waiting_consumer)
+
+    def test_scheduler_continues_after_failed_check(self):
+        scheduler = BroadcastPollScheduler()
+        scheduler.logger = MagicMock()
+        failing_consumer = self._create_scheduler_consumer(OSError('Test failure.'))
+        consumer = self._create_scheduler_consumer(True)
+        callback = MagicMock()
+
+        scheduler.add(failing_consumer, callback)
+        scheduler.add(consumer, callback)
+        scheduler.run_once()
+
+        scheduler.logger.exception.assert_called_once()
+        callback.assert_called_once_with(consumer)
+
+    def test_scheduler_without_consumers(self):
+        self.assertIsNone(BroadcastPollScheduler().run_once())
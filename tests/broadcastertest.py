@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+# Copyright 2026 Joel Allen Luellwitz and Emily Frost
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests the broadcaster module."""
+
+__author__ = 'Joel Luellwitz and Emily Frost'
+__version__ = '0.8'
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+from parkbenchcommon import broadcastconsumer
+from parkbenchcommon.broadcaster import Broadcaster, BroadcasterIssueException
+
+# The number of broadcasts each broadcaster issues in the concurrency test.
+CONCURRENT_ISSUE_COUNT = 50
+
+
+class BroadcasterTest(unittest.TestCase):
+    "Tests issuing broadcasts. The ramdisk is not mounted."
+
+    def setUp(self):
+        self.spool_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.spool_directory.cleanup)
+        self.broadcast_path = os.path.join(
+            self.spool_directory.name, 'program', 'ramdisk', 'broadcast')
+
+        for patcher in (
+                patch('parkbenchcommon.broadcaster.SPOOL_PATH', self.spool_directory.name),
+                patch('parkbenchcommon.broadcaster.ramdisk.Ramdisk')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_issue_when_two_broadcasters(self):
+        first_broadcaster = self._create_broadcaster('first')
+        second_broadcaster = self._create_broadcaster('second')
+
+        first_broadcaster.issue()
+        second_broadcaster.issue()
+        first_broadcaster.issue()
+
+        self.assertEqual(3, first_broadcaster.sequence)
+        self.assertEqual(2, second_broadcaster.sequence)
+        broadcast_files = os.listdir(self.broadcast_path)
+        self.assertEqual(1, len(broadcast_files))
+        self.assertEqual(('first', 3, None),
+                         broadcastconsumer.parse_broadcast_filename(broadcast_files[0]))
+
+    def test_issue_when_two_broadcasters_issue_concurrently(self):
+        broadcasters = [self._create_broadcaster('first'),
+                        self._create_broadcaster('second')]
+        sequences = []
+        failures = []
+
+        def issue_broadcasts(broadcaster):
+            try:
+                for issue_index in range(CONCURRENT_ISSUE_COUNT):
+                    broadcaster.issue()
+                    sequences.append(broadcaster.sequence)
+            except BroadcasterIssueException as exception:
+                failures.append(exception)
+
+        threads = [threading.Thread(target=issue_broadcasts, args=(broadcaster,))
+                   for broadcaster in broadcasters]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([], failures)
+        self.assertEqual(list(range(1, 2 * CONCURRENT_ISSUE_COUNT + 1)), sorted(sequences))
+        self.assertEqual(1, len(os.listdir(self.broadcast_path)))
+
+    def test_issue_when_broadcast_cannot_be_created(self):
+        broadcaster = self._create_broadcaster('name')
+        broadcaster.issue()
+        shutil.rmtree(self.broadcast_path)
+
+        with self.assertRaises(BroadcasterIssueException):
+            broadcaster.issue()
+        self.assertEqual(1, broadcaster.sequence)
+
+    def _create_broadcaster(self, broadcast_name):
+        """Returns a Broadcaster of program 'program' whose spool path is in the temporary
+        directory.
+
+        broadcast_name: The name of the broadcast.
+        """
+        broadcaster = Broadcaster('program', broadcast_name, os.getuid(), os.getgid())
+        broadcaster.logger = MagicMock()
+        return broadcaster
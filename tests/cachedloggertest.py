@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+# Copyright 2026 Joel Allen Luellwitz and Emily Frost
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests the CachedLogger class."""
+
+__author__ = 'Joel Luellwitz and Emily Frost'
+__version__ = '0.8'
+
+import logging
+import unittest
+from unittest.mock import MagicMock
+from parkbenchcommon import cachedlogger
+
+# ConfigHelperTest replaces logging.getLogger with a mock.
+REAL_GET_LOGGER = logging.getLogger
+
+
+class CachedLoggerTest(unittest.TestCase):
+    "Tests the CachedLogger class."
+
+    def setUp(self):
+        self.logger = REAL_GET_LOGGER('parkbenchcommon.tests.cachedlogger')
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self.handler = MagicMock()
+        self.handler.level = logging.NOTSET
+        self.logger.addHandler(self.handler)
+        self.cached_logger = cachedlogger.CachedLogger(self.logger)
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+
+    def test_disabled_level_is_skipped(self):
+        self.cached_logger.debug('Skipped %s.', 'message')
+
+        self.assertFalse(self.cached_logger.debug_enabled)
+        self.handler.handle.assert_not_called()
+
+    def test_set_level_applied_without_refresh(self):
+        self.logger.setLevel(cachedlogger.TRACE_LEVEL_NUMBER)
+        self.cached_logger.trace('Traced.')
+        self.logger.setLevel(logging.WARNING)
+        self.cached_logger.info('Skipped.')
+
+        self.assertEqual(1, self.handler.handle.call_count)
+        self.assertEqual('Traced.', self.handler.handle.call_args[0][0].getMessage())
+
+    def test_set_level_of_parent_applied_to_every_cached_logger(self):
+        other_cached_logger = cachedlogger.CachedLogger(self.logger)
+        self.logger.setLevel(logging.NOTSET)
+        parent_logger = REAL_GET_LOGGER('parkbenchcommon.tests')
+        parent_level = parent_logger.level
+        self.addCleanup(parent_logger.setLevel, parent_level)
+
+        parent_logger.setLevel(logging.DEBUG)
+        self.cached_logger.debug('First.')
+        other_cached_logger.debug('Second.')
+
+        self.assertEqual(2, self.handler.handle.call_count)
+
+    def test_disable_applied_without_refresh(self):
+        logging.disable(logging.WARNING)
+        try:
+            self.cached_logger.info('Skipped.')
+        finally:
+            logging.disable(logging.NOTSET)
+        self.cached_logger.info('Logged.')
+
+        self.assertEqual(1, self.handler.handle.call_count)
+        self.assertEqual('Logged.', self.handler.handle.call_args[0][0].getMessage())
+
+    def test_disabled_logger_applied_without_refresh(self):
+        self.logger.disabled = True
+        try:
+            self.cached_logger.warning('Skipped.')
+        finally:
+            self.logger.disabled = False
+        self.cached_logger.warning('Logged.')
+
+        self.assertEqual(1, self.handler.handle.call_count)
+
+    def test_refresh_levels_after_set_level(self):
+        self.logger.setLevel(cachedlogger.TRACE_LEVEL_NUMBER)
+        cachedlogger.refresh_levels()
+        self.cached_logger.trace('Traced.')
+
+        self.assertTrue(self.cached_logger.trace_enabled)
+        record = self.handler.handle.call_args[0][0]
+        self.assertEqual('Traced.', record.getMessage())
+        self.assertEqual('test_refresh_levels_after_set_level', record.funcName)
+
+    def test_lazy_argument_only_computed_when_formatted(self):
+        expensive_function = MagicMock(return_value='computed')
+
+        self.cached_logger.debug('Value %s.', cachedlogger.lazy(expensive_function))
+        expensive_function.assert_not_called()
+        self.cached_logger.info('Value %s.', cachedlogger.lazy(expensive_function, 1))
+
+        record = self.handler.handle.call_args[0][0]
+        self.assertEqual('Value computed.', record.getMessage())
+        expensive_function.assert_called_once_with(1)
+
+    def test_other_attributes_pass_through(self):
+        self.assertEqual(self.logger.name, self.cached_logger.name)
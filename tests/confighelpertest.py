@@ -20,15 +20,23 @@
 __author__ = 'Joel Luellwitz and Emily Frost'
 __version__ = '0.8'
 
+import array
 import configparser
 import logging
+import os
+import tempfile
 from parkbenchcommon import confighelper
+from parkbenchcommon import daemonhelper
+from parkbenchcommon import loghandlers
 from parkbenchcommon.confighelper import ValidationException
 import unittest
 from unittest.mock import call
 from unittest.mock import MagicMock
+from unittest.mock import patch
 
 CONFIG_FILE_PATH = './tests/data/config.txt'
+# setUp replaces logging.getLogger with a mock. Tests that check real log output use this.
+REAL_GET_LOGGER = logging.getLogger
 
 
 class ConfigHelperTest(unittest.TestCase):
@@ -51,6 +59,86 @@ class ConfigHelperTest(unittest.TestCase):
     def test_get_log_file_handle_code_coverage(self):
         result = self.config_helper.get_log_file_handle()
 
+    def test_configure_logger_when_queued(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                patch('logging.getLogger', REAL_GET_LOGGER):
+            log_file = os.path.join(directory, 'queued.log')
+            self.config_helper.configure_logger(log_file, 'info', queued=True)
+            logging.root.info('Queued %s.', 'message')
+            logging.root.debug('Filtered message.')
+            log_file_handle = self.config_helper.get_log_file_handle()
+            self.config_helper.configure_logger('/dev/null', 'trace')
+
+            with open(log_file) as log_stream:
+                log_text = log_stream.read()
+
+        self.assertIsNotNone(log_file_handle)
+        self.assertIn('Queued message.', log_text)
+        self.assertNotIn('Filtered message.', log_text)
+
+    def test_configure_logger_keeps_rate_limiting_in_forked_child(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                patch('logging.getLogger', REAL_GET_LOGGER):
+            log_file = os.path.join(directory, 'queued.log')
+            self.config_helper.configure_logger(
+                log_file, 'info', queued=True, rate_limit_count=1, handlers=('file',))
+            log_queue_listener = self.config_helper.log_queue_listener
+            self.config_helper._unqueue_logging_in_child()
+            log_queue_listener.stop()
+            file_handler = self.config_helper.log_handlers[0]
+            logging.root.info('Repeated.')
+            logging.root.info('Repeated.')
+            file_handler.flush()
+
+            with open(log_file) as log_stream:
+                log_text = log_stream.read()
+            self.config_helper.configure_logger('/dev/null', 'trace')
+
+        rate_limiting_filters = [log_filter for log_filter in file_handler.filters if
+                                 isinstance(log_filter, loghandlers.RateLimitingFilter)]
+        self.assertEqual(1, len(rate_limiting_filters))
+        self.assertIs(file_handler, rate_limiting_filters[0].handler)
+        self.assertEqual(1, log_text.count('Repeated.'))
+
+    def test_configure_logger_when_aggregating_processes(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                patch('logging.getLogger', REAL_GET_LOGGER):
+            log_file = os.path.join(directory, 'aggregated.log')
+            self.config_helper.configure_logger(
+                log_file, 'info', handlers=['file'], aggregate_processes=True)
+            log_fds = self.config_helper.get_log_fds()
+            pid = os.fork()
+            if pid == 0:
+                daemonhelper._close_fds_except({0, 1, 2}.union(log_fds))
+                logging.root.info('From the child.')
+                os._exit(int(
+                    self.config_helper.log_queue.receive_socket.fileno() != -1))
+            _, status = os.waitpid(pid, 0)
+            logging.root.info('From the parent.')
+            self.config_helper.configure_logger('/dev/null', 'trace')
+
+            with open(log_file) as log_stream:
+                log_text = log_stream.read()
+
+        self.assertIn('From the child.', log_text)
+        self.assertIn('From the parent.', log_text)
+        # The child closed its copy of the receiving socket.
+        self.assertEqual(0, os.WEXITSTATUS(status))
+
+    def test_get_logger_config_when_file_only(self):
+        logger_config = self.config_helper._get_logger_config(
+            '/dev/null', 'INFO', handlers=['file'], handler_levels={'file': 'debug'})
+
+        self.assertEqual(['file'], list(logger_config['handlers']))
+        self.assertEqual(['file'], logger_config['loggers']['']['handlers'])
+        self.assertEqual('DEBUG', logger_config['handlers']['file']['level'])
+        self.assertEqual('DEBUG', logger_config['loggers']['']['level'])
+
+    def test_get_logger_config_when_unknown_handler(self):
+        with self.assertRaisesRegex(ValueError, 'Unknown log handler smoke-signal.'):
+            self.config_helper._get_logger_config(
+                '/dev/null', 'INFO', handlers=['smoke-signal'])
+
     def test_verify_string_exists_when_string_exists(self):
         name = 'verify-string-exists'
         value = 'Of course I exist!'
@@ -459,6 +547,95 @@ class ConfigHelperTest(unittest.TestCase):
         self.logger.debug.assert_called_with('Verifying numeric list option %s.', name)
         self.logger.info.assert_called_with('Option %s: %s', name, '-3')
 
+    def test_verify_integer_list_exists_when_valid_list_exists(self):
+        name = 'verify-integer-list-exists'
+
+        result = self.config_helper.verify_integer_list_exists(self.config_file, name)
+
+        self.assertEqual(array.array('q', [1, 2, 3, 8, -2, 10, 11]), result)
+        self.logger.debug.assert_called_with('Verifying integer list option %s.', name)
+        self.logger.info.assert_called_with('Option %s: %s', name, '1-3, 8,-2,10 - 11')
+
+    def test_verify_integer_list_exists_as_set(self):
+        name = 'verify-integer-list-exists'
+
+        result = self.config_helper.verify_integer_list_exists(
+            self.config_file, name, as_set=True)
+
+        self.assertEqual(frozenset([-2, 1, 2, 3, 8, 10, 11]), result)
+
+    def test_verify_integer_list_exists_when_not_an_integer_list(self):
+        name = 'verify-integer-list-exists-not-integer-list'
+        not_valid_message = 'Option verify-integer-list-exists-not-integer-list has a ' \
+            'value of 1-3,3.3 but that is not a list of integers.'
+
+        with self.assertRaisesRegex(ValidationException, not_valid_message):
+            self.config_helper.verify_integer_list_exists(self.config_file, name)
+
+        self.logger.error.assert_called_with(not_valid_message)
+
+    def test_verify_integer_list_exists_when_range_backwards(self):
+        name = 'verify-integer-list-exists-backwards-range'
+        not_valid_message = 'Option verify-integer-list-exists-backwards-range has a ' \
+            'range 5-1 that ends before it starts.'
+
+        with self.assertRaisesRegex(ValidationException, not_valid_message):
+            self.config_helper.verify_integer_list_exists(self.config_file, name)
+
+        self.logger.error.assert_called_with(not_valid_message)
+
+    def test_verify_integer_list_exists_when_value_out_of_range(self):
+        name = 'verify-integer-list-exists'
+        not_valid_message = 'Option has a value of 11, which is equal to or above upper ' \
+            'boundary 11.'
+
+        with self.assertRaisesRegex(ValidationException, not_valid_message):
+            self.config_helper.verify_integer_list_exists(
+                self.config_file, name, lower_bound=-2, upper_bound=11)
+
+        self.logger.error.assert_called_with(not_valid_message)
+
+    def test_verify_integer_list_exists_when_whitespace_inside_integer(self):
+        name = 'verify-integer-list-exists-inner-whitespace'
+        not_valid_message = 'Option verify-integer-list-exists-inner-whitespace has a ' \
+            'value of 1 0,20 but that is not a list of integers.'
+
+        with self.assertRaisesRegex(ValidationException, not_valid_message):
+            self.config_helper.verify_integer_list_exists(self.config_file, name)
+
+        self.logger.error.assert_called_with(not_valid_message)
+
+    def test_verify_integer_list_exists_when_integer_overflows(self):
+        name = 'verify-integer-list-exists-overflow'
+        not_valid_message = 'Option verify-integer-list-exists-overflow has a value of ' \
+            '9223372036854775808, which does not fit in 64 bits.'
+
+        with self.assertRaisesRegex(ValidationException, not_valid_message):
+            self.config_helper.verify_integer_list_exists(self.config_file, name)
+
+        self.logger.error.assert_called_with(not_valid_message)
+
+    def test_verify_integer_list_exists_when_too_many_integers(self):
+        name = 'verify-integer-list-exists-too-many'
+        not_valid_message = 'Option verify-integer-list-exists-too-many has more than ' \
+            '1048576 integers.'
+
+        with self.assertRaisesRegex(ValidationException, not_valid_message):
+            self.config_helper.verify_integer_list_exists(self.config_file, name)
+
+        self.logger.error.assert_called_with(not_valid_message)
+
+    def test_verify_integer_list_exists_when_range_end_out_of_range(self):
+        name = 'verify-integer-list-exists-too-many'
+        not_valid_message = 'Option has a value of 9999999999, which is equal to or above ' \
+            'upper boundary 65536.'
+
+        with self.assertRaisesRegex(ValidationException, not_valid_message):
+            self.config_helper.verify_integer_list_exists(
+                self.config_file, name, upper_bound=65536)
+
+        self.logger.error.assert_called_with(not_valid_message)
+
     def test_get_string_list_if_exists_when_valid_list_exists(self):
         name = 'get-string-list-if-exists'
         value = ['-3', 'text', '239']
@@ -591,3 +768,192 @@ class ConfigHelperTest(unittest.TestCase):
 
         self.assertEqual(value, result)
         self.logger.debug.assert_called_with('Reading option %s.', name)
+
+    def test_load_settings_when_options_valid(self):
+        schema = confighelper.ConfigSchema([
+            confighelper.ConfigOption('verify-string-exists'),
+            confighelper.ConfigOption('verify-password-exists', 'password'),
+            confighelper.ConfigOption(
+                'verify-integer-within-range', 'integer', lower_bound=3, upper_bound=4),
+            confighelper.ConfigOption('verify-valid-integer-in-list', 'integer',
+                                      valid_values=[1, 3, 5]),
+            confighelper.ConfigOption('verify-number-exists', 'number'),
+            confighelper.ConfigOption('verify-boolean-exists-true-uppercase', 'boolean'),
+            confighelper.ConfigOption('verify-number-list-exists', 'number_list'),
+            confighelper.ConfigOption('verify-string-list-exists', 'string_list'),
+            confighelper.ConfigOption('verify-integer-list-exists', 'integer_set',
+                                      lower_bound=-2, upper_bound=12),
+            confighelper.ConfigOption('get-string-if-exists-blank', required=False,
+                                      default='default')])
+
+        settings = self.config_helper.load_settings(self.config_file, schema)
+
+        self.assertEqual('Of course I exist!', settings.verify_string_exists)
+        self.assertEqual('r00t', settings.verify_password_exists)
+        self.assertEqual(3, settings.verify_integer_within_range)
+        self.assertEqual(3, settings.verify_valid_integer_in_list)
+        self.assertEqual(3.3, settings.verify_number_exists)
+        self.assertTrue(settings.verify_boolean_exists_true_uppercase)
+        self.assertEqual([-3, 239, 5], settings.verify_number_list_exists)
+        self.assertEqual(['-3', 'text', '239'], settings.verify_string_list_exists)
+        self.assertEqual(frozenset([-2, 1, 2, 3, 8, 10, 11]),
+                         settings.verify_integer_list_exists)
+        self.assertEqual('default', settings.get_string_if_exists_blank)
+        self.logger.info.assert_any_call('Password %s exists.', 'verify-password-exists')
+        self.assertNotIn('r00t', repr(settings))
+
+    def test_load_settings_is_read_only(self):
+        schema = confighelper.ConfigSchema([
+            confighelper.ConfigOption('verify-string-exists')])
+
+        settings = self.config_helper.load_settings(self.config_file, schema)
+
+        with self.assertRaises(AttributeError):
+            settings.verify_string_exists = 'changed'
+        with self.assertRaises(AttributeError):
+            settings.undeclared = 'added'
+
+    def test_load_settings_when_required_option_missing(self):
+        not_found_message = 'Option verify-no-string-exists not found.'
+        schema = confighelper.ConfigSchema([
+            confighelper.ConfigOption('verify-no-string-exists')])
+
+        with self.assertRaisesRegex(ValidationException, not_found_message):
+            self.config_helper.load_settings(self.config_file, schema)
+
+        self.logger.error.assert_called_with(not_found_message)
+
+    def test_load_settings_when_not_an_integer(self):
+        not_valid_message = 'Option verify-integer-exists-not-integer has a value of 3.3 ' \
+            'but that is not an integer.'
+        schema = confighelper.ConfigSchema([
+            confighelper.ConfigOption('verify-integer-exists-not-integer', 'integer')])
+
+        with self.assertRaisesRegex(ValidationException, not_valid_message):
+            self.config_helper.load_settings(self.config_file, schema)
+
+        self.logger.error.assert_called_with(not_valid_message)
+
+    def test_load_settings_when_above_upper_bound(self):
+        schema = confighelper.ConfigSchema([
+            confighelper.ConfigOption(
+                'verify-integer-within-range', 'integer', lower_bound=0, upper_bound=3)])
+
+        with self.assertRaisesRegex(ValidationException, 'upper boundary 3'):
+            self.config_helper.load_settings(self.config_file, schema)
+
+    def test_config_schema_when_attribute_names_collide(self):
+        with self.assertRaises(ValueError):
+            confighelper.ConfigSchema([confighelper.ConfigOption('option-name'),
+                                       confighelper.ConfigOption('option_name')])
+
+    def test_config_reloader_swaps_settings_and_calls_callbacks(self):
+        schema = confighelper.ConfigSchema([
+            confighelper.ConfigOption('first', 'integer'),
+            confighelper.ConfigOption('second')])
+        first_callback = MagicMock()
+        second_callback = MagicMock()
+
+        with tempfile.TemporaryDirectory() as directory:
+            config_path = os.path.join(directory, 'config.txt')
+            with open(config_path, 'w') as config_stream:
+                config_stream.write('[General]\nfirst=1\nsecond=unchanged\n')
+
+            reloader = confighelper.ConfigReloader(self.config_helper, config_path, schema)
+            reloader.add_callback(first_callback, ['first'])
+            reloader.add_callback(second_callback, ['second'])
+            old_settings = reloader.settings
+
+            self.assertFalse(reloader.check())
+
+            with open(config_path, 'w') as config_stream:
+                config_stream.write('[General]\nfirst=2\nsecond=unchanged\n')
+            os.utime(config_path, ns=(0, 0))
+
+            self.assertTrue(reloader.check())
+
+        self.assertEqual(1, old_settings.first)
+        self.assertEqual(2, reloader.settings.first)
+        first_callback.assert_called_once_with(old_settings, reloader.settings, {'first'})
+        second_callback.assert_not_called()
+
+    def test_config_reloader_keeps_settings_when_invalid(self):
+        schema = confighelper.ConfigSchema([confighelper.ConfigOption('first', 'integer')])
+
+        with tempfile.TemporaryDirectory() as directory:
+            config_path = os.path.join(directory, 'config.txt')
+            with open(config_path, 'w') as config_stream:
+                config_stream.write('[General]\nfirst=1\n')
+
+            reloader = confighelper.ConfigReloader(self.config_helper, config_path, schema)
+            old_settings = reloader.settings
+
+            with open(config_path, 'w') as config_stream:
+                config_stream.write('[General]\nfirst=invalid\n')
+
+            self.assertFalse(reloader.reload())
+
+        self.assertIs(old_settings, reloader.settings)
+
+    def test_settings_snapshot_round_trip(self):
+        schema = confighelper.ConfigSchema([
+            confighelper.ConfigOption('verify-password-exists', 'password'),
+            confighelper.ConfigOption('verify-integer-exists', 'integer'),
+            confighelper.ConfigOption('verify-number-list-exists', 'number_list'),
+            confighelper.ConfigOption('verify-integer-list-exists', 'integer_list'),
+            confighelper.ConfigOption('get-string-if-exists-blank', required=False)])
+        with tempfile.TemporaryDirectory() as directory:
+            snapshot_path = os.path.join(directory, 'settings.snapshot')
+
+            settings = self.config_helper.publish_settings_snapshot(
+                CONFIG_FILE_PATH, schema, snapshot_path)
+            loaded_settings = self.config_helper.load_settings_snapshot(
+                snapshot_path, schema)
+            snapshot_mode = os.stat(snapshot_path).st_mode & 0o777
+
+        self.assertEqual(0o600, snapshot_mode)
+        self.assertEqual(repr(settings), repr(loaded_settings))
+        self.assertEqual('r00t', loaded_settings.verify_password_exists)
+        self.assertEqual(array.array('q', [1, 2, 3, 8, -2, 10, 11]),
+                         loaded_settings.verify_integer_list_exists)
+        self.assertIsNone(loaded_settings.get_string_if_exists_blank)
+
+    def test_settings_snapshot_skips_validation_when_unchanged(self):
+        schema = confighelper.ConfigSchema([
+            confighelper.ConfigOption('verify-integer-exists', 'integer')])
+        with tempfile.TemporaryDirectory() as directory:
+            snapshot_path = os.path.join(directory, 'settings.snapshot')
+            self.config_helper.publish_settings_snapshot(
+                CONFIG_FILE_PATH, schema, snapshot_path)
+
+            with patch.object(self.config_helper, 'load_settings') as load_settings:
+                settings = self.config_helper.publish_settings_snapshot(
+                    CONFIG_FILE_PATH, schema, snapshot_path)
+
+        load_settings.assert_not_called()
+        self.assertEqual(3, settings.verify_integer_exists)
+
+    def test_settings_snapshot_when_schema_differs(self):
+        schema = confighelper.ConfigSchema([
+            confighelper.ConfigOption('verify-integer-exists', 'integer')])
+        other_schema = confighelper.ConfigSchema([
+            confighelper.ConfigOption('verify-integer-exists', 'number')])
+        with tempfile.TemporaryDirectory() as directory:
+            snapshot_path = os.path.join(directory, 'settings.snapshot')
+            self.config_helper.publish_settings_snapshot(
+                CONFIG_FILE_PATH, schema, snapshot_path)
+
+            with self.assertRaisesRegex(ValidationException, 'different schema'):
+                self.config_helper.load_settings_snapshot(snapshot_path, other_schema)
+
+            settings = self.config_helper.publish_settings_snapshot(
+                CONFIG_FILE_PATH, other_schema, snapshot_path)
+
+        self.assertEqual(3.0, settings.verify_integer_exists)
+
+    def test_load_settings_snapshot_when_missing(self):
+        schema = confighelper.ConfigSchema([
+            confighelper.ConfigOption('verify-integer-exists', 'integer')])
+
+        with self.assertRaisesRegex(ValidationException, 'Could not load settings snapshot'):
+            self.config_helper.load_settings_snapshot('/nonexistent/settings', schema)
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+
+# Copyright 2026 Joel Allen Luellwitz and Emily Frost
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests the daemonhelper module."""
+
+__author__ = 'Joel Luellwitz and Emily Frost'
+__version__ = '0.8'
+
+import os
+import resource
+import signal
+import stat
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+from parkbenchcommon import daemonhelper
+
+# Lower than the number of directories in the wide test tree, so holding a descriptor for
+#   every pending directory fails with EMFILE.
+TEST_OPEN_FILE_LIMIT = 256
+
+# How long to wait for a test worker to exit, in seconds.
+WORKER_EXIT_TIMEOUT = 10
+
+
+class DaemonHelperTest(unittest.TestCase):
+    "Tests the directory and permission helpers and the WorkerSupervisor."
+
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.path = self.temporary_directory.name
+        self.uid = os.getuid()
+        self.gid = os.getgid()
+
+    def tearDown(self):
+        self.temporary_directory.cleanup()
+
+    def test_create_directories(self):
+        daemonhelper.create_directories(self.path, '/program/ramdisk/', self.uid, self.gid,
+                                        0o750)
+
+        self.assertEqual(0o750, self._mode(os.path.join(self.path, 'program')))
+        self.assertEqual(0o750, self._mode(os.path.join(self.path, 'program', 'ramdisk')))
+
+    def test_create_directory_trees_when_specs_share_directories(self):
+        daemonhelper.create_directory_trees(self.path, [
+            ('program/spool', self.uid, self.gid, 0o750),
+            ('program/cache/deep', self.uid, self.gid, 0o700)])
+
+        self.assertEqual(0o700, self._mode(os.path.join(self.path, 'program')))
+        self.assertEqual(0o750, self._mode(os.path.join(self.path, 'program', 'spool')))
+        self.assertEqual(0o700, self._mode(os.path.join(self.path, 'program', 'cache')))
+        self.assertEqual(
+            0o700, self._mode(os.path.join(self.path, 'program', 'cache', 'deep')))
+
+    def test_create_directory_trees_when_permissions_match(self):
+        os.makedirs(os.path.join(self.path, 'program', 'spool'))
+        os.chmod(os.path.join(self.path, 'program'), 0o750)
+        os.chmod(os.path.join(self.path, 'program', 'spool'), 0o755)
+
+        with patch('os.fchown', wraps=os.fchown) as fchown_mock, \
+                patch('os.fchmod', wraps=os.fchmod) as fchmod_mock:
+            daemonhelper.create_directory_trees(
+                self.path, [('program/spool', self.uid, self.gid, 0o750)])
+
+        fchown_mock.assert_not_called()
+        # Only the directory whose mode differed is changed.
+        self.assertEqual(1, fchmod_mock.call_count)
+        self.assertEqual(0o750, self._mode(os.path.join(self.path, 'program', 'spool')))
+
+    def test_create_directory_trees_when_keep_existing_permissions(self):
+        os.mkdir(os.path.join(self.path, 'program'))
+        os.chmod(os.path.join(self.path, 'program'), 0o755)
+
+        daemonhelper.create_directory_trees(
+            self.path, [('program/spool', self.uid, self.gid, 0o700)],
+            keep_existing_permissions=True)
+
+        self.assertEqual(0o755, self._mode(os.path.join(self.path, 'program')))
+        self.assertEqual(0o700, self._mode(os.path.join(self.path, 'program', 'spool')))
+
+    def test_create_directory_trees_when_symbolic_link(self):
+        outside_path = os.path.join(self.path, 'outside')
+        os.mkdir(outside_path)
+        os.chmod(outside_path, 0o755)
+        system_path = os.path.join(self.path, 'system')
+        os.mkdir(system_path)
+        os.symlink(outside_path, os.path.join(system_path, 'program'))
+
+        with self.assertRaises(OSError):
+            daemonhelper.create_directory_trees(
+                system_path, [('program/spool', self.uid, self.gid, 0o700)])
+
+        self.assertEqual([], os.listdir(outside_path))
+        self.assertEqual(0o755, self._mode(outside_path))
+
+    def test_create_directory_trees_when_file(self):
+        self._write_file(os.path.join(self.path, 'program'), 0o644)
+
+        with self.assertRaises(NotADirectoryError):
+            daemonhelper.create_directory_trees(
+                self.path, [('program/spool', self.uid, self.gid, 0o700)])
+
+        self.assertEqual(0o644, self._mode(os.path.join(self.path, 'program')))
+
+    def test_reconcile_tree_permissions(self):
+        root_path = os.path.join(self.path, 'root')
+        os.makedirs(os.path.join(root_path, 'child', 'grandchild'))
+        os.chmod(os.path.join(root_path, 'child'), 0o750)
+        self._write_file(os.path.join(root_path, 'child', 'grandchild', 'file'), 0o644)
+        self._write_file(os.path.join(root_path, 'matching'), 0o640)
+        os.chmod(root_path, 0o755)
+        os.chmod(os.path.join(root_path, 'child', 'grandchild'), 0o755)
+
+        changed_count = daemonhelper.reconcile_tree_permissions(
+            root_path, self.uid, self.gid, 0o750, 0o640)
+
+        self.assertEqual(3, changed_count)
+        for relative_path, mode in [
+                ('', 0o750), ('child', 0o750), ('child/grandchild', 0o750),
+                ('child/grandchild/file', 0o640), ('matching', 0o640)]:
+            self.assertEqual(mode, self._mode(os.path.join(root_path, relative_path)))
+        self.assertEqual(0, daemonhelper.reconcile_tree_permissions(
+            root_path, self.uid, self.gid, 0o750, 0o640))
+
+    def test_reconcile_tree_permissions_when_no_file_mode(self):
+        root_path = os.path.join(self.path, 'root')
+        os.mkdir(root_path, 0o750)
+        self._write_file(os.path.join(root_path, 'file'), 0o604)
+
+        self.assertEqual(0, daemonhelper.reconcile_tree_permissions(
+            root_path, self.uid, self.gid, 0o750))
+        self.assertEqual(0o604, self._mode(os.path.join(root_path, 'file')))
+
+    def test_reconcile_tree_permissions_skips_symbolic_links(self):
+        root_path = os.path.join(self.path, 'root')
+        os.mkdir(root_path, 0o750)
+        outside_path = os.path.join(self.path, 'outside')
+        os.mkdir(outside_path, 0o755)
+        self._write_file(os.path.join(outside_path, 'file'), 0o644)
+        os.symlink(outside_path, os.path.join(root_path, 'directory-link'))
+        os.symlink(os.path.join(outside_path, 'file'), os.path.join(root_path, 'file-link'))
+
+        self.assertEqual(0, daemonhelper.reconcile_tree_permissions(
+            root_path, self.uid, self.gid, 0o750, 0o640))
+        self.assertEqual(0o755, self._mode(outside_path))
+        self.assertEqual(0o644, self._mode(os.path.join(outside_path, 'file')))
+
+        root_link_path = os.path.join(self.path, 'root-link')
+        os.symlink(outside_path, root_link_path)
+        with self.assertRaises(OSError):
+            daemonhelper.reconcile_tree_permissions(
+                root_link_path, self.uid, self.gid, 0o750, 0o640)
+        self.assertEqual(0o755, self._mode(outside_path))
+
+    def test_reconcile_tree_permissions_when_many_directories(self):
+        root_path = os.path.join(self.path, 'root')
+        os.mkdir(root_path, 0o755)
+        for directory_index in range(1500):
+            directory_path = os.path.join(root_path, 'wide-%d' % directory_index)
+            os.mkdir(directory_path, 0o755)
+            self._write_file(os.path.join(directory_path, 'file'), 0o644)
+        deep_path = root_path
+        for depth in range(50):
+            deep_path = os.path.join(deep_path, 'deep')
+            os.mkdir(deep_path, 0o755)
+
+        open_fd_count = len(os.listdir('/proc/self/fd'))
+        soft_limit, hard_limit = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (
+            min(hard_limit, max(TEST_OPEN_FILE_LIMIT, open_fd_count + 128)), hard_limit))
+        try:
+            self.assertEqual(3051, daemonhelper.reconcile_tree_permissions(
+                root_path, self.uid, self.gid, 0o750, 0o640))
+            self.assertEqual(3051, daemonhelper.reconcile_tree_permissions(
+                root_path, self.uid, self.gid, 0o700, 0o600, max_workers=4))
+        finally:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (soft_limit, hard_limit))
+
+        self.assertEqual(open_fd_count, len(os.listdir('/proc/self/fd')))
+        self.assertEqual(0o700, self._mode(deep_path))
+        self.assertEqual(0o600, self._mode(os.path.join(root_path, 'wide-1499', 'file')))
+
+    def test_worker_supervisor_when_worker_exits_with_error(self):
+        supervisor = self._create_supervisor(
+            lambda worker_index: os._exit(3), minimum_restart_delay=10,
+            maximum_restart_delay=25)
+
+        with patch('parkbenchcommon.daemonhelper.WORKER_EXITS') as worker_exits_mock:
+            delays = []
+            for restart_count in range(4):
+                supervisor._start_worker(0)
+                self._wait_for_worker_exit(supervisor, 0)
+                delays.append(supervisor._worker_next_start_times[0] - time.monotonic())
+
+        self.assertEqual(4, supervisor._worker_failures[0])
+        self.assertEqual(4, worker_exits_mock.inc.call_count)
+        for expected_delay, delay in zip([0, 10, 20, 25], delays):
+            self.assertAlmostEqual(expected_delay, delay, delta=1)
+        self.assertIn('3', supervisor.logger.warning.call_args[0])
+
+        # The restart delay has not passed yet.
+        supervisor._start_due_workers()
+        self.assertIsNone(supervisor.worker_pids[0])
+
+    def test_worker_supervisor_when_worker_killed_by_signal(self):
+        supervisor = self._create_supervisor(
+            lambda worker_index: os.kill(os.getpid(), signal.SIGKILL))
+
+        with patch('parkbenchcommon.daemonhelper.WORKER_EXITS') as worker_exits_mock:
+            supervisor._start_due_workers()
+            self._wait_for_worker_exit(supervisor, 0)
+
+        self.assertEqual(1, supervisor._worker_failures[0])
+        worker_exits_mock.inc.assert_called_once_with()
+        self.assertIn('signal %d' % signal.SIGKILL, supervisor.logger.warning.call_args[0])
+
+    def test_worker_supervisor_when_worker_exits_cleanly(self):
+        supervisor = self._create_supervisor(lambda worker_index: None)
+        supervisor._worker_failures[0] = 3
+
+        with patch('parkbenchcommon.daemonhelper.WORKER_EXITS') as worker_exits_mock:
+            supervisor._start_due_workers()
+            self._wait_for_worker_exit(supervisor, 0)
+
+        self.assertEqual(0, supervisor._worker_failures[0])
+        self.assertLessEqual(supervisor._worker_next_start_times[0], time.monotonic())
+        worker_exits_mock.inc.assert_not_called()
+        supervisor.logger.warning.assert_not_called()
+
+    def test_worker_supervisor_when_worker_ran_longer_than_maximum_delay(self):
+        supervisor = self._create_supervisor(
+            lambda worker_index: os._exit(1), minimum_restart_delay=10,
+            maximum_restart_delay=25)
+        supervisor._worker_failures[0] = 5
+
+        supervisor._start_worker(0)
+        supervisor._worker_start_times[0] -= 30
+        self._wait_for_worker_exit(supervisor, 0)
+
+        self.assertEqual(1, supervisor._worker_failures[0])
+        self.assertLessEqual(supervisor._worker_next_start_times[0], time.monotonic())
+
+    def test_worker_supervisor_reaps_only_its_workers(self):
+        release_read_fd, release_write_fd = os.pipe()
+        self.addCleanup(os.close, release_read_fd)
+        supervisor = self._create_supervisor(
+            lambda worker_index: os.read(release_read_fd, 1), worker_count=2,
+            preserved_fds=[release_read_fd])
+        supervisor._start_due_workers()
+        other_pid = os.fork()
+        if other_pid == 0:
+            os._exit(7)
+
+        try:
+            os.close(release_write_fd)
+            release_write_fd = None
+            for worker_index in range(2):
+                self._wait_for_worker_exit(supervisor, worker_index)
+        finally:
+            if release_write_fd is not None:
+                os.close(release_write_fd)
+            supervisor._stop_workers()
+
+        _, status = os.waitpid(other_pid, 0)
+        self.assertEqual(7, os.WEXITSTATUS(status))
+
+    def test_worker_supervisor_when_preserved_fds(self):
+        preserved_read_fd, preserved_write_fd = os.pipe()
+        closed_read_fd, closed_write_fd = os.pipe()
+        for fd in (preserved_read_fd, preserved_write_fd, closed_read_fd, closed_write_fd):
+            self.addCleanup(os.close, fd)
+
+        def report_open_fds(worker_index):
+            for fd in (closed_read_fd, closed_write_fd):
+                try:
+                    os.fstat(fd)
+                    os.write(preserved_write_fd, b'open ')
+                except OSError:
+                    os.write(preserved_write_fd, b'closed ')
+
+        supervisor = self._create_supervisor(
+            report_open_fds, preserved_fds=[preserved_write_fd])
+        supervisor._start_due_workers()
+        self._wait_for_worker_exit(supervisor, 0)
+
+        self.assertEqual(b'closed closed ', os.read(preserved_read_fd, 4096))
+        self.assertEqual(0, supervisor._worker_failures[0])
+
+    def _create_supervisor(self, worker_function, worker_count=1, **kwargs):
+        """Returns a WorkerSupervisor that can start workers without calling run.
+
+        worker_function: The function the workers run.
+        worker_count: The number of workers.
+        kwargs: Other arguments for the WorkerSupervisor constructor.
+        """
+        supervisor = daemonhelper.WorkerSupervisor(worker_function, worker_count, **kwargs)
+        supervisor.logger = MagicMock()
+        # Normally created by run. Workers close them after they are forked.
+        supervisor._wakeup_read_fd, supervisor._wakeup_write_fd = os.pipe()
+        self.addCleanup(os.close, supervisor._wakeup_read_fd)
+        self.addCleanup(os.close, supervisor._wakeup_write_fd)
+        return supervisor
+
+    def _wait_for_worker_exit(self, supervisor, worker_index):
+        """Reaps workers until the given worker has exited.
+
+        supervisor: The WorkerSupervisor that started the worker.
+        worker_index: The index of the worker.
+        """
+        deadline = time.monotonic() + WORKER_EXIT_TIMEOUT
+        while supervisor.worker_pids[worker_index] is not None:
+            self.assertLess(time.monotonic(), deadline, 'Worker did not exit.')
+            time.sleep(0.01)
+            supervisor._reap_workers()
+
+    def _write_file(self, path, mode):
+        """Creates an empty file with the given mode.
+
+        path: The pathname of the file.
+        mode: The access mode of the file.
+        """
+        with open(path, 'w'):
+            pass
+        os.chmod(path, mode)
+
+    def _mode(self, path):
+        """Returns the access mode of the file at path, without following symbolic links."""
+        return stat.S_IMODE(os.lstat(path).st_mode)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+# Copyright 2026 Joel Allen Luellwitz and Emily Frost
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests that importing parkbenchcommon modules is fast and does not import modules that
+are only needed by optional features.
+"""
+
+__author__ = 'Joel Luellwitz and Emily Frost'
+__version__ = '0.8'
+
+import ast
+import os
+import subprocess
+import sys
+import unittest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules only imported when the feature needing them is used.
+DEFERRED_MODULES = ['concurrent.futures', 'gzip', 'hashlib', 'json', 'logging.config',
+                    'shutil', 'subprocess', 'tarfile']
+
+# A generous budget in seconds for importing a single module in a fresh interpreter. It
+#   catches an accidental heavy import without failing on slow build servers.
+IMPORT_TIME_BUDGET = 1.0
+
+# Imports a module in a fresh interpreter and prints the import time and which deferred
+#   modules were imported.
+IMPORT_SCRIPT = '''
+import sys, time
+start_time = time.perf_counter()
+__import__(sys.argv[1])
+import_time = time.perf_counter() - start_time
+print(repr((import_time, [name for name in sys.argv[2:] if name in sys.modules])))
+'''
+
+
+class ImportTest(unittest.TestCase):
+    "Tests the import time and import side effects of the parkbenchcommon modules."
+
+    def _import_in_subprocess(self, module_name):
+        """Imports a module in a new Python interpreter.
+
+        module_name: The name of the module to import.
+        Returns a tuple of the import time in seconds and the list of deferred modules that
+          were imported.
+        """
+        output = subprocess.check_output(
+            [sys.executable, '-c', IMPORT_SCRIPT, module_name] + DEFERRED_MODULES,
+            cwd=PROJECT_ROOT)
+        import_time, imported_modules = ast.literal_eval(output.decode())
+        return import_time, imported_modules
+
+    def test_package_import_does_not_import_submodules(self):
+        output = subprocess.check_output(
+            [sys.executable, '-c', 'import sys, parkbenchcommon; print(sorted('
+             'name for name in sys.modules if name.startswith("parkbenchcommon")))'],
+            cwd=PROJECT_ROOT)
+
+        self.assertEqual("['parkbenchcommon']", output.decode().strip())
+
+    def test_package_attributes_import_submodules(self):
+        import parkbenchcommon
+        from parkbenchcommon import startuptracer
+
+        self.assertIs(startuptracer, parkbenchcommon.startuptracer)
+        self.assertIn('confighelper', dir(parkbenchcommon))
+        with self.assertRaises(AttributeError):
+            parkbenchcommon.nonexistent
+
+    def test_modules_import_within_budget_without_deferred_modules(self):
+        for module_name in ['parkbenchcommon.broadcastconsumer',
+                            'parkbenchcommon.broadcaster', 'parkbenchcommon.confighelper',
+                            'parkbenchcommon.daemonhelper', 'parkbenchcommon.metrics',
+                            'parkbenchcommon.ramdisk']:
+            with self.subTest(module_name=module_name):
+                import_time, imported_modules = self._import_in_subprocess(module_name)
+
+                self.assertEqual([], imported_modules)
+                self.assertLess(import_time, IMPORT_TIME_BUDGET)
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+
+# Copyright 2026 Joel Allen Luellwitz and Emily Frost
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests the loghandlers module."""
+
+__author__ = 'Joel Luellwitz and Emily Frost'
+__version__ = '0.8'
+
+import gzip
+import json
+import logging
+import os
+import queue
+import socket
+import struct
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+from parkbenchcommon import loghandlers
+
+
+class LogHandlersTest(unittest.TestCase):
+    "Tests the handlers, filters, and formatters in the loghandlers module."
+
+    def test_compressing_rotating_file_handler_rotates_and_prunes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            log_file = os.path.join(directory, 'rotating.log')
+            handler = loghandlers.CompressingRotatingFileHandler(
+                log_file, max_bytes=20, backup_count=2)
+
+            for number in range(4):
+                handler.handle(logging.makeLogRecord(
+                    {'msg': 'Record number %d.', 'args': (number,)}))
+            handler._get_compression_queue().join()
+            handler.close()
+
+            rotated_filenames = handler._list_rotated_files()
+            with open(log_file) as log_stream:
+                log_text = log_stream.read()
+            with gzip.open(rotated_filenames[-1], 'rt') as rotated_stream:
+                rotated_text = rotated_stream.read()
+
+        self.assertEqual(2, len(rotated_filenames))
+        self.assertEqual('Record number 3.\n', log_text)
+        self.assertEqual('Record number 2.\n', rotated_text)
+
+    def test_buffered_file_handler_flushes_on_severity(self):
+        with tempfile.TemporaryDirectory() as directory:
+            log_file = os.path.join(directory, 'buffered.log')
+            handler = loghandlers.BufferedFileHandler(log_file, flush_interval=60)
+
+            handler.handle(logging.makeLogRecord(
+                {'msg': 'Buffered.', 'levelno': logging.INFO}))
+            buffered_size = os.path.getsize(log_file)
+            handler.handle(logging.makeLogRecord(
+                {'msg': 'Flushed.', 'levelno': logging.WARNING}))
+            with open(log_file) as log_stream:
+                log_text = log_stream.read()
+            handler.close()
+
+        self.assertEqual(0, buffered_size)
+        self.assertEqual('Buffered.\nFlushed.\n', log_text)
+
+    def test_buffered_file_handler_flushes_before_fork(self):
+        with tempfile.TemporaryDirectory() as directory:
+            log_file = os.path.join(directory, 'buffered.log')
+            handler = loghandlers.BufferedFileHandler(log_file, flush_interval=60)
+
+            handler.handle(logging.makeLogRecord(
+                {'msg': 'Buffered.', 'levelno': logging.INFO}))
+            pid = os.fork()
+            if pid == 0:
+                os._exit(0)
+            os.waitpid(pid, 0)
+            with open(log_file) as log_stream:
+                log_text = log_stream.read()
+            handler.close()
+
+        self.assertEqual('Buffered.\n', log_text)
+
+    def test_buffered_file_handler_when_flush_level_unknown(self):
+        with tempfile.TemporaryDirectory() as directory:
+            log_file = os.path.join(directory, 'buffered.log')
+
+            with self.assertRaisesRegex(ValueError, 'Unknown flush level LOUD.'):
+                loghandlers.BufferedFileHandler(log_file, flush_level='LOUD')
+
+    def test_structured_formatter_when_json(self):
+        formatter = loghandlers.StructuredFormatter('json')
+        record = logging.makeLogRecord({'msg': 'Said %s.', 'args': ('"hi"',),
+                                        'levelname': 'INFO', 'name': 'test', 'created': 0,
+                                        'msecs': 5})
+
+        result = json.loads(formatter.format(record))
+
+        self.assertEqual(['time', 'level', 'logger', 'message'], list(result))
+        self.assertTrue(result['time'].endswith('.005'))
+        self.assertEqual('Said "hi".', result['message'])
+
+    def test_structured_formatter_when_logfmt(self):
+        formatter = loghandlers.StructuredFormatter('logfmt')
+        record = logging.makeLogRecord({'msg': 'Two words', 'levelname': 'INFO',
+                                        'name': 'test'})
+
+        result = formatter.format(record)
+
+        self.assertRegex(result, r'^time=\S+ level=INFO logger=test message="Two words"$')
+
+    def test_rate_limiting_filter_suppresses_and_summarizes(self):
+        handler = MagicMock()
+        rate_limiting_filter = loghandlers.RateLimitingFilter(handler, 2, 10)
+
+        results = [rate_limiting_filter.filter(logging.makeLogRecord(
+            {'name': 'test', 'msg': 'Repeated %s.', 'args': (number,), 'created': number}))
+                   for number in range(5)]
+        later_result = rate_limiting_filter.filter(logging.makeLogRecord(
+            {'name': 'test', 'msg': 'Repeated %s.', 'args': (10,), 'created': 10}))
+        rate_limiting_filter.close()
+
+        self.assertEqual([True, True, False, False, False], results)
+        self.assertTrue(later_result)
+        summary_record = handler.handle.call_args[0][0]
+        self.assertEqual(
+            'Suppressed 3 similar messages like "Repeated %s." in the last 10 seconds.',
+            summary_record.getMessage())
+
+    def test_rate_limiting_filter_sends_summary_without_further_records(self):
+        handler = MagicMock()
+        rate_limiting_filter = loghandlers.RateLimitingFilter(handler, 1, 0.05)
+
+        for _ in range(3):
+            rate_limiting_filter.filter(logging.makeLogRecord(
+                {'name': 'test', 'msg': 'Repeated.', 'created': time.time()}))
+        deadline = time.monotonic() + 5
+        while not handler.handle.called and time.monotonic() < deadline:
+            time.sleep(0.01)
+        rate_limiting_filter.close()
+
+        self.assertEqual(
+            'Suppressed 2 similar messages like "Repeated." in the last 0.05 seconds.',
+            handler.handle.call_args[0][0].getMessage())
+
+    def test_rate_limiting_filter_sends_pending_summary_on_close(self):
+        handler = MagicMock()
+        rate_limiting_filter = loghandlers.RateLimitingFilter(handler, 1, 60)
+
+        for _ in range(2):
+            rate_limiting_filter.filter(logging.makeLogRecord(
+                {'name': 'test', 'msg': 'Repeated.', 'created': time.time()}))
+        handler.handle.assert_not_called()
+        rate_limiting_filter.close()
+
+        self.assertEqual(
+            'Suppressed 1 similar messages like "Repeated." in the last 60 seconds.',
+            handler.handle.call_args[0][0].getMessage())
+
+    def test_journal_handler_sends_native_protocol_datagram(self):
+        with tempfile.TemporaryDirectory() as directory:
+            socket_path = os.path.join(directory, 'journal')
+            journal_socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            journal_socket.bind(socket_path)
+            handler = loghandlers.JournalHandler(socket_path, 'test')
+
+            handler.handle(logging.makeLogRecord(
+                {'msg': 'Two\nlines', 'levelno': logging.ERROR, 'name': 'test.logger'}))
+            datagram = journal_socket.recv(4096)
+            handler.close()
+            journal_socket.close()
+
+        self.assertIn(b'MESSAGE\n' + struct.pack('<Q', 9) + b'Two\nlines\n', datagram)
+        self.assertIn(b'PRIORITY=3\n', datagram)
+        self.assertIn(b'LOGGER=test.logger\n', datagram)
+
+    def test_bounded_queue_handler_when_dropping_oldest(self):
+        log_queue = queue.Queue(2)
+        handler = loghandlers.BoundedQueueHandler(log_queue, 'drop_oldest')
+
+        for number in range(3):
+            handler.handle(logging.makeLogRecord({'msg': 'Record %d.', 'args': (number,)}))
+
+        self.assertEqual(1, handler.dropped_count)
+        self.assertEqual(['Record 1.', 'Record 2.'],
+                         [log_queue.get_nowait().msg for _ in range(2)])
+
+    def test_bounded_queue_handler_when_dropping_debug(self):
+        log_queue = queue.Queue(1)
+        handler = loghandlers.BoundedQueueHandler(log_queue, 'drop_debug')
+
+        handler.handle(logging.makeLogRecord({'msg': 'Kept.', 'levelno': logging.INFO}))
+        handler.handle(logging.makeLogRecord({'msg': 'Dropped.', 'levelno': logging.DEBUG}))
+
+        self.assertEqual(1, handler.dropped_count)
+        self.assertEqual('Kept.', log_queue.get_nowait().msg)
+
+    def test_bounded_queue_handler_reports_dropped_records(self):
+        log_queue = queue.Queue(2)
+        handler = loghandlers.BoundedQueueHandler(log_queue, 'drop_debug')
+        dropped_count = loghandlers.LOG_RECORDS_DROPPED._get_unlabelled_child().value
+
+        for message in ['Kept.', 'Kept.', 'Dropped.', 'Dropped.']:
+            handler.handle(logging.makeLogRecord({'msg': message, 'levelno': logging.DEBUG}))
+        log_queue.get_nowait()
+        log_queue.get_nowait()
+        handler.handle(logging.makeLogRecord({'msg': 'After.', 'levelno': logging.INFO}))
+        handler.handle(logging.makeLogRecord({'msg': 'Dropped.', 'levelno': logging.DEBUG}))
+        log_queue.get_nowait()
+        log_queue.get_nowait()
+        handler.handle(logging.makeLogRecord({'msg': 'Later.', 'levelno': logging.INFO}))
+
+        self.assertEqual(3, handler.dropped_count)
+        self.assertEqual(
+            dropped_count + 3, loghandlers.LOG_RECORDS_DROPPED._get_unlabelled_child().value)
+        # The second warning waits for DROPPED_REPORT_INTERVAL.
+        self.assertEqual(['Later.'], [log_queue.get_nowait().msg])
+
+    def test_bounded_queue_handler_report_message(self):
+        log_queue = queue.Queue(1)
+        handler = loghandlers.BoundedQueueHandler(log_queue, 'drop_debug')
+
+        handler.handle(logging.makeLogRecord({'msg': 'Kept.', 'levelno': logging.INFO}))
+        handler.handle(logging.makeLogRecord({'msg': 'Dropped.', 'levelno': logging.DEBUG}))
+        log_queue.get_nowait()
+        log_queue.maxsize = 2
+        handler.handle(logging.makeLogRecord({'msg': 'After.', 'levelno': logging.INFO}))
+
+        self.assertEqual('After.', log_queue.get_nowait().msg)
+        warning_record = log_queue.get_nowait()
+        self.assertEqual(logging.WARNING, warning_record.levelno)
+        self.assertEqual(loghandlers.DROPPED_MESSAGE % 1, warning_record.getMessage())
+
+    def test_datagram_queue_handler_truncates_oversized_record(self):
+        datagram_queue = loghandlers.DatagramQueue()
+        handler = loghandlers.DatagramQueueHandler(datagram_queue)
+
+        handler.handle(logging.makeLogRecord(
+            {'msg': '\u20ac' * loghandlers.MAX_DATAGRAM_SIZE, 'levelno': logging.INFO}))
+        record = datagram_queue.get()
+        datagram_queue.close()
+
+        self.assertTrue(record.msg.endswith(loghandlers.TRUNCATED_SUFFIX))
+        self.assertLess(len(record.msg), loghandlers.MAX_DATAGRAM_SIZE)
+
+    def test_datagram_queue_drops_records_when_listener_is_stuck(self):
+        with patch('parkbenchcommon.loghandlers.DATAGRAM_SEND_TIMEOUT', 0.01):
+            datagram_queue = loghandlers.DatagramQueue()
+
+        for record_index in range(1000):
+            datagram_queue.put_nowait(logging.makeLogRecord({'msg': 'Stuck.'}))
+            if datagram_queue.dropped_count:
+                break
+        datagram_queue.close()
+
+        self.assertEqual(1, datagram_queue.dropped_count)
+
+    def test_datagram_queue_drops_records_when_receiver_is_closed(self):
+        datagram_queue = loghandlers.DatagramQueue()
+        datagram_queue.close_receiver()
+
+        datagram_queue.put_nowait(logging.makeLogRecord({'msg': 'Gone.'}))
+        datagram_queue.close()
+
+        self.assertEqual(1, datagram_queue.dropped_count)
+
+    def test_datagram_queue_fds(self):
+        datagram_queue = loghandlers.DatagramQueue()
+        fds = datagram_queue.fds()
+        send_fd = datagram_queue.send_socket.fileno()
+        datagram_queue.close()
+
+        self.assertEqual([send_fd], fds)
+
+    def test_datagram_queue_get_drops_unreadable_datagram(self):
+        datagram_queue = loghandlers.DatagramQueue()
+        datagram_queue.send_socket.send(b'not a pickle')
+        datagram_queue.put_nowait(logging.makeLogRecord({'msg': 'Readable.'}))
+
+        with patch('sys.stderr'):
+            record = datagram_queue.get()
+        datagram_queue.close()
+
+        self.assertEqual('Readable.', record.msg)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+# Copyright 2026 Joel Allen Luellwitz and Emily Frost
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests the MemorySnapshotter class."""
+
+__author__ = 'Joel Luellwitz and Emily Frost'
+__version__ = '0.8'
+
+import os
+import tempfile
+import tracemalloc
+import unittest
+from unittest.mock import MagicMock
+from parkbenchcommon.memorysnapshot import MemorySnapshotter
+
+
+class MemorySnapshotterTest(unittest.TestCase):
+    "Tests the MemorySnapshotter class."
+
+    def setUp(self):
+        self.output_directory = tempfile.TemporaryDirectory()
+        self.retained = []
+
+    def tearDown(self):
+        tracemalloc.stop()
+        self.output_directory.cleanup()
+
+    def _create_snapshotter(self, **kwargs):
+        """Returns a MemorySnapshotter writing to the test's output directory."""
+        snapshotter = MemorySnapshotter(self.output_directory.name, **kwargs)
+        snapshotter.logger = MagicMock()
+        return snapshotter
+
+    def test_first_request_only_starts_tracing(self):
+        snapshotter = self._create_snapshotter()
+
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertIsNone(snapshotter.take_snapshot())
+        self.assertTrue(tracemalloc.is_tracing())
+        self.assertEqual([], os.listdir(self.output_directory.name))
+
+    def test_reports_growth_since_previous_snapshot(self):
+        snapshotter = self._create_snapshotter(trace_immediately=True, top_count=5)
+
+        first_report = snapshotter.take_snapshot()
+        self.retained.extend(bytearray(1024) for _ in range(1000))
+        second_report = snapshotter.take_snapshot()
+
+        self.assertEqual('Largest allocation sites:', first_report[1])
+        self.assertEqual('Allocation growth since the previous snapshot:', second_report[1])
+        self.assertIn('memorysnapshottest.py', second_report[2])
+        self.assertIn('(+', second_report[2])
+        self.assertLessEqual(len(second_report), 7)
+        self.assertEqual(2, len(os.listdir(self.output_directory.name)))
+
+    def test_traceback_report(self):
+        snapshotter = self._create_snapshotter(trace_immediately=True, key_type='traceback',
+                                               frame_count=2, top_count=1)
+
+        report = snapshotter.take_snapshot()
+
+        self.assertGreater(len(report), 3)
+
+    def test_unknown_key_type(self):
+        with self.assertRaises(ValueError):
+            MemorySnapshotter(key_type='function')
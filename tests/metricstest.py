@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+# Copyright 2026 Joel Allen Luellwitz and Emily Frost
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests the metrics module."""
+
+__author__ = 'Joel Luellwitz and Emily Frost'
+__version__ = '0.8'
+
+import configparser
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+from parkbenchcommon import confighelper
+from parkbenchcommon import metrics
+from parkbenchcommon.metrics import MetricsRegistry
+
+
+class MetricsTest(unittest.TestCase):
+    "Tests the metrics registry and its Prometheus text rendering."
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_counter_with_labels(self):
+        counter = self.registry.counter('test_events_total', 'Test events.', ('kind',))
+
+        counter.labels('a').inc()
+        counter.labels('a').inc(2)
+        counter.labels('quote"d').inc()
+
+        self.assertEqual(
+            '# HELP test_events_total Test events.\n'
+            '# TYPE test_events_total counter\n'
+            'test_events_total{program="test",kind="a"} 3\n'
+            'test_events_total{program="test",kind="quote\\"d"} 1\n',
+            self.registry.render({'program': 'test'}))
+
+    def test_counter_rejects_decrease_and_wrong_labels(self):
+        counter = self.registry.counter('test_events_total', 'Test events.', ('kind',))
+
+        with self.assertRaises(ValueError):
+            counter.labels('a').inc(-1)
+        with self.assertRaises(ValueError):
+            counter.labels('a', 'b')
+        with self.assertRaises(ValueError):
+            counter.inc()
+
+    def test_gauge(self):
+        gauge = self.registry.gauge('test_level', 'Test level.')
+
+        gauge.set(5)
+        gauge.inc(0.5)
+        gauge.dec(2)
+
+        self.assertEqual('# HELP test_level Test level.\n# TYPE test_level gauge\n'
+                         'test_level 3.5\n', self.registry.render())
+
+    def test_histogram(self):
+        histogram = self.registry.histogram('test_seconds', 'Test time.', buckets=(1, 0.1))
+
+        histogram.observe(0.1)
+        histogram.observe(0.5)
+        histogram.observe(2)
+        with histogram.time():
+            pass
+
+        lines = self.registry.render().splitlines()
+        self.assertEqual(['test_seconds_bucket{le="0.1"} 2', 'test_seconds_bucket{le="1"} 3',
+                          'test_seconds_bucket{le="+Inf"} 4'], lines[2:5])
+        self.assertTrue(lines[5].startswith('test_seconds_sum 2.6'))
+        self.assertEqual('test_seconds_count 4', lines[6])
+
+    def test_register_returns_existing_metric(self):
+        counter = self.registry.counter('test_events_total', 'Test events.')
+
+        self.assertIs(counter, self.registry.counter('test_events_total', 'Test events.'))
+        with self.assertRaises(ValueError):
+            self.registry.gauge('test_events_total', 'Test events.')
+
+    def test_invalid_metric_name(self):
+        with self.assertRaises(ValueError):
+            self.registry.counter('test-events', 'Test events.')
+
+    def test_write_textfile(self):
+        self.registry.counter('test_events_total', 'Test events.').inc()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'test.prom')
+            self.registry.write_textfile(path)
+
+            with open(path) as textfile:
+                text = textfile.read()
+            self.assertEqual(['test.prom'], os.listdir(directory))
+            self.assertEqual(0o644, os.stat(path).st_mode & 0o777)
+
+        self.assertIn('test_events_total 1\n', text)
+
+    def test_exporter_writes_on_stop(self):
+        self.registry.counter('test_events_total', 'Test events.').inc()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'test.prom')
+            self.registry.start_exporter(path, interval=60)
+            self.registry.stop_exporter()
+
+            self.assertTrue(os.path.exists(path))
+
+    def test_validation_failures_counted(self):
+        validation_failures = confighelper.VALIDATION_FAILURES.labels()
+        failure_count = validation_failures.value
+
+        config_helper = confighelper.ConfigHelper()
+        config_helper.logger = MagicMock()
+        config_file = configparser.ConfigParser()
+        config_file.read_string('[General]\n')
+        confighelper.ValidationException('Not counted.')
+
+        with self.assertRaises(confighelper.ValidationException):
+            config_helper.verify_integer_exists(config_file, 'missing')
+
+        self.assertEqual(failure_count + 1, validation_failures.value)
+        self.assertIn('parkbench_config_validation_failures_total', metrics.render())
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+# Copyright 2026 Joel Allen Luellwitz and Emily Frost
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests the ramdisk module."""
+
+__author__ = 'Joel Luellwitz and Emily Frost'
+__version__ = '0.8'
+
+import io
+import os
+import stat
+import tarfile
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+from parkbenchcommon.ramdisk import Ramdisk, RamdiskRestoreError, RamdiskSnapshotError
+
+
+class RamdiskTest(unittest.TestCase):
+    "Tests Ramdisk snapshots and restores. Mounting is not tested because it needs root."
+
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temporary_directory.cleanup)
+        self.source_ramdisk = self._create_ramdisk('source')
+        self.target_ramdisk = self._create_ramdisk('target')
+        self.archive_path = os.path.join(self.temporary_directory.name, 'snapshot.tar.gz')
+
+        is_mounted_patcher = patch.object(Ramdisk, 'is_mounted', return_value=True)
+        self.is_mounted_mock = is_mounted_patcher.start()
+        self.addCleanup(is_mounted_patcher.stop)
+
+    def test_snapshot_and_restore(self):
+        source_path = self.source_ramdisk.path
+        with open(os.path.join(source_path, 'state'), 'w') as state_file:
+            state_file.write('State.')
+        os.mkdir(os.path.join(source_path, 'read-only'))
+        with open(os.path.join(source_path, 'read-only', 'file'), 'w') as child_file:
+            child_file.write('Child.')
+        os.chmod(os.path.join(source_path, 'read-only'), 0o500)
+        os.symlink('state', os.path.join(source_path, 'link'))
+        self.addCleanup(os.chmod, os.path.join(source_path, 'read-only'), 0o700)
+        self.addCleanup(os.chmod, os.path.join(self.target_ramdisk.path, 'read-only'), 0o700)
+
+        self.assertIsNone(self.source_ramdisk.snapshot(self.archive_path, background=False))
+        self.assertTrue(self.target_ramdisk.restore(self.archive_path))
+
+        target_path = self.target_ramdisk.path
+        self.assertEqual(['link', 'read-only', 'state'], sorted(os.listdir(target_path)))
+        with open(os.path.join(target_path, 'read-only', 'file')) as child_file:
+            self.assertEqual('Child.', child_file.read())
+        self.assertEqual(0o500, stat.S_IMODE(
+            os.stat(os.path.join(target_path, 'read-only')).st_mode))
+        self.assertEqual('state', os.readlink(os.path.join(target_path, 'link')))
+        self.assertEqual(os.getuid(), os.stat(os.path.join(target_path, 'state')).st_uid)
+        self.assertIsNone(self.source_ramdisk.last_snapshot_error)
+
+    def test_restore_replaces_existing_entries(self):
+        with open(os.path.join(self.source_ramdisk.path, 'entry'), 'w') as entry_file:
+            entry_file.write('From the snapshot.')
+        self.source_ramdisk.snapshot(self.archive_path, background=False)
+        os.makedirs(os.path.join(self.target_ramdisk.path, 'entry', 'stale'))
+
+        self.target_ramdisk.restore(self.archive_path)
+
+        with open(os.path.join(self.target_ramdisk.path, 'entry')) as entry_file:
+            self.assertEqual('From the snapshot.', entry_file.read())
+
+    def test_restore_when_no_snapshot(self):
+        self.assertFalse(self.target_ramdisk.restore(self.archive_path))
+
+    def test_restore_when_unsafe_member(self):
+        with tarfile.open(self.archive_path, 'w:gz') as archive:
+            self._add_file(archive, 'good', b'Good.')
+            self._add_file(archive, '../escaped', b'Bad.')
+
+        with self.assertRaises(RamdiskRestoreError):
+            self.target_ramdisk.restore(self.archive_path)
+
+        # Nothing is restored, not even the members before the unsafe one.
+        self.assertEqual([], os.listdir(self.target_ramdisk.path))
+        self.assertFalse(os.path.exists(
+            os.path.join(self.temporary_directory.name, 'escaped')))
+
+    def test_restore_when_link_points_outside_ramdisk(self):
+        with tarfile.open(self.archive_path, 'w:gz') as archive:
+            link_member = tarfile.TarInfo('link')
+            link_member.type = tarfile.SYMTYPE
+            link_member.linkname = '/etc/passwd'
+            archive.addfile(link_member)
+
+        with self.assertRaises(RamdiskRestoreError):
+            self.target_ramdisk.restore(self.archive_path)
+        self.assertEqual([], os.listdir(self.target_ramdisk.path))
+
+    def test_restore_when_archive_is_damaged(self):
+        with open(self.archive_path, 'wb') as archive_file:
+            archive_file.write(b'Not a snapshot.')
+
+        with self.assertRaises(RamdiskRestoreError):
+            self.target_ramdisk.restore(self.archive_path)
+        self.assertEqual([], os.listdir(self.target_ramdisk.path))
+
+    def test_snapshot_when_not_mounted(self):
+        self.is_mounted_mock.return_value = False
+
+        with self.assertRaises(RamdiskSnapshotError):
+            self.source_ramdisk.snapshot(self.archive_path)
+        with self.assertRaises(RamdiskRestoreError):
+            self.target_ramdisk.restore(self.archive_path)
+
+    def test_snapshot_when_background_snapshot_fails(self):
+        missing_archive_path = os.path.join(
+            self.temporary_directory.name, 'missing', 'snapshot.tar.gz')
+
+        self.source_ramdisk.snapshot(missing_archive_path).join()
+
+        self.assertIsInstance(self.source_ramdisk.last_snapshot_error, RamdiskSnapshotError)
+
+        self.source_ramdisk.snapshot(self.archive_path).join()
+
+        self.assertIsNone(self.source_ramdisk.last_snapshot_error)
+        self.assertTrue(os.path.isfile(self.archive_path))
+
+    def _create_ramdisk(self, name):
+        """Returns a Ramdisk whose path is a new directory in the temporary directory.
+
+        name: The name of the directory.
+        """
+        path = os.path.join(self.temporary_directory.name, name)
+        os.mkdir(path)
+        ramdisk_instance = Ramdisk(path)
+        ramdisk_instance.logger = MagicMock()
+        return ramdisk_instance
+
+    def _add_file(self, archive, name, data):
+        """Adds a regular file to an archive.
+
+        archive: The TarFile to add the file to.
+        name: The name of the member.
+        data: The bytes in the file.
+        """
+        member = tarfile.TarInfo(name)
+        member.size = len(data)
+        archive.addfile(member, io.BytesIO(data))
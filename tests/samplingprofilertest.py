@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+# Copyright 2026 Joel Allen Luellwitz and Emily Frost
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests the SamplingProfiler class."""
+
+__author__ = 'Joel Luellwitz and Emily Frost'
+__version__ = '0.8'
+
+import os
+import signal
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+from parkbenchcommon.samplingprofiler import SamplingProfiler
+
+
+def _wait_in_profiled_function(stop_event):
+    """A function for the profiler to find on a thread's stack."""
+    stop_event.wait()
+
+
+class SamplingProfilerTest(unittest.TestCase):
+    "Tests the SamplingProfiler class."
+
+    def setUp(self):
+        self.output_directory = tempfile.TemporaryDirectory()
+        self.profiler = SamplingProfiler(
+            self.output_directory.name, sample_rate=200, duration=0.1)
+        self.profiler.logger = MagicMock()
+
+        self.stop_event = threading.Event()
+        self.profiled_thread = threading.Thread(
+            target=_wait_in_profiled_function, args=(self.stop_event,), name='profiled')
+        self.profiled_thread.start()
+
+    def tearDown(self):
+        self.stop_event.set()
+        self.profiled_thread.join()
+        self.profiler.uninstall()
+        self.output_directory.cleanup()
+
+    def _read_profile(self):
+        """Returns the lines of the only profile in the output directory."""
+        profile_filenames = os.listdir(self.output_directory.name)
+        self.assertEqual(1, len(profile_filenames))
+        self.assertTrue(profile_filenames[0].endswith('.folded'))
+        with open(os.path.join(self.output_directory.name, profile_filenames[0])) \
+                as profile_file:
+            return profile_file.read().splitlines()
+
+    def test_start_writes_collapsed_stacks(self):
+        self.profiler.start().join()
+
+        profiled_lines = [line for line in self._read_profile()
+                          if line.startswith('profiled;')]
+        self.assertTrue(profiled_lines)
+        stack, count = profiled_lines[0].rsplit(' ', 1)
+        self.assertIn(';_wait_in_profiled_function (', stack)
+        self.assertGreater(int(count), 0)
+        self.assertFalse(any(line.startswith('sampling-profiler;')
+                             for line in self._read_profile()))
+
+    def test_start_when_already_running(self):
+        sampling_thread = self.profiler.start(duration=0.5)
+
+        self.assertIsNone(self.profiler.start())
+        sampling_thread.join()
+
+    def test_signal_starts_profiling(self):
+        self.profiler.install()
+
+        os.kill(os.getpid(), signal.SIGUSR2)
+        deadline = time.monotonic() + 5
+        while self.profiler._sampling_thread is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.profiler._sampling_thread.join()
+
+        self.assertTrue(self._read_profile())
+        self.assertFalse(any(line.startswith('sampling-profiler-trigger;')
+                             for line in self._read_profile()))
+
+    def test_signal_handler_does_not_take_lock(self):
+        self.profiler.install()
+
+        # The handler would deadlock here if it waited for the lock held by this thread.
+        with self.profiler._lock:
+            os.kill(os.getpid(), signal.SIGUSR2)
+        deadline = time.monotonic() + 5
+        while self.profiler._sampling_thread is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.profiler._sampling_thread.join()
+
+        self.assertTrue(self._read_profile())
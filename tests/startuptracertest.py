@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+# Copyright 2026 Joel Allen Luellwitz and Emily Frost
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests the StartupTracer class."""
+
+__author__ = 'Joel Luellwitz and Emily Frost'
+__version__ = '0.8'
+
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+from parkbenchcommon.startuptracer import StartupTracer
+
+
+class StartupTracerTest(unittest.TestCase):
+    "Tests the StartupTracer class."
+
+    def setUp(self):
+        self.tracer = StartupTracer()
+        self.tracer.logger = MagicMock()
+
+    def test_phase_not_recorded_when_not_started(self):
+        with self.tracer.phase('ignored'):
+            pass
+
+        self.assertIsNone(self.tracer.finish())
+        self.tracer.logger.info.assert_not_called()
+
+    def test_nested_phases_are_aggregated(self):
+        self.tracer.start()
+        with self.tracer.phase('outer'):
+            for _ in range(3):
+                with self.tracer.phase('inner'):
+                    pass
+
+        report_lines = self.tracer.finish()
+
+        self.assertEqual(4, len(report_lines))
+        self.assertEqual(['outer', '1'], report_lines[1].split()[:2])
+        self.assertTrue(report_lines[2].startswith('  inner'))
+        self.assertEqual('3', report_lines[2].split()[1])
+        self.assertEqual('total', report_lines[3].split()[0])
+
+    def test_traced_decorator_records_phase_and_returns_value(self):
+        @self.tracer.traced('decorated')
+        def decorated(value):
+            return value * 2
+
+        self.tracer.start()
+        result = decorated(21)
+        report_lines = self.tracer.finish()
+
+        self.assertEqual(42, result)
+        self.assertEqual(['decorated', '1'], report_lines[1].split()[:2])
+
+    def test_phase_recorded_when_body_raises(self):
+        self.tracer.start()
+        with self.assertRaises(ValueError):
+            with self.tracer.phase('failing'):
+                raise ValueError()
+
+        report_lines = self.tracer.finish()
+
+        self.assertEqual(['failing', '1'], report_lines[1].split()[:2])
+
+    def test_finish_writes_report_file(self):
+        self.tracer.start()
+        with self.tracer.phase('written'):
+            pass
+
+        with tempfile.TemporaryDirectory() as directory:
+            report_path = os.path.join(directory, 'startup.txt')
+            report_lines = self.tracer.finish(report_path)
+            with open(report_path) as report_file:
+                self.assertEqual(report_lines, report_file.read().splitlines())
+
+        self.assertFalse(self.tracer.enabled)